@@ -5,30 +5,337 @@ d = { 'settings': { 'branch': 'master',
                 'doc_host': 'https://Chavelanda.github.io',
                 'git_url': 'https://github.com/Chavelanda/birdclef_2023',
                 'lib_path': 'birdclef'},
-  'syms': { 'birdclef.dataset': { 'birdclef.dataset.BirdClef': ('dataset.html#birdclef', 'birdclef/dataset.py'),
+  'syms': { 'birdclef.autotune': { 'birdclef.autotune._available_mb': ('autotune.html#_available_mb', 'birdclef/autotune.py'),
+                                   'birdclef.autotune._batch_mb': ('autotune.html#_batch_mb', 'birdclef/autotune.py'),
+                                   'birdclef.autotune._epoch_reaches_workers': ( 'autotune.html#_epoch_reaches_workers',
+                                                                                 'birdclef/autotune.py'),
+                                   'birdclef.autotune._rss_mb': ('autotune.html#_rss_mb', 'birdclef/autotune.py'),
+                                   'birdclef.autotune.autotune_cli': ('autotune.html#autotune_cli', 'birdclef/autotune.py'),
+                                   'birdclef.autotune.autotune_dataloader': ('autotune.html#autotune_dataloader', 'birdclef/autotune.py'),
+                                   'birdclef.autotune.candidate_settings': ('autotune.html#candidate_settings', 'birdclef/autotune.py'),
+                                   'birdclef.autotune.probe_dataloader': ('autotune.html#probe_dataloader', 'birdclef/autotune.py')},
+            'birdclef.benchmark': { 'birdclef.benchmark._summary': ('benchmark.html#_summary', 'birdclef/benchmark.py'),
+                                    'birdclef.benchmark._timeit': ('benchmark.html#_timeit', 'birdclef/benchmark.py'),
+                                    'birdclef.benchmark.benchmark_cli': ('benchmark.html#benchmark_cli', 'birdclef/benchmark.py'),
+                                    'birdclef.benchmark.benchmark_dataloader': ( 'benchmark.html#benchmark_dataloader',
+                                                                                 'birdclef/benchmark.py'),
+                                    'birdclef.benchmark.benchmark_import_time': ( 'benchmark.html#benchmark_import_time',
+                                                                                  'birdclef/benchmark.py'),
+                                    'birdclef.benchmark.benchmark_length_policies': ( 'benchmark.html#benchmark_length_policies',
+                                                                                      'birdclef/benchmark.py'),
+                                    'birdclef.benchmark.benchmark_metrics': ('benchmark.html#benchmark_metrics', 'birdclef/benchmark.py'),
+                                    'birdclef.benchmark.benchmark_models': ('benchmark.html#benchmark_models', 'birdclef/benchmark.py'),
+                                    'birdclef.benchmark.benchmark_optimize_for_inference': ( 'benchmark.html#benchmark_optimize_for_inference',
+                                                                                             'birdclef/benchmark.py'),
+                                    'birdclef.benchmark.benchmark_padded_cmap': ( 'benchmark.html#benchmark_padded_cmap',
+                                                                                  'birdclef/benchmark.py'),
+                                    'birdclef.benchmark.benchmark_pipeline': ('benchmark.html#benchmark_pipeline', 'birdclef/benchmark.py'),
+                                    'birdclef.benchmark.benchmark_precision': ( 'benchmark.html#benchmark_precision',
+                                                                                'birdclef/benchmark.py'),
+                                    'birdclef.benchmark.benchmark_quantization': ( 'benchmark.html#benchmark_quantization',
+                                                                                   'birdclef/benchmark.py'),
+                                    'birdclef.benchmark.benchmark_server': ('benchmark.html#benchmark_server', 'birdclef/benchmark.py'),
+                                    'birdclef.benchmark.compare_benchmarks': ('benchmark.html#compare_benchmarks', 'birdclef/benchmark.py'),
+                                    'birdclef.benchmark.make_synthetic_data': ( 'benchmark.html#make_synthetic_data',
+                                                                                'birdclef/benchmark.py'),
+                                    'birdclef.benchmark.run_benchmarks': ('benchmark.html#run_benchmarks', 'birdclef/benchmark.py'),
+                                    'birdclef.benchmark.synthetic_data': ('benchmark.html#synthetic_data', 'birdclef/benchmark.py')},
+            'birdclef.cache': { 'birdclef.cache.FeatureCache': ('cache.html#featurecache', 'birdclef/cache.py'),
+                                'birdclef.cache.FeatureCache.__init__': ('cache.html#featurecache.__init__', 'birdclef/cache.py'),
+                                'birdclef.cache.FeatureCache._entries': ('cache.html#featurecache._entries', 'birdclef/cache.py'),
+                                'birdclef.cache.FeatureCache._evict': ('cache.html#featurecache._evict', 'birdclef/cache.py'),
+                                'birdclef.cache.FeatureCache._locked': ('cache.html#featurecache._locked', 'birdclef/cache.py'),
+                                'birdclef.cache.FeatureCache._read_size': ('cache.html#featurecache._read_size', 'birdclef/cache.py'),
+                                'birdclef.cache.FeatureCache.clear': ('cache.html#featurecache.clear', 'birdclef/cache.py'),
+                                'birdclef.cache.FeatureCache.evict': ('cache.html#featurecache.evict', 'birdclef/cache.py'),
+                                'birdclef.cache.FeatureCache.get': ('cache.html#featurecache.get', 'birdclef/cache.py'),
+                                'birdclef.cache.FeatureCache.path': ('cache.html#featurecache.path', 'birdclef/cache.py'),
+                                'birdclef.cache.FeatureCache.put': ('cache.html#featurecache.put', 'birdclef/cache.py'),
+                                'birdclef.cache.FeatureCache.size': ('cache.html#featurecache.size', 'birdclef/cache.py'),
+                                'birdclef.cache.warm_cache': ('cache.html#warm_cache', 'birdclef/cache.py'),
+                                'birdclef.cache.warm_cache_cli': ('cache.html#warm_cache_cli', 'birdclef/cache.py')},
+            'birdclef.checkpoint': { 'birdclef.checkpoint.CheckpointManager': ( 'checkpoint.html#checkpointmanager',
+                                                                                'birdclef/checkpoint.py'),
+                                     'birdclef.checkpoint.CheckpointManager.__init__': ( 'checkpoint.html#checkpointmanager.__init__',
+                                                                                         'birdclef/checkpoint.py'),
+                                     'birdclef.checkpoint.CheckpointManager._atomic_save': ( 'checkpoint.html#checkpointmanager._atomic_save',
+                                                                                             'birdclef/checkpoint.py'),
+                                     'birdclef.checkpoint.CheckpointManager._path': ( 'checkpoint.html#checkpointmanager._path',
+                                                                                      'birdclef/checkpoint.py'),
+                                     'birdclef.checkpoint.CheckpointManager._raise': ( 'checkpoint.html#checkpointmanager._raise',
+                                                                                       'birdclef/checkpoint.py'),
+                                     'birdclef.checkpoint.CheckpointManager._write_loop': ( 'checkpoint.html#checkpointmanager._write_loop',
+                                                                                            'birdclef/checkpoint.py'),
+                                     'birdclef.checkpoint.CheckpointManager.best_path': ( 'checkpoint.html#checkpointmanager.best_path',
+                                                                                          'birdclef/checkpoint.py'),
+                                     'birdclef.checkpoint.CheckpointManager.checkpoints': ( 'checkpoint.html#checkpointmanager.checkpoints',
+                                                                                            'birdclef/checkpoint.py'),
+                                     'birdclef.checkpoint.CheckpointManager.clear': ( 'checkpoint.html#checkpointmanager.clear',
+                                                                                      'birdclef/checkpoint.py'),
+                                     'birdclef.checkpoint.CheckpointManager.close': ( 'checkpoint.html#checkpointmanager.close',
+                                                                                      'birdclef/checkpoint.py'),
+                                     'birdclef.checkpoint.CheckpointManager.latest': ( 'checkpoint.html#checkpointmanager.latest',
+                                                                                       'birdclef/checkpoint.py'),
+                                     'birdclef.checkpoint.CheckpointManager.load': ( 'checkpoint.html#checkpointmanager.load',
+                                                                                     'birdclef/checkpoint.py'),
+                                     'birdclef.checkpoint.CheckpointManager.save': ( 'checkpoint.html#checkpointmanager.save',
+                                                                                     'birdclef/checkpoint.py'),
+                                     'birdclef.checkpoint.CheckpointManager.wait': ( 'checkpoint.html#checkpointmanager.wait',
+                                                                                     'birdclef/checkpoint.py'),
+                                     'birdclef.checkpoint._to_cpu': ('checkpoint.html#_to_cpu', 'birdclef/checkpoint.py'),
+                                     'birdclef.checkpoint.get_rng_state': ('checkpoint.html#get_rng_state', 'birdclef/checkpoint.py'),
+                                     'birdclef.checkpoint.set_rng_state': ('checkpoint.html#set_rng_state', 'birdclef/checkpoint.py')},
+            'birdclef.dataset': { 'birdclef.dataset.AliasTable': ('dataset.html#aliastable', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.AliasTable.__init__': ('dataset.html#aliastable.__init__', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.AliasTable.draw': ('dataset.html#aliastable.draw', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.BalancedSampler': ('dataset.html#balancedsampler', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.BalancedSampler.__init__': ( 'dataset.html#balancedsampler.__init__',
+                                                                                 'birdclef/dataset.py'),
+                                  'birdclef.dataset.BalancedSampler.__iter__': ( 'dataset.html#balancedsampler.__iter__',
+                                                                                 'birdclef/dataset.py'),
+                                  'birdclef.dataset.BalancedSampler.__len__': ( 'dataset.html#balancedsampler.__len__',
+                                                                                'birdclef/dataset.py'),
+                                  'birdclef.dataset.BalancedSampler.set_epoch': ( 'dataset.html#balancedsampler.set_epoch',
+                                                                                  'birdclef/dataset.py'),
+                                  'birdclef.dataset.BirdClef': ('dataset.html#birdclef', 'birdclef/dataset.py'),
                                   'birdclef.dataset.BirdClef.__getitem__': ('dataset.html#birdclef.__getitem__', 'birdclef/dataset.py'),
                                   'birdclef.dataset.BirdClef.__init__': ('dataset.html#birdclef.__init__', 'birdclef/dataset.py'),
                                   'birdclef.dataset.BirdClef.__len__': ('dataset.html#birdclef.__len__', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.BirdClef._augment': ('dataset.html#birdclef._augment', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.BirdClef.collate': ('dataset.html#birdclef.collate', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.BirdClef.epoch': ('dataset.html#birdclef.epoch', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.BirdClef.set_epoch': ('dataset.html#birdclef.set_epoch', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.MultiCrop': ('dataset.html#multicrop', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.MultiCrop.__getitem__': ('dataset.html#multicrop.__getitem__', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.MultiCrop.__init__': ('dataset.html#multicrop.__init__', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.MultiCrop.__iter__': ('dataset.html#multicrop.__iter__', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.MultiCrop.__len__': ('dataset.html#multicrop.__len__', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.MultiCrop._decode': ('dataset.html#multicrop._decode', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.MultiCrop._files': ('dataset.html#multicrop._files', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.MultiCrop.epoch': ('dataset.html#multicrop.epoch', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.MultiCrop.set_epoch': ('dataset.html#multicrop.set_epoch', 'birdclef/dataset.py'),
                                   'birdclef.dataset.MyPipeline': ('dataset.html#mypipeline', 'birdclef/dataset.py'),
                                   'birdclef.dataset.MyPipeline.__init__': ('dataset.html#mypipeline.__init__', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.MyPipeline.cache_params': ( 'dataset.html#mypipeline.cache_params',
+                                                                                'birdclef/dataset.py'),
+                                  'birdclef.dataset.MyPipeline.extract': ('dataset.html#mypipeline.extract', 'birdclef/dataset.py'),
                                   'birdclef.dataset.MyPipeline.forward': ('dataset.html#mypipeline.forward', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.MyPipeline.forward_batch': ( 'dataset.html#mypipeline.forward_batch',
+                                                                                 'birdclef/dataset.py'),
                                   'birdclef.dataset.MyPipeline.inverse_transform': ( 'dataset.html#mypipeline.inverse_transform',
                                                                                      'birdclef/dataset.py'),
+                                  'birdclef.dataset.MyPipeline.load': ('dataset.html#mypipeline.load', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.MyPipeline.normalise': ('dataset.html#mypipeline.normalise', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.MyPipeline.num_frames': ('dataset.html#mypipeline.num_frames', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.ShardSampler': ('dataset.html#shardsampler', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.ShardSampler.__init__': ('dataset.html#shardsampler.__init__', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.ShardSampler.__iter__': ('dataset.html#shardsampler.__iter__', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.ShardSampler.__len__': ('dataset.html#shardsampler.__len__', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.__getattr__': ('dataset.html#__getattr__', 'birdclef/dataset.py'),
+                                  'birdclef.dataset._durations': ('dataset.html#_durations', 'birdclef/dataset.py'),
                                   'birdclef.dataset.get_dataloader': ('dataset.html#get_dataloader', 'birdclef/dataset.py'),
-                                  'birdclef.dataset.get_dataset': ('dataset.html#get_dataset', 'birdclef/dataset.py')},
+                                  'birdclef.dataset.get_dataset': ('dataset.html#get_dataset', 'birdclef/dataset.py'),
+                                  'birdclef.dataset.get_metadata': ('dataset.html#get_metadata', 'birdclef/dataset.py')},
             'birdclef.experiment': {},
+            'birdclef.inference': { 'birdclef.inference.SoundscapeWindows': ('inference.html#soundscapewindows', 'birdclef/inference.py'),
+                                    'birdclef.inference.SoundscapeWindows.__init__': ( 'inference.html#soundscapewindows.__init__',
+                                                                                       'birdclef/inference.py'),
+                                    'birdclef.inference.SoundscapeWindows.__iter__': ( 'inference.html#soundscapewindows.__iter__',
+                                                                                       'birdclef/inference.py'),
+                                    'birdclef.inference.SoundscapeWindows.collate': ( 'inference.html#soundscapewindows.collate',
+                                                                                      'birdclef/inference.py'),
+                                    'birdclef.inference.SoundscapeWindows.frames': ( 'inference.html#soundscapewindows.frames',
+                                                                                     'birdclef/inference.py'),
+                                    'birdclef.inference.SoundscapeWindows.windows': ( 'inference.html#soundscapewindows.windows',
+                                                                                      'birdclef/inference.py'),
+                                    'birdclef.inference._append': ('inference.html#_append', 'birdclef/inference.py'),
+                                    'birdclef.inference.predict_soundscapes': ( 'inference.html#predict_soundscapes',
+                                                                                'birdclef/inference.py'),
+                                    'birdclef.inference.predict_soundscapes_cli': ( 'inference.html#predict_soundscapes_cli',
+                                                                                    'birdclef/inference.py')},
+            'birdclef.loggers': { 'birdclef.loggers.LocalLogger': ('loggers.html#locallogger', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.LocalLogger.__init__': ('loggers.html#locallogger.__init__', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.LocalLogger._convert': ('loggers.html#locallogger._convert', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.LocalLogger._write_json': ( 'loggers.html#locallogger._write_json',
+                                                                                'birdclef/loggers.py'),
+                                  'birdclef.loggers.LocalLogger._write_logs': ( 'loggers.html#locallogger._write_logs',
+                                                                                'birdclef/loggers.py'),
+                                  'birdclef.loggers.LocalLogger._write_summary': ( 'loggers.html#locallogger._write_summary',
+                                                                                   'birdclef/loggers.py'),
+                                  'birdclef.loggers.LocalLogger.finish': ('loggers.html#locallogger.finish', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.LocalLogger.history': ('loggers.html#locallogger.history', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.LocalLogger.log_artifact': ( 'loggers.html#locallogger.log_artifact',
+                                                                                 'birdclef/loggers.py'),
+                                  'birdclef.loggers.Logger': ('loggers.html#logger', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.Logger.__enter__': ('loggers.html#logger.__enter__', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.Logger.__exit__': ('loggers.html#logger.__exit__', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.Logger.__init__': ('loggers.html#logger.__init__', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.Logger._raise': ('loggers.html#logger._raise', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.Logger._write_logs': ('loggers.html#logger._write_logs', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.Logger._write_loop': ('loggers.html#logger._write_loop', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.Logger._write_summary': ('loggers.html#logger._write_summary', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.Logger.finish': ('loggers.html#logger.finish', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.Logger.flush': ('loggers.html#logger.flush', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.Logger.log': ('loggers.html#logger.log', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.Logger.log_artifact': ('loggers.html#logger.log_artifact', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.Logger.summary': ('loggers.html#logger.summary', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.NullLogger': ('loggers.html#nulllogger', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.NullLogger.__init__': ('loggers.html#nulllogger.__init__', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.NullLogger._write_logs': ('loggers.html#nulllogger._write_logs', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.NullLogger._write_summary': ( 'loggers.html#nulllogger._write_summary',
+                                                                                  'birdclef/loggers.py'),
+                                  'birdclef.loggers.NullLogger.finish': ('loggers.html#nulllogger.finish', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.NullLogger.flush': ('loggers.html#nulllogger.flush', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.NullLogger.log': ('loggers.html#nulllogger.log', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.NullLogger.log_artifact': ( 'loggers.html#nulllogger.log_artifact',
+                                                                                'birdclef/loggers.py'),
+                                  'birdclef.loggers.NullLogger.summary': ('loggers.html#nulllogger.summary', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.WandbLogger': ('loggers.html#wandblogger', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.WandbLogger.__init__': ('loggers.html#wandblogger.__init__', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.WandbLogger._convert': ('loggers.html#wandblogger._convert', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.WandbLogger._write_logs': ( 'loggers.html#wandblogger._write_logs',
+                                                                                'birdclef/loggers.py'),
+                                  'birdclef.loggers.WandbLogger._write_summary': ( 'loggers.html#wandblogger._write_summary',
+                                                                                   'birdclef/loggers.py'),
+                                  'birdclef.loggers.WandbLogger.finish': ('loggers.html#wandblogger.finish', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.WandbLogger.log_artifact': ( 'loggers.html#wandblogger.log_artifact',
+                                                                                 'birdclef/loggers.py'),
+                                  'birdclef.loggers._Config': ('loggers.html#_config', 'birdclef/loggers.py'),
+                                  'birdclef.loggers._Config.update': ('loggers.html#_config.update', 'birdclef/loggers.py'),
+                                  'birdclef.loggers._to_python': ('loggers.html#_to_python', 'birdclef/loggers.py'),
+                                  'birdclef.loggers.get_logger': ('loggers.html#get_logger', 'birdclef/loggers.py')},
             'birdclef.network': { 'birdclef.network.EfficientNetV2': ('network.html#efficientnetv2', 'birdclef/network.py'),
                                   'birdclef.network.EfficientNetV2.__init__': ( 'network.html#efficientnetv2.__init__',
                                                                                 'birdclef/network.py'),
                                   'birdclef.network.EfficientNetV2.forward': ('network.html#efficientnetv2.forward', 'birdclef/network.py'),
-                                  'birdclef.network.get_model': ('network.html#get_model', 'birdclef/network.py')},
-            'birdclef.preprocessing': {'birdclef.preprocessing.foo': ('preprocessing.html#foo', 'birdclef/preprocessing.py')},
-            'birdclef.trainer': { 'birdclef.trainer.log_weights': ('trainer.html#log_weights', 'birdclef/trainer.py'),
+                                  'birdclef.network.FusedStem': ('network.html#fusedstem', 'birdclef/network.py'),
+                                  'birdclef.network.FusedStem.__init__': ('network.html#fusedstem.__init__', 'birdclef/network.py'),
+                                  'birdclef.network.FusedStem._unfused': ('network.html#fusedstem._unfused', 'birdclef/network.py'),
+                                  'birdclef.network.FusedStem.forward': ('network.html#fusedstem.forward', 'birdclef/network.py'),
+                                  'birdclef.network.QuantizedEfficientNetV2': ( 'network.html#quantizedefficientnetv2',
+                                                                                'birdclef/network.py'),
+                                  'birdclef.network.QuantizedEfficientNetV2.__init__': ( 'network.html#quantizedefficientnetv2.__init__',
+                                                                                         'birdclef/network.py'),
+                                  'birdclef.network.QuantizedEfficientNetV2.forward': ( 'network.html#quantizedefficientnetv2.forward',
+                                                                                        'birdclef/network.py'),
+                                  'birdclef.network._can_fuse_stem': ('network.html#_can_fuse_stem', 'birdclef/network.py'),
+                                  'birdclef.network._fold_batch_norms': ('network.html#_fold_batch_norms', 'birdclef/network.py'),
+                                  'birdclef.network.get_model': ('network.html#get_model', 'birdclef/network.py'),
+                                  'birdclef.network.optimize_for_inference': ('network.html#optimize_for_inference', 'birdclef/network.py'),
+                                  'birdclef.network.quantize_model': ('network.html#quantize_model', 'birdclef/network.py')},
+            'birdclef.preprocessing': { 'birdclef.preprocessing._resample_file': ( 'preprocessing.html#_resample_file',
+                                                                                   'birdclef/preprocessing.py'),
+                                        'birdclef.preprocessing.filter_metadata': ( 'preprocessing.html#filter_metadata',
+                                                                                    'birdclef/preprocessing.py'),
+                                        'birdclef.preprocessing.oversample_metadata': ( 'preprocessing.html#oversample_metadata',
+                                                                                        'birdclef/preprocessing.py'),
+                                        'birdclef.preprocessing.preprocess': ('preprocessing.html#preprocess', 'birdclef/preprocessing.py'),
+                                        'birdclef.preprocessing.preprocess_cli': ( 'preprocessing.html#preprocess_cli',
+                                                                                   'birdclef/preprocessing.py'),
+                                        'birdclef.preprocessing.resample_audio': ( 'preprocessing.html#resample_audio',
+                                                                                   'birdclef/preprocessing.py'),
+                                        'birdclef.preprocessing.split_metadata': ( 'preprocessing.html#split_metadata',
+                                                                                   'birdclef/preprocessing.py')},
+            'birdclef.profiling': { 'birdclef.profiling.TimedCollate': ('profiling.html#timedcollate', 'birdclef/profiling.py'),
+                                    'birdclef.profiling.TimedCollate.__call__': ( 'profiling.html#timedcollate.__call__',
+                                                                                  'birdclef/profiling.py'),
+                                    'birdclef.profiling.TimedCollate.__init__': ( 'profiling.html#timedcollate.__init__',
+                                                                                  'birdclef/profiling.py'),
+                                    'birdclef.profiling._Stage': ('profiling.html#_stage', 'birdclef/profiling.py'),
+                                    'birdclef.profiling._Stage.__enter__': ('profiling.html#_stage.__enter__', 'birdclef/profiling.py'),
+                                    'birdclef.profiling._Stage.__exit__': ('profiling.html#_stage.__exit__', 'birdclef/profiling.py'),
+                                    'birdclef.profiling._Stage.__init__': ('profiling.html#_stage.__init__', 'birdclef/profiling.py'),
+                                    'birdclef.profiling.add_timings': ('profiling.html#add_timings', 'birdclef/profiling.py'),
+                                    'birdclef.profiling.collect_timings': ('profiling.html#collect_timings', 'birdclef/profiling.py'),
+                                    'birdclef.profiling.enable_profiling': ('profiling.html#enable_profiling', 'birdclef/profiling.py'),
+                                    'birdclef.profiling.merge_timings': ('profiling.html#merge_timings', 'birdclef/profiling.py'),
+                                    'birdclef.profiling.profiling_enabled': ('profiling.html#profiling_enabled', 'birdclef/profiling.py'),
+                                    'birdclef.profiling.stage': ('profiling.html#stage', 'birdclef/profiling.py'),
+                                    'birdclef.profiling.timed': ('profiling.html#timed', 'birdclef/profiling.py'),
+                                    'birdclef.profiling.timing_summary': ('profiling.html#timing_summary', 'birdclef/profiling.py'),
+                                    'birdclef.profiling.trace_profiler': ('profiling.html#trace_profiler', 'birdclef/profiling.py')},
+            'birdclef.quantization': { 'birdclef.quantization.calibration_batches': ( 'quantization.html#calibration_batches',
+                                                                                      'birdclef/quantization.py'),
+                                       'birdclef.quantization.quantize': ('quantization.html#quantize', 'birdclef/quantization.py'),
+                                       'birdclef.quantization.quantize_cli': ( 'quantization.html#quantize_cli',
+                                                                               'birdclef/quantization.py')},
+            'birdclef.serving': { 'birdclef.serving.BatchingServer': ('serving.html#batchingserver', 'birdclef/serving.py'),
+                                  'birdclef.serving.BatchingServer.__init__': ( 'serving.html#batchingserver.__init__',
+                                                                                'birdclef/serving.py'),
+                                  'birdclef.serving.BatchingServer._batch_loop': ( 'serving.html#batchingserver._batch_loop',
+                                                                                   'birdclef/serving.py'),
+                                  'birdclef.serving.BatchingServer.start': ('serving.html#batchingserver.start', 'birdclef/serving.py'),
+                                  'birdclef.serving.BatchingServer.stats': ('serving.html#batchingserver.stats', 'birdclef/serving.py'),
+                                  'birdclef.serving.BatchingServer.stop': ('serving.html#batchingserver.stop', 'birdclef/serving.py'),
+                                  'birdclef.serving.BatchingServer.submit': ('serving.html#batchingserver.submit', 'birdclef/serving.py'),
+                                  'birdclef.serving.InferenceModel': ('serving.html#inferencemodel', 'birdclef/serving.py'),
+                                  'birdclef.serving.InferenceModel.__init__': ( 'serving.html#inferencemodel.__init__',
+                                                                                'birdclef/serving.py'),
+                                  'birdclef.serving.InferenceModel.features': ( 'serving.html#inferencemodel.features',
+                                                                                'birdclef/serving.py'),
+                                  'birdclef.serving.InferenceModel.forward': ('serving.html#inferencemodel.forward', 'birdclef/serving.py'),
+                                  'birdclef.serving.export_model': ('serving.html#export_model', 'birdclef/serving.py'),
+                                  'birdclef.serving.export_model_cli': ('serving.html#export_model_cli', 'birdclef/serving.py'),
+                                  'birdclef.serving.load_exported': ('serving.html#load_exported', 'birdclef/serving.py'),
+                                  'birdclef.serving.serve_cli': ('serving.html#serve_cli', 'birdclef/serving.py')},
+            'birdclef.store': { 'birdclef.store.AudioStore': ('store.html#audiostore', 'birdclef/store.py'),
+                                'birdclef.store.AudioStore.__contains__': ('store.html#audiostore.__contains__', 'birdclef/store.py'),
+                                'birdclef.store.AudioStore.__init__': ('store.html#audiostore.__init__', 'birdclef/store.py'),
+                                'birdclef.store.AudioStore._key': ('store.html#audiostore._key', 'birdclef/store.py'),
+                                'birdclef.store.AudioStore._shard': ('store.html#audiostore._shard', 'birdclef/store.py'),
+                                'birdclef.store.AudioStore.load': ('store.html#audiostore.load', 'birdclef/store.py'),
+                                'birdclef.store.AudioStore.num_frames': ('store.html#audiostore.num_frames', 'birdclef/store.py'),
+                                'birdclef.store._decode': ('store.html#_decode', 'birdclef/store.py'),
+                                'birdclef.store.build_store': ('store.html#build_store', 'birdclef/store.py'),
+                                'birdclef.store.build_store_cli': ('store.html#build_store_cli', 'birdclef/store.py')},
+            'birdclef.trainer': { 'birdclef.trainer._SyntheticDataset': ('trainer.html#_syntheticdataset', 'birdclef/trainer.py'),
+                                  'birdclef.trainer._SyntheticDataset.__getitem__': ( 'trainer.html#_syntheticdataset.__getitem__',
+                                                                                      'birdclef/trainer.py'),
+                                  'birdclef.trainer._SyntheticDataset.__init__': ( 'trainer.html#_syntheticdataset.__init__',
+                                                                                   'birdclef/trainer.py'),
+                                  'birdclef.trainer._SyntheticDataset.__len__': ( 'trainer.html#_syntheticdataset.__len__',
+                                                                                  'birdclef/trainer.py'),
+                                  'birdclef.trainer._check_run': ('trainer.html#_check_run', 'birdclef/trainer.py'),
+                                  'birdclef.trainer._check_worker': ('trainer.html#_check_worker', 'birdclef/trainer.py'),
+                                  'birdclef.trainer._fit': ('trainer.html#_fit', 'birdclef/trainer.py'),
+                                  'birdclef.trainer._fit_worker': ('trainer.html#_fit_worker', 'birdclef/trainer.py'),
+                                  'birdclef.trainer._timing_logs': ('trainer.html#_timing_logs', 'birdclef/trainer.py'),
+                                  'birdclef.trainer.check_distributed': ('trainer.html#check_distributed', 'birdclef/trainer.py'),
+                                  'birdclef.trainer.log_weights': ('trainer.html#log_weights', 'birdclef/trainer.py'),
                                   'birdclef.trainer.train': ('trainer.html#train', 'birdclef/trainer.py'),
                                   'birdclef.trainer.train_one_epoch': ('trainer.html#train_one_epoch', 'birdclef/trainer.py'),
                                   'birdclef.trainer.validate_model': ('trainer.html#validate_model', 'birdclef/trainer.py')},
-            'birdclef.training_utils': { 'birdclef.training_utils.compute_metrics': ( 'training_utils.html#compute_metrics',
+            'birdclef.training_utils': { 'birdclef.training_utils.CmapAccumulator': ( 'training_utils.html#cmapaccumulator',
+                                                                                      'birdclef/training_utils.py'),
+                                         'birdclef.training_utils.CmapAccumulator.__init__': ( 'training_utils.html#cmapaccumulator.__init__',
+                                                                                               'birdclef/training_utils.py'),
+                                         'birdclef.training_utils.CmapAccumulator.compute': ( 'training_utils.html#cmapaccumulator.compute',
+                                                                                              'birdclef/training_utils.py'),
+                                         'birdclef.training_utils.CmapAccumulator.reset': ( 'training_utils.html#cmapaccumulator.reset',
+                                                                                            'birdclef/training_utils.py'),
+                                         'birdclef.training_utils.CmapAccumulator.update': ( 'training_utils.html#cmapaccumulator.update',
+                                                                                             'birdclef/training_utils.py'),
+                                         'birdclef.training_utils.MetricAccumulator': ( 'training_utils.html#metricaccumulator',
+                                                                                        'birdclef/training_utils.py'),
+                                         'birdclef.training_utils.MetricAccumulator.__init__': ( 'training_utils.html#metricaccumulator.__init__',
+                                                                                                 'birdclef/training_utils.py'),
+                                         'birdclef.training_utils.MetricAccumulator._reduce': ( 'training_utils.html#metricaccumulator._reduce',
+                                                                                                'birdclef/training_utils.py'),
+                                         'birdclef.training_utils.MetricAccumulator.class_report': ( 'training_utils.html#metricaccumulator.class_report',
+                                                                                                     'birdclef/training_utils.py'),
+                                         'birdclef.training_utils.MetricAccumulator.compute': ( 'training_utils.html#metricaccumulator.compute',
+                                                                                                'birdclef/training_utils.py'),
+                                         'birdclef.training_utils.MetricAccumulator.reset': ( 'training_utils.html#metricaccumulator.reset',
+                                                                                              'birdclef/training_utils.py'),
+                                         'birdclef.training_utils.MetricAccumulator.update': ( 'training_utils.html#metricaccumulator.update',
+                                                                                               'birdclef/training_utils.py'),
+                                         'birdclef.training_utils.__getattr__': ( 'training_utils.html#__getattr__',
+                                                                                  'birdclef/training_utils.py'),
+                                         'birdclef.training_utils.autocast': ('training_utils.html#autocast', 'birdclef/training_utils.py'),
+                                         'birdclef.training_utils.compute_metrics': ( 'training_utils.html#compute_metrics',
                                                                                       'birdclef/training_utils.py'),
+                                         'birdclef.training_utils.fast_padded_cmap': ( 'training_utils.html#fast_padded_cmap',
+                                                                                       'birdclef/training_utils.py'),
                                          'birdclef.training_utils.focal_loss': ( 'training_utils.html#focal_loss',
                                                                                  'birdclef/training_utils.py'),
                                          'birdclef.training_utils.get_callback_func': ( 'training_utils.html#get_callback_func',
@@ -39,10 +346,51 @@ d = { 'settings': { 'branch': 'master',
                                                                                        'birdclef/training_utils.py'),
                                          'birdclef.training_utils.get_optimizer': ( 'training_utils.html#get_optimizer',
                                                                                     'birdclef/training_utils.py'),
+                                         'birdclef.training_utils.get_sample_weights': ( 'training_utils.html#get_sample_weights',
+                                                                                         'birdclef/training_utils.py'),
+                                         'birdclef.training_utils.is_main_process': ( 'training_utils.html#is_main_process',
+                                                                                      'birdclef/training_utils.py'),
                                          'birdclef.training_utils.padded_cmap': ( 'training_utils.html#padded_cmap',
                                                                                   'birdclef/training_utils.py'),
                                          'birdclef.training_utils.show_one_example': ( 'training_utils.html#show_one_example',
                                                                                        'birdclef/training_utils.py')},
+            'birdclef.transforms': { 'birdclef.transforms.BatchAugment': ('transforms.html#batchaugment', 'birdclef/transforms.py'),
+                                     'birdclef.transforms.BatchAugment.__init__': ( 'transforms.html#batchaugment.__init__',
+                                                                                    'birdclef/transforms.py'),
+                                     'birdclef.transforms.BatchAugment._coin': ( 'transforms.html#batchaugment._coin',
+                                                                                 'birdclef/transforms.py'),
+                                     'birdclef.transforms.BatchAugment._mask': ( 'transforms.html#batchaugment._mask',
+                                                                                 'birdclef/transforms.py'),
+                                     'birdclef.transforms.BatchAugment.forward': ( 'transforms.html#batchaugment.forward',
+                                                                                   'birdclef/transforms.py'),
+                                     'birdclef.transforms.BatchAugment.reseed': ( 'transforms.html#batchaugment.reseed',
+                                                                                  'birdclef/transforms.py'),
+                                     'birdclef.transforms.CropLength': ('transforms.html#croplength', 'birdclef/transforms.py'),
+                                     'birdclef.transforms.CropLength.forward': ( 'transforms.html#croplength.forward',
+                                                                                 'birdclef/transforms.py'),
+                                     'birdclef.transforms.InterpolateLength': ( 'transforms.html#interpolatelength',
+                                                                                'birdclef/transforms.py'),
+                                     'birdclef.transforms.InterpolateLength.forward': ( 'transforms.html#interpolatelength.forward',
+                                                                                        'birdclef/transforms.py'),
+                                     'birdclef.transforms.PCEN': ('transforms.html#pcen', 'birdclef/transforms.py'),
+                                     'birdclef.transforms.PCEN.__init__': ('transforms.html#pcen.__init__', 'birdclef/transforms.py'),
+                                     'birdclef.transforms.PCEN.forward': ('transforms.html#pcen.forward', 'birdclef/transforms.py'),
+                                     'birdclef.transforms.PCEN.smooth': ('transforms.html#pcen.smooth', 'birdclef/transforms.py'),
+                                     'birdclef.transforms.PCEN.smooth_matrix': ( 'transforms.html#pcen.smooth_matrix',
+                                                                                 'birdclef/transforms.py'),
+                                     'birdclef.transforms.PadLength': ('transforms.html#padlength', 'birdclef/transforms.py'),
+                                     'birdclef.transforms.PadLength.forward': ( 'transforms.html#padlength.forward',
+                                                                                'birdclef/transforms.py'),
+                                     'birdclef.transforms.StretchLength': ('transforms.html#stretchlength', 'birdclef/transforms.py'),
+                                     'birdclef.transforms.StretchLength.__init__': ( 'transforms.html#stretchlength.__init__',
+                                                                                     'birdclef/transforms.py'),
+                                     'birdclef.transforms.StretchLength.forward': ( 'transforms.html#stretchlength.forward',
+                                                                                    'birdclef/transforms.py'),
+                                     'birdclef.transforms.TileLength': ('transforms.html#tilelength', 'birdclef/transforms.py'),
+                                     'birdclef.transforms.TileLength.forward': ( 'transforms.html#tilelength.forward',
+                                                                                 'birdclef/transforms.py'),
+                                     'birdclef.transforms.get_length_policy': ( 'transforms.html#get_length_policy',
+                                                                                'birdclef/transforms.py')},
             'birdclef.utils': { 'birdclef.utils.mel_to_wave': ('utils.html#mel_to_wave', 'birdclef/utils.py'),
                                 'birdclef.utils.plot_audio': ('utils.html#plot_audio', 'birdclef/utils.py'),
                                 'birdclef.utils.plot_fbank': ('utils.html#plot_fbank', 'birdclef/utils.py'),
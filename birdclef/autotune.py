@@ -0,0 +1,198 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/17_autotune.ipynb.
+
+# %% auto 0
+__all__ = ['probe_dataloader', 'candidate_settings', 'autotune_dataloader', 'autotune_cli']
+
+# %% ../nbs/17_autotune.ipynb 3
+import os
+import json
+import time
+import platform
+from pathlib import Path
+
+import pandas as pd
+import torch
+from fastcore.script import call_parse
+
+from .dataset import get_dataloader
+from .utils import CACHE_DIR
+
+# %% ../nbs/17_autotune.ipynb 4
+def _rss_mb(pids:list)->float:
+    "Resident memory of some processes in MB, 0 where /proc is not available"
+    total = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/statm') as f:
+                total += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, ValueError):
+            pass
+    return total / 2 ** 20
+
+def _batch_mb(batch)->float:
+    "Size of the tensors of a batch in MB"
+    if isinstance(batch, torch.Tensor):
+        return batch.nbytes / 2 ** 20
+    if isinstance(batch, dict):
+        return sum(_batch_mb(v) for v in batch.values())
+    if isinstance(batch, (list, tuple)):
+        return sum(_batch_mb(v) for v in batch)
+    return 0
+
+def _available_mb()->float:
+    "Memory available on the host in MB, None if it is unknown"
+    try:
+        return os.sysconf('SC_AVPHYS_PAGES') * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (ValueError, OSError, AttributeError):
+        return None
+
+# %% ../nbs/17_autotune.ipynb 6
+def probe_dataloader(dataset_key:str,           # A key of the dataset dictionary
+                     dataloader_kwargs:dict={}, # The parameters of the dataloader
+                     n_batches:int=20,          # Number of timed batches
+                     warmup_batches:int=2       # Batches loaded before timing, they include the start of the workers
+                     )->dict:                   # Throughput, start-up time, batches per epoch and memory
+    "Measures the steady throughput of a dataloader, the wait for its first batch and the memory of its workers and batches"
+    dataloader = get_dataloader(dataset_key, dataloader_kwargs)
+    batch_size = dataloader_kwargs.get('batch_size', 1)
+    n_epoch_batches = len(dataloader)
+
+    start = time.perf_counter()
+    iterator = iter(dataloader)
+    pids = [w.pid for w in getattr(iterator, '_workers', [])]
+    first = next(iterator)
+    startup_s = time.perf_counter() - start
+
+    # Batches are numbered from 1, short epochs are timed from the second one
+    warmup_batches = min(max(warmup_batches, 1), n_epoch_batches - 1)
+    # The workers keep loading while the main process waits, the memory is read at every batch
+    rss_mb = _rss_mb(pids)
+    start, n_examples = time.perf_counter(), 0
+    for i, batch in enumerate(iterator, start=2):
+        rss_mb = max(rss_mb, _rss_mb(pids))
+        if i <= warmup_batches:
+            start = time.perf_counter()
+            continue
+        n_examples += len(batch['label'])
+        if i == warmup_batches + n_batches:
+            break
+    elapsed = time.perf_counter() - start
+    del iterator
+
+    # An epoch of a single batch only has the first one
+    examples_per_sec = n_examples / elapsed if n_examples > 0 else len(first['label']) / startup_s
+
+    # Batches in flight: prefetched by every worker, plus a pinned copy
+    in_flight = max(1, dataloader_kwargs.get('num_workers', 0) * (dataloader_kwargs.get('prefetch_factor') or 2))
+    batch_mb = _batch_mb(first)
+    return {'examples_per_sec': examples_per_sec, 'startup_s': startup_s,
+            'n_batches': n_epoch_batches, 'batch_size': batch_size,
+            'memory_mb': rss_mb + in_flight * batch_mb * (2 if dataloader_kwargs.get('pin_memory', False) else 1)}
+
+# %% ../nbs/17_autotune.ipynb 9
+def _epoch_reaches_workers(dataset)->bool:
+    "Whether persistent workers see the epoch set on the dataset of the main process, the package datasets keep it in shared memory"
+    if dataset is None or not hasattr(dataset, 'set_epoch'):
+        return True
+    epoch = getattr(dataset, '_epoch', None)
+    shared = isinstance(epoch, torch.Tensor) and epoch.is_shared()
+    # `MultiCrop` also sets the epoch of the dataset it wraps
+    return shared and _epoch_reaches_workers(getattr(dataset, 'dataset', None))
+
+def candidate_settings(max_workers:int=None,            # Largest number of workers, the cpus of the host if None
+                       prefetch_factors:tuple=(2, 4),   # Batches loaded in advance by each worker
+                       batch_sizes:tuple=(None,)        # Batch sizes, None keeps the one of the dataloader parameters
+                       )->list:                         # Dataloader parameters
+    "The grid of settings probed by `autotune_dataloader`, pinned memory is only tried when there is a gpu"
+    max_workers = max_workers if max_workers is not None else os.cpu_count()
+    workers = sorted({0, *[2 ** i for i in range(max_workers.bit_length()) if 2 ** i <= max_workers], max_workers})
+    pin_memory = (False, True) if torch.cuda.is_available() else (False,)
+
+    candidates = []
+    for batch_size in batch_sizes:
+        for num_workers in workers:
+            # The DataLoader refuses a prefetch factor without workers
+            for prefetch_factor in (prefetch_factors if num_workers > 0 else (None,)):
+                for pin in pin_memory:
+                    candidate = {'num_workers': num_workers, 'prefetch_factor': prefetch_factor, 'pin_memory': pin}
+                    if batch_size is not None:
+                        candidate['batch_size'] = batch_size
+                    candidates.append(candidate)
+    return candidates
+
+# %% ../nbs/17_autotune.ipynb 10
+def autotune_dataloader(dataset_key:str,                        # A key of the dataset dictionary
+                        dataloader_kwargs:dict={},              # The parameters of the dataloader, the tuned ones are replaced
+                        memory_budget_mb:float=None,            # Largest memory of the workers and batches in flight of all the processes, half of the available memory if None
+                        max_workers:int=None,                   # Largest number of workers, the cpus of each process but one if None
+                        prefetch_factors:tuple=(2, 4),          # Batches loaded in advance by each worker
+                        batch_sizes:tuple=(None,),              # Batch sizes, None keeps the one of `dataloader_kwargs`
+                        world_size:int=1,                       # Number of training processes sharing the cpus and the memory of the host
+                        n_batches:int=20,                       # Number of timed batches of each setting
+                        warmup_batches:int=2,                   # Batches loaded before timing
+                        cache_path:str=CACHE_DIR + 'autotune.json', # Results by host and dataset, None to always probe
+                        refresh:bool=False,                     # Probes again even if a result is cached
+                        verbose:bool=False                      # Prints the probe of every setting
+                        )->dict:                                # `dataloader_kwargs` with the fastest settings
+    "Probes the candidate settings on the dataset and picks the one with the shortest epoch under the memory budget"
+    # A result is valid for the same host, dataset, fixed parameters and search space
+    fixed = {k: v for k, v in dataloader_kwargs.items() if k not in ('num_workers', 'prefetch_factor', 'persistent_workers', 'pin_memory')}
+    key = json.dumps({'dataset_key': dataset_key, 'kwargs': fixed, 'memory_budget_mb': memory_budget_mb, 'max_workers': max_workers,
+                      'prefetch_factors': list(prefetch_factors), 'batch_sizes': list(batch_sizes), 'world_size': world_size},
+                     sort_keys=True, default=str)
+    host = platform.node()
+    cache = json.loads(Path(cache_path).read_text()) if cache_path is not None and Path(cache_path).exists() else {}
+    if not refresh and key in cache.get(host, {}):
+        return {**dataloader_kwargs, **cache[host][key]}
+
+    # The processes of a distributed run share the host, the main process of each one needs a cpu
+    if memory_budget_mb is None and _available_mb() is not None:
+        memory_budget_mb = _available_mb() / 2
+    memory_budget_mb = memory_budget_mb / world_size if memory_budget_mb is not None else None
+    max_workers = max_workers if max_workers is not None else max(0, os.cpu_count() // world_size - 1)
+
+    # Persistent workers keep their copy of the dataset. Unless the epoch reaches them, every epoch would replay the order
+    # and the augmentations of the first one.
+    persistent_workers = (False, True) if _epoch_reaches_workers(get_dataloader(dataset_key, fixed).dataset) else (False,)
+
+    rows = []
+    for candidate in candidate_settings(max_workers, prefetch_factors, batch_sizes):
+        kwargs = {**fixed, **candidate}
+        result = probe_dataloader(dataset_key, kwargs, n_batches, warmup_batches)
+        steady_s = result['n_batches'] * result['batch_size'] / result['examples_per_sec']
+        # The same probe gives both: persistent workers start once per run, the others at every epoch
+        for persistent in (persistent_workers if candidate['num_workers'] > 0 else (False,)):
+            rows.append({**candidate, 'persistent_workers': persistent, **result,
+                         'epoch_s': steady_s + (0 if persistent else result['startup_s'])})
+    probes = pd.DataFrame(rows)
+
+    if verbose:
+        print(probes.to_string())
+
+    feasible = probes if memory_budget_mb is None else probes[probes.memory_mb <= memory_budget_mb]
+    # Without workers the memory is the one of the main process, this setting always fits
+    best = rows[(feasible if len(feasible) > 0 else probes[probes.num_workers == 0]).epoch_s.idxmin()]
+    settings = {k: best[k] for k in ['num_workers', 'prefetch_factor', 'persistent_workers', 'pin_memory']}
+    if batch_sizes != (None,):
+        settings['batch_size'] = best['batch_size']
+
+    if cache_path is not None:
+        # Other hosts sharing the file keep their results
+        cache.setdefault(host, {})[key] = settings
+        Path(cache_path).parent.mkdir(parents=True, exist_ok=True)
+        Path(cache_path).write_text(json.dumps(cache, indent=2))
+
+    return {**dataloader_kwargs, **settings}
+
+# %% ../nbs/17_autotune.ipynb 14
+@call_parse
+def autotune_cli(dataset_key:str='train_base_per_channel',  # A key of the dataset dictionary
+                 batch_size:int=32,                          # Batch size of the dataloader
+                 memory_budget_mb:float=None,                # Largest memory of the workers and of the batches in flight
+                 max_workers:int=None,                       # Largest number of workers
+                 refresh:bool=False                          # Probes again even if a result is cached
+                 ):
+    "Command line entry point of `autotune_dataloader`"
+    kwargs = autotune_dataloader(dataset_key, {'batch_size': batch_size, 'shuffle': True}, memory_budget_mb, max_workers,
+                                 refresh=refresh, verbose=True)
+    print(f'Fastest dataloader parameters for {dataset_key}: {kwargs}')
@@ -0,0 +1,548 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/11_benchmark.ipynb.
+
+# %% auto 0
+__all__ = ['benchmark_length_policies', 'benchmark_import_time', 'benchmark_padded_cmap', 'benchmark_precision',
+           'benchmark_server', 'benchmark_quantization', 'benchmark_optimize_for_inference', 'make_synthetic_data',
+           'synthetic_data', 'benchmark_pipeline', 'benchmark_dataloader', 'benchmark_models', 'benchmark_metrics',
+           'run_benchmarks', 'compare_benchmarks', 'benchmark_cli']
+
+# %% ../nbs/11_benchmark.ipynb 3
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import tempfile
+import itertools
+import contextlib
+import subprocess
+import importlib.util
+import urllib.request
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+import torch
+import torchaudio
+from fastcore.script import call_parse
+
+from .transforms import length_policy_dict, get_length_policy
+from .training_utils import padded_cmap, fast_padded_cmap, autocast, CmapAccumulator, compute_metrics, MetricAccumulator
+from .dataset import MyPipeline, get_metadata, get_dataloader
+from .preprocessing import split_metadata
+from .utils import AUDIO_DATA_DIR
+
+# %% ../nbs/11_benchmark.ipynb 5
+def _timeit(fn, repeat=20, warmup=2):
+    "Calls `fn` repeatedly and returns the duration of each call in seconds"
+    for _ in range(warmup):
+        fn()
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return np.array(times)
+
+# %% ../nbs/11_benchmark.ipynb 6
+def _summary(times):
+    "Per-call statistics in milliseconds"
+    return {'mean_ms': times.mean() * 1e3, 'p50_ms': np.percentile(times, 50) * 1e3, 'p99_ms': np.percentile(times, 99) * 1e3}
+
+# %% ../nbs/11_benchmark.ipynb 8
+def benchmark_length_policies(n_mels:int=128,                               # Number of mel bins
+                              length:int=157,                               # Target number of frames (5s at 32kHz)
+                              input_lengths:tuple=(40, 100, 157, 230, 320), # Number of frames of the inputs
+                              repeat:int=50                                 # Number of timed calls for each case
+                              )->pd.DataFrame:                              # One row per policy and input length
+    "Measures the per-sample cost and the output shape of every length policy"
+    rows = []
+    for policy in length_policy_dict.keys():
+        fix_length = get_length_policy(policy, n_freq=n_mels)
+        for input_length in input_lengths:
+            mel = torch.rand(1, n_mels, input_length)
+            with torch.inference_mode():
+                times = _timeit(lambda: fix_length(mel, length), repeat)
+                shape = tuple(fix_length(mel, length).shape)
+            rows.append({'policy': policy, 'input_frames': input_length, 'output_shape': shape, **_summary(times)})
+
+    return pd.DataFrame(rows)
+
+# %% ../nbs/11_benchmark.ipynb 11
+def benchmark_import_time(modules:tuple=('birdclef.dataset', 'birdclef.training_utils', 'birdclef.trainer'), # Modules to import
+                          forbidden:tuple=('matplotlib', 'IPython', 'wandb'), # Modules which must not be imported as a side effect
+                          max_seconds:float=None,   # Fails if an import takes longer, not checked if None
+                          repeat:int=3              # Number of fresh interpreters for each module
+                          )->pd.DataFrame:          # One row per module
+    "Measures the import time of each module in fresh interpreters started in an empty directory without data"
+    code = ("import sys, time; start = time.perf_counter(); import {}; print(time.perf_counter() - start); "
+            "print(','.join(sys.modules))")
+    # The interpreters import the package from where this one does, also from a notebook
+    root = os.path.dirname(os.path.dirname(importlib.util.find_spec('birdclef').origin))
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join([root, os.environ.get('PYTHONPATH', '')])}
+
+    rows = []
+    with tempfile.TemporaryDirectory() as cwd:
+        for module in modules:
+            times = []
+            for _ in range(repeat):
+                # Fails if the import reads data files, since there are none in cwd
+                out = subprocess.run([sys.executable, '-c', code.format(module)], cwd=cwd, env=env,
+                                     capture_output=True, text=True, check=True).stdout.splitlines()
+                times.append(float(out[0]))
+            loaded = set(out[1].split(','))
+            rows.append({'module': module, 'min_s': min(times), 'mean_s': np.mean(times),
+                         'forbidden': sorted(loaded.intersection(forbidden))})
+
+    df = pd.DataFrame(rows)
+    for row in df.itertuples():
+        assert len(row.forbidden) == 0, f'Importing {row.module} also imports {row.forbidden}.'
+        assert max_seconds is None or row.min_s <= max_seconds, f'Importing {row.module} takes {row.min_s:.2f}s, more than {max_seconds}s.'
+
+    return df
+
+# %% ../nbs/11_benchmark.ipynb 15
+def benchmark_padded_cmap(sizes:tuple=(256, 1024, 4096, 16384),    # Numbers of examples, up to a full validation set
+                          num_classes:int=264,                      # Number of classes of the competition
+                          repeat:int=5,                             # Number of timed calls for each case
+                          seed:int=0                                # Seed of the random outputs and labels
+                          )->pd.DataFrame:                          # One row per implementation and size
+    "Compares the sklearn and the vectorised padded cmap on random softmax outputs, checking that they agree within 1e-6"
+    rng = np.random.default_rng(seed)
+
+    rows = []
+    for size in sizes:
+        labels = np.eye(num_classes)[rng.integers(0, num_classes, size)]
+        outputs = torch.softmax(torch.from_numpy(rng.normal(size=(size, num_classes))), dim=1).numpy()
+
+        reference = padded_cmap(outputs, labels)
+        for name, fn in [('sklearn', padded_cmap), ('vectorised', fast_padded_cmap)]:
+            score = fn(outputs, labels)
+            assert abs(score - reference) < 1e-6, f'{name} gives {score} instead of {reference} with {size} examples.'
+            times = _timeit(lambda: fn(outputs, labels), repeat, warmup=1)
+            rows.append({'implementation': name, 'examples': size, 'score': score, **_summary(times)})
+
+    return pd.DataFrame(rows)
+
+# %% ../nbs/11_benchmark.ipynb 17
+def benchmark_precision(model_key:str='efficient_net_v2_s',    # A key of the model dictionary
+                        num_classes:int=264,                    # Number of classes to predict
+                        batch_size:int=16,                      # Number of examples of each step
+                        input_shape:tuple=(1, 128, 157),        # Shape of one mel spectrogram
+                        modes:tuple=((None, False), ('bf16', False), (None, True), ('bf16', True)), # (amp, channels_last) pairs
+                        device:str='cpu',                       # The device where the model is run
+                        repeat:int=5,                           # Number of timed training steps of each mode
+                        seed:int=0                              # Seed of the weights and of the inputs
+                        )->pd.DataFrame:                        # One row per mode
+    "Compares the training throughput and the outputs of each autocast precision and memory format against fp32"
+    from birdclef.network import get_model
+
+    torch.manual_seed(seed)
+    model = get_model(model_key, num_classes=num_classes).to(device)
+    inputs = torch.randn(batch_size, *input_shape, device=device)
+    labels = torch.randint(0, num_classes, (batch_size,), device=device)
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.0)
+
+    # Evaluation mode, so that the outputs only depend on the precision
+    model.eval()
+    with torch.inference_mode():
+        reference = model(inputs).float()
+    # The training steps update the batch norm statistics even without learning rate, they are restored after each mode
+    state = {k: v.clone() for k, v in model.state_dict().items()}
+
+    rows = []
+    for amp, channels_last in modes:
+        memory_format = torch.channels_last if channels_last else torch.contiguous_format
+        model.to(memory_format=memory_format)
+        x = inputs.contiguous(memory_format=memory_format)
+
+        model.eval()
+        with torch.inference_mode(), autocast(device, amp):
+            outputs = model(x).float()
+
+        def step():
+            optimizer.zero_grad()
+            with autocast(device, amp):
+                loss = torch.nn.functional.cross_entropy(model(x), labels)
+            loss.backward()
+            optimizer.step()
+            if device != 'cpu':
+                torch.cuda.synchronize()
+
+        model.train()
+        times = _timeit(step, repeat, warmup=1)
+        model.load_state_dict(state)
+        rows.append({'amp': amp or 'fp32', 'channels_last': channels_last,
+                     'examples_per_sec': batch_size / times.mean(),
+                     'max_abs_diff': (outputs - reference).abs().max().item(),
+                     'top1_agreement': (outputs.argmax(1) == reference.argmax(1)).float().mean().item(),
+                     **_summary(times)})
+
+    model.to(memory_format=torch.contiguous_format)
+    return pd.DataFrame(rows)
+
+# %% ../nbs/11_benchmark.ipynb 19
+def benchmark_server(model_path:str,                # An artifact written by `export_model`
+                     n_requests:int=256,            # Number of clips sent to the server
+                     concurrency:tuple=(1, 8, 32),  # Numbers of clients sending clips at the same time
+                     max_batch_size:int=32,         # Largest batch given to the model
+                     max_latency_ms:float=10        # Longest time a clip waits for its batch to fill
+                     )->pd.DataFrame:               # One row per concurrency level
+    "Serves an exported model on localhost and measures the latency seen by the clients and the server throughput"
+    from birdclef.serving import BatchingServer, load_exported
+
+    predict, metadata = load_exported(model_path)
+    clip = (np.random.default_rng(0).normal(size=metadata['num_samples']) * 0.1).astype(np.float32).tobytes()
+
+    rows = []
+    for clients in concurrency:
+        server = BatchingServer(predict, metadata['classes'], metadata['num_samples'], max_batch_size, max_latency_ms).start()
+
+        def request(_):
+            start = time.perf_counter()
+            with urllib.request.urlopen(urllib.request.Request(server.url + '/predict', data=clip)) as response:
+                response.read()
+            return time.perf_counter() - start
+
+        try:
+            with ThreadPoolExecutor(clients) as pool:
+                start = time.perf_counter()
+                times = np.array(list(pool.map(request, range(n_requests))))
+                elapsed = time.perf_counter() - start
+            stats = server.stats()
+        finally:
+            server.stop()
+
+        rows.append({'clients': clients, 'clips_per_sec': n_requests / elapsed, **_summary(times),
+                     'server_p50_ms': stats['p50_ms'], 'server_p99_ms': stats['p99_ms'], 'mean_batch_size': stats['mean_batch_size']})
+
+    return pd.DataFrame(rows)
+
+# %% ../nbs/11_benchmark.ipynb 21
+def benchmark_quantization(model_key:str,                               # A key of the float model in the model dictionary
+                           weights_path:str,                            # The weights of the trained float model
+                           calibration_key:str='val_base_per_channel',  # The dataset of the calibration examples
+                           eval_key:str='test_base_per_channel',        # The dataset on which the padded cmap is computed
+                           modes:tuple=('dynamic', 'static'),           # Quantisation modes compared with fp32
+                           n_batches:int=8,                             # Number of calibration batches
+                           batch_sizes:tuple=(1, 16),                   # Batch sizes of the latency measurements
+                           num_classes:int=264,                         # Number of classes to predict
+                           repeat:int=10,                               # Number of timed calls for each batch size
+                           dataloader_kwargs:dict={'batch_size': 16}    # Parameters of the evaluation dataloader
+                           )->pd.DataFrame:                             # One row per model
+    "Padded cmap and cpu latency of the quantised models against the fp32 model, to weigh the speedup against the accuracy cost"
+    from birdclef.network import get_model, QuantizedEfficientNetV2
+    from birdclef.quantization import calibration_batches
+
+    models = {'fp32': get_model(model_key, weights_path, num_classes=num_classes).eval()}
+    calibration = calibration_batches(calibration_key, n_batches) if 'static' in modes else None
+    for mode in modes:
+        models[mode] = QuantizedEfficientNetV2(num_classes, mode=mode, model=models['fp32'],
+                                               calibration=calibration if mode == 'static' else None).eval()
+
+    # Every model sees the same examples, decoded once
+    eval_dl = get_dataloader(eval_key, dataloader_kwargs)
+    accumulators = {name: CmapAccumulator(num_classes) for name in models}
+    with torch.inference_mode():
+        for data in eval_dl:
+            labels = torch.nn.functional.one_hot(data['label'], num_classes)
+            for name, model in models.items():
+                accumulators[name].update(torch.softmax(model(data['input']), dim=1), labels)
+
+    example = data['input'][:1]
+    rows = []
+    for name, model in models.items():
+        row = {'model': name, 'padded_cmap': accumulators[name].compute()}
+        for batch_size in batch_sizes:
+            x = example.expand(batch_size, *example.shape[1:]).contiguous()
+            with torch.inference_mode():
+                times = _timeit(lambda: model(x), repeat, warmup=2)
+            row[f'batch_{batch_size}_ms'] = np.percentile(times, 50) * 1e3
+        rows.append(row)
+
+    df = pd.DataFrame(rows)
+    df['cmap_drop'] = df.padded_cmap.iloc[0] - df.padded_cmap
+    for batch_size in batch_sizes:
+        df[f'batch_{batch_size}_speedup'] = df[f'batch_{batch_size}_ms'].iloc[0] / df[f'batch_{batch_size}_ms']
+    return df
+
+# %% ../nbs/11_benchmark.ipynb 23
+def benchmark_optimize_for_inference(model_key:str='efficient_net_v2_s',   # A key of the model dictionary
+                                     num_classes:int=264,                   # Number of classes to predict
+                                     batch_sizes:tuple=(1, 16),             # Batch sizes of the measurements
+                                     input_shapes:tuple=((1, 128, 157), (1, 128, 156)), # Odd and even sizes, the stem borders differ
+                                     repeat:int=10,                         # Number of timed calls for each case
+                                     atol:float=1e-5,                       # Largest accepted difference of the outputs
+                                     seed:int=0                             # Seed of the weights and of the inputs
+                                     )->pd.DataFrame:                       # One row per input shape and batch size
+    "Checks that `optimize_for_inference` keeps the outputs within `atol` and measures its cpu speedup"
+    from birdclef.network import get_model, optimize_for_inference
+
+    torch.manual_seed(seed)
+    model = get_model(model_key, num_classes=num_classes)
+    # A few training steps give the BatchNorms statistics which are not the identity
+    with torch.no_grad():
+        for _ in range(3):
+            model(torch.randn(4, *input_shapes[0]))
+    model.eval()
+    optimized = optimize_for_inference(model)
+
+    rows = []
+    for input_shape in input_shapes:
+        for batch_size in batch_sizes:
+            x = torch.randn(batch_size, *input_shape)
+            with torch.inference_mode():
+                diff = (model(x) - optimized(x)).abs().max().item()
+                assert diff <= atol, f'The optimised model differs by {diff} with inputs of shape {tuple(x.shape)}.'
+                times = {name: _timeit(lambda: m(x), repeat) for name, m in [('eager', model), ('optimized', optimized)]}
+            rows.append({'input_shape': input_shape, 'batch_size': batch_size, 'max_abs_diff': diff,
+                         'eager_ms': np.percentile(times['eager'], 50) * 1e3,
+                         'optimized_ms': np.percentile(times['optimized'], 50) * 1e3,
+                         'speedup': np.percentile(times['eager'], 50) / np.percentile(times['optimized'], 50)})
+
+    return pd.DataFrame(rows)
+
+# %% ../nbs/11_benchmark.ipynb 26
+def make_synthetic_data(data_dir:str,                           # Directory laid out like `DATA_DIR`, with audio_data/ and base/
+                        classes:tuple=('synth1', 'synth2', 'synth3', 'synth4'), # Names of the synthetic classes
+                        files_per_class:int=10,                 # Number of recordings of each class
+                        durations:tuple=(2, 5, 12, 30),         # Durations in seconds, cycled through the files
+                        sample_rates:tuple=(32000, 44100, 48000), # Sample rates, cycled through the files, others than 32kHz are resampled
+                        formats:tuple=('ogg', 'wav'),           # Audio formats, cycled through the files
+                        seed:int=0                              # Seed of the audio and of the splits
+                        )->pd.DataFrame:                        # The metadata of all the files
+    "Writes chirps in noise, a different frequency band for each class, with base train/val/test metadata like `preprocess`"
+    rng = np.random.default_rng(seed)
+    data_dir = Path(data_dir)
+
+    rows = []
+    for c, label in enumerate(classes):
+        (data_dir / 'audio_data' / label).mkdir(parents=True, exist_ok=True)
+        for i in range(files_per_class):
+            k = c * files_per_class + i
+            duration, rate, fmt = durations[k % len(durations)], sample_rates[k % len(sample_rates)], formats[k % len(formats)]
+            t = np.arange(int(duration * rate)) / rate
+            # Repeated upward chirps of half a second, in a band which identifies the class
+            f0 = 1000 + 2000 * c
+            phase = 2 * np.pi * (f0 * (t % 0.5) + 1000 * (t % 0.5) ** 2)
+            waveform = 0.3 * np.sin(phase) * (t % 1 < 0.5) + 0.05 * rng.normal(size=len(t))
+            filename = f'{label}/XC{k:05d}.{fmt}'
+            torchaudio.save(str(data_dir / 'audio_data' / filename), torch.from_numpy(waveform).float().unsqueeze(0), rate)
+            rows.append({'primary_label': label, 'filename': filename, 'rating': 4.0, 'duration': float(duration)})
+
+    metadata = pd.DataFrame(rows)
+    (data_dir / 'base').mkdir(exist_ok=True)
+    for name, df in zip(['train', 'val', 'test'], split_metadata(metadata, seed=seed)):
+        df.to_csv(data_dir / 'base' / f'{name}_metadata.csv', index=False)
+
+    return metadata
+
+# %% ../nbs/11_benchmark.ipynb 27
+@contextlib.contextmanager
+def synthetic_data(**kwargs # Parameters of `make_synthetic_data`
+                   ):
+    "Runs the enclosed code in a temporary tree where '../data/' holds synthetic data, the working directory is restored on exit"
+    cwd = os.getcwd()
+    root = Path(tempfile.mkdtemp())
+    try:
+        (root / 'nbs').mkdir()
+        make_synthetic_data(root / 'data', **kwargs)
+        # The metadata are read relative to the working directory and cached by name
+        os.chdir(root / 'nbs')
+        get_metadata.cache_clear()
+        yield root
+    finally:
+        os.chdir(cwd)
+        get_metadata.cache_clear()
+        shutil.rmtree(root, ignore_errors=True)
+
+# %% ../nbs/11_benchmark.ipynb 29
+def benchmark_pipeline(split:str='base/train',                  # The metadata of the files which are processed
+                       flags:dict={'per_channel': (False, True), 'rnd_offset': (False, True),
+                                   'length_policy': ('stretch', 'pad'), 'augmentations': (False, True)}, # Values of each `MyPipeline` flag
+                       max_files:int=20                         # Number of files processed with each combination
+                       )->pd.DataFrame:                         # One row per combination of flags
+    "Per-sample latency of `MyPipeline` for every combination of flags, the augmentations are applied to batches of one"
+    metadata = get_metadata(split)
+    filenames = [AUDIO_DATA_DIR + f for f in metadata.filename[:max_files]]
+
+    rows = []
+    for values in itertools.product(*flags.values()):
+        kwargs = dict(zip(flags.keys(), values))
+        pipeline = MyPipeline(**kwargs)
+
+        def sample(filename):
+            mel = pipeline(filename)
+            return pipeline.augment(mel.unsqueeze(0)) if pipeline.augmentations else mel
+
+        with torch.inference_mode():
+            sample(filenames[0])
+            times = np.array([_timeit(lambda: sample(f), repeat=1, warmup=0)[0] for f in filenames])
+        rows.append({**kwargs, 'samples_per_sec': 1 / times.mean(), **_summary(times)})
+
+    return pd.DataFrame(rows)
+
+# %% ../nbs/11_benchmark.ipynb 30
+def benchmark_dataloader(dataset_key:str='train_base_per_channel',  # A key of the dataset dictionary
+                         num_workers:tuple=(0, 1, 2, 4),            # Numbers of worker processes
+                         batch_size:int=8,                          # Number of examples of each batch
+                         epochs:int=2                               # Number of passes over the dataset for each setting
+                         )->pd.DataFrame:                           # One row per number of workers
+    "Examples per second of a full pass through a dataloader and the wait for its first batch, for each number of workers"
+    rows = []
+    for workers in num_workers:
+        dataloader = get_dataloader(dataset_key, {'batch_size': batch_size, 'shuffle': True, 'num_workers': workers})
+        first, n_examples = [], 0
+        start = time.perf_counter()
+        for _ in range(epochs):
+            epoch_start = time.perf_counter()
+            for i, batch in enumerate(dataloader):
+                if i == 0:
+                    first.append(time.perf_counter() - epoch_start)
+                n_examples += len(batch['label'])
+        elapsed = time.perf_counter() - start
+        rows.append({'num_workers': workers, 'examples_per_sec': n_examples / elapsed, 'first_batch_ms': np.mean(first) * 1e3})
+
+    return pd.DataFrame(rows)
+
+# %% ../nbs/11_benchmark.ipynb 31
+def benchmark_models(model_keys:tuple=('efficient_net_v2_s', 'efficient_net_v2_m', 'efficient_net_v2_l'), # Keys of the model dictionary
+                     num_classes:int=264,               # Number of classes to predict
+                     batch_size:int=4,                  # Number of examples of each step
+                     input_shape:tuple=(1, 128, 157),   # Shape of one mel spectrogram
+                     repeat:int=3,                      # Number of timed calls of each kind
+                     seed:int=0                         # Seed of the weights and of the inputs
+                     )->pd.DataFrame:                   # One row per model and pass
+    "Examples per second of the forward pass in evaluation mode and of the forward and backward passes in training mode"
+    from birdclef.network import get_model
+
+    torch.manual_seed(seed)
+    inputs = torch.randn(batch_size, *input_shape)
+    labels = torch.randint(0, num_classes, (batch_size,))
+
+    rows = []
+    for model_key in model_keys:
+        model = get_model(model_key, num_classes=num_classes)
+        n_params = sum(p.numel() for p in model.parameters())
+
+        def forward():
+            with torch.inference_mode():
+                model(inputs)
+
+        def forward_backward():
+            model.zero_grad()
+            torch.nn.functional.cross_entropy(model(inputs), labels).backward()
+
+        for name, fn, mode in [('forward', forward, model.eval), ('forward_backward', forward_backward, model.train)]:
+            mode()
+            times = _timeit(fn, repeat, warmup=1)
+            rows.append({'model': model_key, 'pass': name, 'params_m': n_params / 1e6,
+                         'examples_per_sec': batch_size / times.mean(), **_summary(times)})
+
+    return pd.DataFrame(rows)
+
+# %% ../nbs/11_benchmark.ipynb 32
+def benchmark_metrics(sizes:tuple=(1024, 16384),    # Numbers of examples, up to a full validation set
+                      num_classes:int=264,          # Number of classes of the competition
+                      repeat:int=3,                 # Number of timed calls of each case
+                      seed:int=0                    # Seed of the outputs and labels
+                      )->pd.DataFrame:              # One row per implementation and size
+    "Cost of the epoch metrics: `compute_metrics`, `MetricAccumulator` and both padded cmaps on one-hot predictions"
+    generator = torch.Generator().manual_seed(seed)
+
+    rows = []
+    for size in sizes:
+        outputs = torch.randn(size, num_classes, generator=generator)
+        labels = torch.randint(0, num_classes, (size,), generator=generator)
+        one_hot_labels = torch.nn.functional.one_hot(labels, num_classes).numpy()
+        one_hot_outputs = torch.nn.functional.one_hot(outputs.argmax(1), num_classes).numpy()
+
+        def accumulate():
+            accumulator = MetricAccumulator(num_classes, 'cpu')
+            accumulator.update(outputs, labels, torch.tensor(0.0))
+            return accumulator.compute('val', 0, 0, 0)
+
+        cases = [('compute_metrics', lambda: compute_metrics('val', outputs, labels, 0.0, 0, 0, 0)),
+                 ('MetricAccumulator', accumulate),
+                 ('padded_cmap', lambda: padded_cmap(one_hot_outputs, one_hot_labels)),
+                 ('fast_padded_cmap', lambda: fast_padded_cmap(one_hot_outputs, one_hot_labels))]
+        for name, fn in cases:
+            times = _timeit(fn, repeat, warmup=1)
+            rows.append({'implementation': name, 'examples': size, **_summary(times)})
+
+    return pd.DataFrame(rows)
+
+# %% ../nbs/11_benchmark.ipynb 35
+def run_benchmarks(output_path:str='benchmark.json',   # JSON file of the results
+                   baseline_path:str=None,             # Results of an earlier run to compare with, not compared if None
+                   quick:bool=False,                   # Smaller settings, for a smoke test in a few minutes
+                   tolerance:float=0.1                 # Relative slowdown reported as a regression
+                   )->dict:                            # The results, by benchmark
+    "Runs the pipeline, dataloader, model and metric benchmarks offline on cpu, on synthetic data in a temporary directory"
+    # Relative paths are resolved before the working directory changes
+    output_path = Path(output_path).absolute()
+    baseline_path = Path(baseline_path).absolute() if baseline_path is not None else None
+    results = {}
+    with synthetic_data(files_per_class=4 if quick else 10):
+        results['pipeline'] = benchmark_pipeline(max_files=4 if quick else 20)
+        results['dataloader'] = benchmark_dataloader(num_workers=(0, 2) if quick else (0, 1, 2, 4), epochs=1 if quick else 2)
+    results['models'] = benchmark_models(('efficient_net_v2_s',) if quick else
+                                         ('efficient_net_v2_s', 'efficient_net_v2_m', 'efficient_net_v2_l'), repeat=2 if quick else 3)
+    results['metrics'] = benchmark_metrics((1024,) if quick else (1024, 16384))
+
+    report = {'host': platform.node(), 'python': platform.python_version(), 'torch': torch.__version__,
+              'threads': torch.get_num_threads(), 'quick': quick, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+              'results': {name: json.loads(df.to_json(orient='records')) for name, df in results.items()}}
+    output_path.write_text(json.dumps(report, indent=2))
+
+    if baseline_path is not None:
+        comparison = compare_benchmarks(report, json.loads(baseline_path.read_text()), tolerance)
+        print(comparison.to_string())
+    return results
+
+# %% ../nbs/11_benchmark.ipynb 36
+def compare_benchmarks(report:dict,         # Results written by `run_benchmarks`
+                       baseline:dict,       # Earlier results written by `run_benchmarks`
+                       tolerance:float=0.1  # Relative slowdown reported as a regression
+                       )->pd.DataFrame:     # One row per measured value present in both
+    "Ratios of the measurements to the baseline, rows are matched on their non-numeric and integer settings"
+    rows = []
+    for name, records in report['results'].items():
+        if name not in baseline['results']:
+            continue
+        new, old = pd.DataFrame(records), pd.DataFrame(baseline['results'][name])
+        keys = [c for c in new.columns if c in old.columns and not pd.api.types.is_float_dtype(new[c])]
+        # Tuples and lists are stored as json lists, they are matched as strings
+        for df in (new, old):
+            for c in keys:
+                df[c] = df[c].astype(str)
+        merged = new.merge(old, on=keys, suffixes=('', '_baseline'))
+
+        for column in new.columns:
+            if column in keys or f'{column}_baseline' not in merged:
+                continue
+            # Throughputs should not decrease, durations should not increase
+            higher_is_better = 'per_sec' in column or 'speedup' in column
+            if not (higher_is_better or column.endswith('_ms') or column.endswith('_s')):
+                continue
+            for _, row in merged.iterrows():
+                ratio = row[column] / row[f'{column}_baseline']
+                slowdown = 1 / ratio if higher_is_better else ratio
+                rows.append({'benchmark': name, 'case': ', '.join(f'{k}={row[k]}' for k in keys), 'value': column,
+                             'baseline': row[f'{column}_baseline'], 'current': row[column], 'ratio': ratio,
+                             'regression': slowdown > 1 + tolerance})
+
+    return pd.DataFrame(rows)
+
+# %% ../nbs/11_benchmark.ipynb 38
+@call_parse
+def benchmark_cli(output_path:str='benchmark.json',    # JSON file of the results
+                  baseline_path:str=None,              # Results of an earlier run to compare with
+                  quick:bool=False,                    # Smaller settings, for a smoke test in a few minutes
+                  tolerance:float=0.1                  # Relative slowdown reported as a regression
+                  ):
+    "Command line entry point of `run_benchmarks`"
+    run_benchmarks(output_path, baseline_path, quick, tolerance)
+    print(f'Results written to {output_path}')
@@ -0,0 +1,172 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/08_cache.ipynb.
+
+# %% auto 0
+__all__ = ['FeatureCache', 'warm_cache', 'warm_cache_cli']
+
+# %% ../nbs/08_cache.ipynb 3
+import os
+import json
+import fcntl
+import hashlib
+from pathlib import Path
+from contextlib import contextmanager
+
+import numpy as np
+import torch
+from torch.utils.data import DataLoader
+from tqdm import tqdm
+from fastcore.script import call_parse
+
+# %% ../nbs/08_cache.ipynb 6
+class FeatureCache:
+    "A persistent, size-bounded cache of extracted features stored as memory-mapped `.npy` files"
+
+    def __init__(self,
+                 cache_dir:str,         # Root directory of the cache, shared by every parameter set
+                 params:dict,           # The parameters of the pipeline that produced the features
+                 max_bytes:int=None     # Maximum size of the whole cache on disk, unbounded if None
+                 ):
+        self.root = Path(cache_dir)
+        self.params = params
+        self.max_bytes = max_bytes
+
+        # Features computed with different parameters never collide since they live in different folders
+        params_hash = hashlib.sha1(json.dumps(params, sort_keys=True, default=str).encode()).hexdigest()[:16]
+        self.dir = self.root / params_hash
+        self.dir.mkdir(parents=True, exist_ok=True)
+        with open(self.dir / 'params.json', 'w') as f:
+            json.dump(params, f, sort_keys=True, default=str)
+
+        # The size of the whole cache is shared by the processes through a file, updated under a lock
+        self._size_path = self.root / 'size'
+        self._lock_path = self.root / '.lock'
+
+    def path(self, filename:str)->Path:
+        "Returns the location of the features of `filename`. The key changes when the audio file changes."
+        stat = os.stat(filename)
+        key = f'{os.path.abspath(filename)}|{stat.st_size}|{stat.st_mtime_ns}'
+        return self.dir / (hashlib.sha1(key.encode()).hexdigest() + '.npy')
+
+    def get(self, filename:str)->torch.Tensor:
+        "Returns the cached features of `filename` or None if they are missing"
+        path = self.path(filename)
+        try:
+            # Copy on write: the array is shared with the page cache until somebody modifies it
+            features = np.load(path, mmap_mode='c')
+        except FileNotFoundError:
+            return None
+        except ValueError:
+            # A truncated file left by a killed process
+            path.unlink(missing_ok=True)
+            return None
+
+        # Refresh the modification time, it is used as the last access time by the eviction
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            pass
+
+        return torch.from_numpy(features)
+
+    def put(self, filename:str, features:torch.Tensor):
+        "Stores the features of `filename`, evicting the least recently used entries if the cache is full"
+        path = self.path(filename)
+        array = features.detach().cpu().numpy()
+
+        # Write to a temporary file and rename it, so that other workers never read a partial file
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_path, 'wb') as f:
+            np.save(f, array)
+
+        # Every worker adds its files to the same total, so the bound holds for the whole cache
+        with self._locked():
+            size = self._read_size()
+            previous = path.stat().st_size if path.exists() else 0
+            os.replace(tmp_path, path)
+            size += path.stat().st_size - previous
+            if self.max_bytes is not None and size > self.max_bytes:
+                size = self._evict(int(self.max_bytes * 0.9))
+            self._size_path.write_text(str(size))
+
+    @contextmanager
+    def _locked(self):
+        with open(self._lock_path, 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _read_size(self)->int:
+        try:
+            return int(self._size_path.read_text())
+        except (FileNotFoundError, ValueError):
+            # First write, or a cache filled by an older version
+            return self.size()
+
+    def _entries(self):
+        for path in self.root.glob('*/*.npy'):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            yield path, stat
+
+    def size(self)->int:
+        "Returns the size in bytes of the whole cache"
+        return sum(stat.st_size for _, stat in self._entries())
+
+    def evict(self,
+              target_bytes:int  # The size the cache must be brought to
+              ):
+        "Removes the least recently used entries until the cache is smaller than `target_bytes`"
+        with self._locked():
+            self._size_path.write_text(str(self._evict(target_bytes)))
+
+    def _evict(self, target_bytes:int)->int:
+        # The total is measured on disk, which also corrects the entries removed without the lock
+        entries = sorted(self._entries(), key=lambda entry: entry[1].st_mtime)
+        size = sum(stat.st_size for _, stat in entries)
+        for path, stat in entries:
+            if size <= target_bytes:
+                break
+            path.unlink(missing_ok=True)
+            size -= stat.st_size
+        return size
+
+    def clear(self):
+        "Removes the features computed with the current parameters"
+        with self._locked():
+            for path in self.dir.glob('*.npy'):
+                path.unlink(missing_ok=True)
+            # Measured again at the next write
+            self._size_path.unlink(missing_ok=True)
+
+# %% ../nbs/08_cache.ipynb 11
+def warm_cache(dataset_key:str,         # A key of the dataset dictionary, the dataset must have a cache
+               num_workers:int=0        # Number of processes used to fill the cache
+               ):
+    "Extracts the features of every file of a dataset so that later epochs only read the cache"
+    from birdclef.dataset import get_dataset
+
+    dataset = get_dataset(dataset_key)
+    pipeline = dataset.pipeline
+    assert pipeline.cache is not None, f'{dataset_key} has no feature cache, set `cache_dir` in its kwargs.'
+    assert not pipeline.rnd_offset, f'{dataset_key} uses random offsets, its features cannot be cached.'
+
+    # Augmentations are applied on top of the cached features, they are useless here
+    dataset.augmentations = False
+
+    loader = DataLoader(dataset, batch_size=None, num_workers=num_workers)
+    for _ in tqdm(loader, total=len(dataset)):
+        pass
+
+    print(f'Cache of {dataset_key} is ready: {pipeline.cache.size() / 2**20:.1f} MB in {pipeline.cache.root}')
+
+# %% ../nbs/08_cache.ipynb 12
+@call_parse
+def warm_cache_cli(dataset_key:str,     # A key of the dataset dictionary, the dataset must have a cache
+                   num_workers:int=0    # Number of processes used to fill the cache
+                   ):
+    "Command line entry point of `warm_cache`"
+    warm_cache(dataset_key, num_workers)
@@ -0,0 +1,148 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/12_checkpoint.ipynb.
+
+# %% auto 0
+__all__ = ['CheckpointManager', 'get_rng_state', 'set_rng_state']
+
+# %% ../nbs/12_checkpoint.ipynb 3
+import os
+import re
+import queue
+import random
+import threading
+from pathlib import Path
+
+import numpy as np
+import torch
+
+# %% ../nbs/12_checkpoint.ipynb 6
+def _to_cpu(obj):
+    "Copies every tensor of a (nested) state dict to the cpu, so that training can modify the originals"
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {k: _to_cpu(v) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_to_cpu(v) for v in obj)
+    return obj
+
+# %% ../nbs/12_checkpoint.ipynb 7
+class CheckpointManager:
+    "Writes training checkpoints from a background thread, keeping the last `keep_last` ones and the best one"
+
+    def __init__(self,
+                 checkpoint_dir:str,    # Directory of the checkpoints of one run
+                 keep_last:int=3        # Number of most recent checkpoints kept on disk, the best one is always kept
+                 ):
+        assert keep_last >= 0, f'keep_last must be a non negative number of checkpoints, got {keep_last}.'
+        self.dir = Path(checkpoint_dir)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.keep_last = keep_last
+
+        # A single writer, so that the checkpoints are written in order
+        self._queue = queue.Queue()
+        self._error = None
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def _path(self, step):
+        return self.dir / f'checkpoint_{step:08d}.pt'
+
+    @property
+    def best_path(self)->Path:
+        "Location of the best checkpoint"
+        return self.dir / 'best.pt'
+
+    def checkpoints(self)->list:
+        "The complete checkpoints on disk, from the oldest to the latest"
+        return sorted(p for p in self.dir.glob('checkpoint_*.pt') if re.fullmatch(r'checkpoint_\d{8}\.pt', p.name))
+
+    def latest(self)->Path:
+        "The most recent checkpoint or None if there is none"
+        checkpoints = self.checkpoints()
+        return checkpoints[-1] if len(checkpoints) > 0 else None
+
+    def _atomic_save(self, state, path):
+        # A checkpoint is either complete or missing, even if the process is killed while writing
+        tmp_path = path.with_suffix(f'.{os.getpid()}.tmp')
+        torch.save(state, tmp_path)
+        os.replace(tmp_path, path)
+
+    def _write_loop(self):
+        while True:
+            job = self._queue.get()
+            try:
+                if job is None:
+                    return
+                state, step, is_best, on_written = job
+                self._atomic_save(state, self._path(step))
+                if is_best:
+                    self._atomic_save(state, self.best_path)
+                checkpoints = self.checkpoints()
+                for path in checkpoints[:len(checkpoints) - self.keep_last]:
+                    path.unlink(missing_ok=True)
+                if on_written is not None:
+                    on_written(state)
+            except Exception as e:
+                self._error = e
+            finally:
+                self._queue.task_done()
+
+    def _raise(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError('Writing a checkpoint failed') from error
+
+    def save(self,
+             state:dict,            # State dicts and counters, the tensors can be on any device
+             step:int,              # Number of optimizer steps, orders the checkpoints
+             is_best:bool=False,    # Whether this checkpoint also replaces the best one
+             on_written=None        # Called in the writer thread with the cpu snapshot once it is on disk
+             ):
+        "Snapshots `state` to the cpu and returns immediately, the files are written in the background"
+        self._raise()
+        self._queue.put((_to_cpu(state), step, is_best, on_written))
+
+    def wait(self):
+        "Blocks until every checkpoint given to `save` is on disk"
+        self._queue.join()
+        self._raise()
+
+    def load(self,
+             path=None,             # A checkpoint, the latest one if None
+             map_location='cpu'     # Where the tensors are loaded
+             )->dict:               # The saved state or None if there is no checkpoint
+        "Loads a checkpoint written by `save`"
+        path = self.latest() if path is None else path
+        if path is None:
+            return None
+        # The rng states are not plain tensors
+        return torch.load(path, map_location=map_location, weights_only=False)
+
+    def clear(self):
+        "Deletes the checkpoints of a previous run in the same directory"
+        self.wait()
+        for path in [*self.checkpoints(), self.best_path]:
+            path.unlink(missing_ok=True)
+
+    def close(self):
+        "Writes the pending checkpoints and stops the writer thread"
+        self._queue.put(None)
+        self._thread.join()
+        self._raise()
+
+# %% ../nbs/12_checkpoint.ipynb 11
+def get_rng_state()->dict:
+    "The state of every random number generator used in training"
+    state = {'python': random.getstate(), 'numpy': np.random.get_state(), 'torch': torch.get_rng_state()}
+    if torch.cuda.is_available():
+        state['cuda'] = torch.cuda.get_rng_state_all()
+    return state
+
+def set_rng_state(state:dict # A state returned by `get_rng_state`
+                  ):
+    "Restores the random number generators, so that a resumed run draws the same numbers"
+    random.setstate(state['python'])
+    np.random.set_state(state['numpy'])
+    torch.set_rng_state(state['torch'])
+    if 'cuda' in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state['cuda'])
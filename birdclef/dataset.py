@@ -1,33 +1,37 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/02_dataset.ipynb.
 
 # %% auto 0
-__all__ = ['dir', 'simple_classes', 'train_metadata_simple', 'val_metadata_simple', 'test_metadata_simple', 'dataset_dict',
-           'MyPipeline', 'BirdClef', 'get_dataset', 'get_dataloader']
+__all__ = ['simple_classes', 'dataset_dict', 'MyPipeline', 'BirdClef', 'get_metadata', 'get_dataset', 'ShardSampler',
+           'AliasTable', 'BalancedSampler', 'MultiCrop', 'get_dataloader']
 
 # %% ../nbs/02_dataset.ipynb 3
-from IPython.display import Audio
+import os
+import math
+from functools import lru_cache
+
 import pandas as pd
 from sklearn.preprocessing import LabelBinarizer
 
 import torch
-from torch.utils.data import Dataset, DataLoader
+from torch.utils.data import Dataset, IterableDataset, DataLoader, Sampler, DistributedSampler
 import torchaudio
-import librosa
-import librosa.display
-import matplotlib.pyplot as plt
 import numpy as np
-import random
 
-from .utils import DATA_DIR, AUDIO_DATA_DIR, mel_to_wave, plot_audio, plot_spectrogram, plot_librosa
+from .utils import DATA_DIR, AUDIO_DATA_DIR, CACHE_DIR, STORE_DIR
+from .cache import FeatureCache
+from .store import AudioStore
+from .transforms import PCEN, BatchAugment, get_length_policy
+from .profiling import stage, profiling_enabled, TimedCollate
 
 # %% ../nbs/02_dataset.ipynb 7
 # Define custom feature extraction pipeline.
 # 0. a randomn offset is applied to the audio file, so not always the same part of the audio is used
 # 1. Check for sample rate and resample
-# 2. Waveform Augmenations
-# 3. Convert to mel-scale
-# 4. Mel Augmenations
-# 5. Check for lenght and stretch shorter videos
+# 2. Convert to mel-scale
+# 3. Check for lenght and regularize it: stretch (phase vocoder), pad, tile, crop or interpolate
+# 4. Augmentations (gain, noise, frequency and time masks) on the whole batch of features in the collate function
+# When a cache is given, the output of steps 0-3 is stored on disk and the augmentations are applied on top of it
+# Steps 2-3 also accept a batch of waveforms [B, C, N], so that they can run once per batch in the collate function
 
 
 
@@ -48,6 +52,11 @@ class MyPipeline(torch.nn.Module):
         per_channel = False,
         augmentations = False,
         rnd_offset = False,
+        cache_dir = None,
+        cache_max_bytes = None,
+        store_dir = None,
+        length_policy = 'stretch',
+        seed = 0,
     ):
         super().__init__()
 
@@ -59,91 +68,123 @@ class MyPipeline(torch.nn.Module):
         self.sample_rate = sample_rate
         self.hop_length = hop_length
         self.per_channel = per_channel
+        self.n_mels = n_mels
+        self.f_min = f_min
+        self.f_max = f_max
+        self.power = power
         self.melspec = torchaudio.transforms.MelSpectrogram(sample_rate=self.sample_rate, n_fft=n_fft, hop_length=hop_length, n_mels=n_mels, f_min=f_min, f_max=f_max, power=power)
         self.amptodb = torchaudio.transforms.AmplitudeToDB()
-        self.stretch = torchaudio.transforms.TimeStretch(hop_length=hop_length, n_freq=128)
+        self.pcen = PCEN(sample_rate=self.sample_rate, hop_length=hop_length)
+        self.length_policy = length_policy
+        self.fix_length = get_length_policy(length_policy, hop_length=hop_length, n_freq=n_mels)
         
 
-        #Augmentations
-        self.maskingFreq =  torchaudio.transforms.FrequencyMasking(freq_mask_param=40)
-        # self.maskingTime = torchaudio.transforms.TimeMasking(time_mask_param=20)
-        self.noiser = torchaudio.transforms.AddNoise()
+        #Augmentations, applied to batches by `BirdClef.collate`
+        self.augment = BatchAugment(freq_mask_param=40, time_mask_param=20, db=not per_channel, seed=seed)
         
         self.rnd_offset = rnd_offset
 
+        # Decoded audio store, used instead of the audio files when given
+        self.store = AudioStore(store_dir) if store_dir is not None else None
+
+        # Random offsets make the features different at every call, they cannot be cached
+        self.cache = None
+        if cache_dir is not None and not rnd_offset:
+            self.cache = FeatureCache(cache_dir, self.cache_params(), cache_max_bytes)
+
+    def cache_params(self):
+        "Returns the parameters which determine the features, used to key the cache"
+        return {'seconds': self.seconds, 'sample_rate': self.sample_rate, 'n_fft': self.n_fft, 'n_mels': self.n_mels,
+                'hop_length': self.hop_length, 'power': self.power, 'f_min': self.f_min, 'f_max': self.f_max,
+                'per_channel': self.per_channel, **({'backend': 'store'} if self.store is not None else {}),
+                **({'length_policy': self.length_policy} if self.length_policy != 'stretch' else {})}
+
+    def forward(self, filename, offset=None):
+        # A crop chosen by the sampler is not the one stored in the cache
+        if self.cache is None or offset is not None:
+            return self.extract(self.load(filename, offset))
+
+        with stage('data/cache_read'):
+            mel = self.cache.get(filename)
+        if mel is None:
+            mel = self.extract(self.load(filename))
+            self.cache.put(filename, mel)
+
+        return mel
+
+    def forward_batch(self, waveforms):
+        "Extracts the features of a list of loaded waveforms, the crops of full length are processed as one batch"
+        length = self.seconds * self.sample_rate
+        mels = [None] * len(waveforms)
+
+        full = [i for i, waveform in enumerate(waveforms) if waveform.shape[-1] == length]
+        if len(full) > 0:
+            batch = self.extract(torch.stack([waveforms[i] for i in full]))
+            for i, mel in zip(full, batch):
+                mels[i] = mel
+
+        # Shorter crops go through the length policy one at a time, exactly as in the per-item path
+        for i, waveform in enumerate(waveforms):
+            if mels[i] is None:
+                mels[i] = self.extract(waveform)
+
+        return torch.stack(mels)
+
+    def num_frames(self, filename):
+        "Number of samples of a file, read from the store when there is one"
+        return self.store.num_frames(filename) if self.store is not None else torchaudio.info(filename).num_frames
+
+    def load(self, filename, offset=None, seconds=None):
+        # 0 Load the File, from the store when there is one. Longer windows than a crop can be read for multi-crop decoding.
+        load = self.store.load if self.store is not None else torchaudio.load
+        length = (seconds if seconds is not None else self.seconds) * self.sample_rate
+        with stage('data/decode'):
+            if offset is not None:
+                # The offset was drawn by the sampler
+                waveform, rate = load(filename, frame_offset=offset, num_frames=length)
+            elif self.rnd_offset:
+                num_frames = self.num_frames(filename)
+                if num_frames - length > 0:
+                    rnd_offset = np.random.randint(0, num_frames - length)
+                else:
+                    # Handle the case where metadata.num_frames <= self.seconds*self.sample_rate
+                    # For example, you can set rnd_offset to a default value:
+                    rnd_offset = 0
+                waveform, rate = load(filename, frame_offset=rnd_offset, num_frames=length)
+            else: 
+                waveform, rate = load(filename, frame_offset=0, num_frames=length)
 
-    def forward(self, filename):
-        # 0 Load the File
-        if self.rnd_offset:
-            metadata = torchaudio.info(filename)
-            if metadata.num_frames - self.seconds * self.sample_rate > 0:
-                rnd_offset = np.random.randint(0, metadata.num_frames - self.seconds*self.sample_rate)
-            else:
-                # Handle the case where metadata.num_frames <= self.seconds*self.sample_rate
-                # For example, you can set rnd_offset to a default value:
-                rnd_offset = 0
-            waveform, rate = torchaudio.load(filename, frame_offset=rnd_offset, num_frames=self.seconds*self.sample_rate)
-        else: 
-            waveform, rate = torchaudio.load(filename, frame_offset=0, num_frames=self.seconds*self.sample_rate)
-        
         # 1 Check for the sample rate and eventually resample to 32k
         if rate != self.sample_rate:
             print("Wrong sample rate: resampling audio")
-            resampler = torchaudio.transforms.Resample(orig_freq=rate, new_freq=self.sample_rate)
-            waveform = resampler(waveform)
-            
-        
-        # 2 Waveform Augmenations
-        if self.augmentations:
-            #  Rasdom noise
-            if np.random.random() > 0.5:
-                noise = torch.randn_like(waveform) 
-                snr_dbs = torch.tensor([10])
-                waveform = self.noiser(waveform, noise, snr_dbs)               
-        
+            with stage('data/resample'):
+                resampler = torchaudio.transforms.Resample(orig_freq=rate, new_freq=self.sample_rate)
+                waveform = resampler(waveform)
 
-        # 3 Convert to mel-scale
-        mel = self.melspec(waveform)
-        
-        # 4 Mel Augmenations
-        if self.augmentations:
-            # if np.random.random() > 0.8:
-            #     mel = self.maskingTime(mel)
-                
-            if np.random.random() > 0.5:
-                mel = self.maskingFreq(mel)
-                
-        
-        if not self.per_channel:
-            mel = self.amptodb(mel)
+        return waveform
 
-        else:
-            melspec_np = mel.detach().cpu().numpy()
-            mel_pcen =librosa.pcen(melspec_np * (2 ** 31), sr=self.sample_rate, hop_length=self.hop_length)
-            mel = torch.from_numpy(mel_pcen).float()
-            
-            
+    def extract(self, waveform):
+        # 2 Convert to mel-scale
+        with stage('data/mel'):
+            mel = self.melspec(waveform)
+        with stage('data/pcen' if self.per_channel else 'data/db'):
+            mel = self.normalise(mel)
 
-        # 4 Check for the length and stretch it to 10s, it is a transformation used to regularize the length of the data
-        if mel.shape[2] < self.c_length:
-            # print("Audio too short: stretching it.")
-            replay_rate =  mel.shape[2]/self.c_length
-            #print(f"replay rate {replay_rate}%")
-            mel = self.stretch(mel, replay_rate).real
-            mel = mel[:,:,0:self.c_length]
-            #print(f"stretched shape {stretched.shape}")
-            
-        # 5 Check for the length and reduce it to 10s, it is a transformation used to regularize the length of the data
-        if mel.shape[2] > self.c_length:
-            # print("Audio too long: reducing it.")
-            replay_rate =  mel.shape[2]/self.c_length
-            #print(f"replay rate {replay_rate}%")
-            mel = self.stretch(mel, 1/replay_rate).real
-            mel = mel[:,:,0:self.c_length]
-            #print(f"stretched shape {stretched.shape}")
+
+        # 3 Check for the length and regularize it with the chosen policy (stretch, pad, tile, crop, interpolate)
+        with stage(f'data/{self.length_policy}'):
+            mel = self.fix_length(mel, self.c_length)
 
         return mel
     
+    def normalise(self, mel):
+        "Converts a mel spectrogram to dB or, with per_channel, applies PCEN. Works on single examples and batches."
+        if not self.per_channel:
+            return self.amptodb(mel)
+
+        # Same scaling to the int32 range used with librosa.pcen
+        return self.pcen(mel * (2 ** 31))
+
     def inverse_transform(self, mel):
         n_stft = self.n_fft // 2 + 1
         mel = mel.cpu()
@@ -158,10 +199,10 @@ class MyPipeline(torch.nn.Module):
 
         return pseudo_waveform
 
-# %% ../nbs/02_dataset.ipynb 14
+# %% ../nbs/02_dataset.ipynb 16
 class BirdClef(Dataset):
 
-    def __init__(self, metadata=None, classes=None, per_channel=False, augmentations=False, rnd_offset=False):
+    def __init__(self, metadata=None, classes=None, per_channel=False, augmentations=False, rnd_offset=False, cache_dir=None, cache_max_bytes=None, batched=False, backend='files', store_dir=STORE_DIR, length_policy='stretch', sampling=None, multi_crop=None, seed=0):
         
     
 
@@ -171,6 +212,26 @@ class BirdClef(Dataset):
         self.per_channel = per_channel
         self.augmentations = augmentations
         self.rnd_offset = rnd_offset
+        self.cache_dir = cache_dir
+        self.batched = batched
+        # Parameters of the `BalancedSampler` used by `get_dataloader`, None for the usual sequential or shuffled order
+        self.sampling = sampling
+        # Seeds the augmentations together with the epoch, the rank and the worker id, see `_augment`.
+        # The epoch is in shared memory, so that persistent workers see the epoch set on the copy of the main process.
+        self.seed = seed
+        self._epoch = torch.zeros((), dtype=torch.long).share_memory_()
+        distributed = torch.distributed.is_available() and torch.distributed.is_initialized()
+        self.rank = torch.distributed.get_rank() if distributed else 0
+        self._augment_key = None
+        # Set by `get_dataloader` when `collate` augments whole batches, otherwise `__getitem__` augments every example
+        self.collated = False
+        # Parameters of `MultiCrop`, which decodes each file once for several crops, None for one crop per decode
+        self.multi_crop = multi_crop
+        assert sampling is None or multi_crop is None, 'A dataset is either sampled with replacement or read in multi-crop mode.'
+        assert backend in ('files', 'store'), f"{backend} is not an existing backend, choose one from ('files', 'store')."
+        # The features of a batched dataset are extracted by `collate`, after the cache would be read
+        assert not (batched and cache_dir is not None), 'A batched dataset cannot use the feature cache, remove `cache_dir` or `batched`.'
+        self.backend = backend
 
         self.length = len(self.metadata)
 
@@ -186,82 +247,377 @@ class BirdClef(Dataset):
         _, self.labels = torch.max(self.labels, dim=1)
         
         # Initialize a pipeline
-        self.pipeline = MyPipeline(per_channel = self.per_channel, augmentations = self.augmentations, rnd_offset = self.rnd_offset)
+        self.pipeline = MyPipeline(per_channel = self.per_channel, augmentations = self.augmentations, rnd_offset = self.rnd_offset, cache_dir = cache_dir, cache_max_bytes = cache_max_bytes, store_dir = store_dir if backend == 'store' else None, length_policy = length_policy, seed = seed)
     
     def __len__(self):
         return self.length
 
     def __getitem__(self, idx):
+        # `BalancedSampler` gives (index, frame offset) pairs
+        idx, offset = idx if isinstance(idx, tuple) else (idx, None)
         filename = AUDIO_DATA_DIR + self.metadata['filename'][idx]
-        mel_spectrogram = self.pipeline(filename)
-
         label = self.labels[idx].long()
+
+        # In batched mode only the waveform is loaded, the features are extracted by `collate`
+        if self.batched:
+            return {'input': self.pipeline.load(filename, offset), 'label': label, 'filename': filename}
+
+        with stage('data/getitem'):
+            mel_spectrogram = self.pipeline(filename, offset)
+
+        if self.augmentations and not self.collated:
+            mel_spectrogram = self._augment(mel_spectrogram.unsqueeze(0))[0]
         
         return {'input': mel_spectrogram, 'label': label, 'filename': filename}
 
-# %% ../nbs/02_dataset.ipynb 19
-dir = DATA_DIR
-try:
-    train_metadata_base = pd.read_csv(dir + 'base/train_metadata.csv')
-    val_metadata_base = pd.read_csv(dir + 'base/val_metadata.csv')
-    test_metadata_base = pd.read_csv(dir + 'base/test_metadata.csv')
-except FileNotFoundError:
-    dir = 'data/'
-    train_metadata_base = pd.read_csv(dir + 'base/train_metadata.csv')
-    val_metadata_base = pd.read_csv(dir + 'base/val_metadata.csv')
-    test_metadata_base = pd.read_csv(dir + 'base/test_metadata.csv')
+    @property
+    def epoch(self):
+        return int(self._epoch)
+
+    def set_epoch(self, epoch):
+        self._epoch.fill_(epoch)
 
+    def collate(self, batch):
+        "Collate function of the batched and augmented modes: extracts the features and augments the whole batch at once"
+        inputs = [item['input'] for item in batch]
+        inputs = self.pipeline.forward_batch(inputs) if self.batched else torch.stack(inputs)
+
+        if self.augmentations:
+            inputs = self._augment(inputs)
+
+        return {'input': inputs,
+                'label': torch.stack([item['label'] for item in batch]),
+                'filename': [item['filename'] for item in batch]}
+
+    def _augment(self, inputs):
+        # Each worker of each process draws its own augmentations, which change at every epoch
+        worker = torch.utils.data.get_worker_info()
+        key = (self.epoch, self.rank, worker.id if worker is not None else 0)
+        if key != self._augment_key:
+            self.pipeline.augment.reseed(*key)
+            self._augment_key = key
+        with stage('data/augment'):
+            return self.pipeline.augment(inputs)
+
+# %% ../nbs/02_dataset.ipynb 21
 simple_classes = ['thrnig1', 'wlwwar', 'barswa']
-train_metadata_simple = train_metadata_base.loc[train_metadata_base.primary_label.isin(simple_classes)].reset_index()
-val_metadata_simple = val_metadata_base.loc[val_metadata_base.primary_label.isin(simple_classes)].reset_index()
-test_metadata_simple = test_metadata_base.loc[test_metadata_base.primary_label.isin(simple_classes)].reset_index()
 
-# %% ../nbs/02_dataset.ipynb 22
+@lru_cache(maxsize=None)
+def get_metadata(name:str            # The metadata folder and split, e.g. 'base/train', 'oversampled/train' or 'simple/val'
+                 )->pd.DataFrame:   # The metadata, read once per process
+    "Reads a metadata csv the first time it is needed. 'simple' is the base metadata restricted to `simple_classes`."
+    folder, split = name.split('/')
+    if folder == 'simple':
+        base = get_metadata(f'base/{split}')
+        return base.loc[base.primary_label.isin(simple_classes)].reset_index()
+
+    # Notebooks run from nbs/, scripts from the repository root
+    for data_dir in (DATA_DIR, 'data/'):
+        path = os.path.join(data_dir, folder, f'{split}_metadata.csv')
+        if os.path.exists(path):
+            return pd.read_csv(path)
+    raise FileNotFoundError(f'{folder}/{split}_metadata.csv not found in {DATA_DIR} or data/')
+
+# %% ../nbs/02_dataset.ipynb 24
+# Metadata and classes are given by name, they are read only when `get_dataset` is called
 dataset_dict = {
-            'train_base': (BirdClef, {'metadata': train_metadata_base, 'classes': train_metadata_base.primary_label}),
-            'val_base': (BirdClef, {'metadata': val_metadata_base, 'classes': train_metadata_base.primary_label}),
-            'test_base': (BirdClef, {'metadata': test_metadata_base, 'classes': train_metadata_base.primary_label}),
+            'train_base': (BirdClef, {'metadata': 'base/train', 'classes': 'base/train'}),
+            'val_base': (BirdClef, {'metadata': 'base/val', 'classes': 'base/train'}),
+            'test_base': (BirdClef, {'metadata': 'base/test', 'classes': 'base/train'}),
 
-            'train_simple': (BirdClef, {'metadata': train_metadata_simple, 'classes': train_metadata_simple.primary_label}),
-            'val_simple': (BirdClef, {'metadata': val_metadata_simple, 'classes': train_metadata_simple.primary_label}),
-            'test_simple': (BirdClef, {'metadata': test_metadata_simple, 'classes': train_metadata_simple.primary_label}),
+            'train_simple': (BirdClef, {'metadata': 'simple/train', 'classes': 'simple/train'}),
+            'val_simple': (BirdClef, {'metadata': 'simple/val', 'classes': 'simple/train'}),
+            'test_simple': (BirdClef, {'metadata': 'simple/test', 'classes': 'simple/train'}),
             
-            'train_simple_per_channel': (BirdClef, {'metadata': train_metadata_simple, 'classes': train_metadata_simple.primary_label, 'per_channel': True}),
-            'val_simple_per_channel': (BirdClef, {'metadata': val_metadata_simple, 'classes': train_metadata_simple.primary_label, 'per_channel': True}),
-            'test_simple_per_channel': (BirdClef, {'metadata': test_metadata_simple, 'classes': train_metadata_simple.primary_label, 'per_channel': True}),
+            'train_simple_per_channel': (BirdClef, {'metadata': 'simple/train', 'classes': 'simple/train', 'per_channel': True}),
+            'val_simple_per_channel': (BirdClef, {'metadata': 'simple/val', 'classes': 'simple/train', 'per_channel': True}),
+            'test_simple_per_channel': (BirdClef, {'metadata': 'simple/test', 'classes': 'simple/train', 'per_channel': True}),
             
-            'train_base_per_channel': (BirdClef, {'metadata': train_metadata_base, 'classes': train_metadata_base.primary_label, 'per_channel': True}),
-            'val_base_per_channel': (BirdClef, {'metadata': val_metadata_base, 'classes': train_metadata_base.primary_label, 'per_channel': True}),
-            'test_base_per_channel': (BirdClef, {'metadata': test_metadata_base, 'classes': train_metadata_base.primary_label, 'per_channel': True}),
+            'train_base_per_channel': (BirdClef, {'metadata': 'base/train', 'classes': 'base/train', 'per_channel': True}),
+            'val_base_per_channel': (BirdClef, {'metadata': 'base/val', 'classes': 'base/train', 'per_channel': True}),
+            'test_base_per_channel': (BirdClef, {'metadata': 'base/test', 'classes': 'base/train', 'per_channel': True}),
             
-            'train_base_pcn_aug': (BirdClef, {'metadata': train_metadata_base, 'classes': train_metadata_base.primary_label, 'per_channel': True, 'augmentations': True}),
-            'val_base_pcn_aug': (BirdClef, {'metadata': val_metadata_base, 'classes': train_metadata_base.primary_label, 'per_channel': True, 'augmentations': True}),
-            'test_base_pcn_aug': (BirdClef, {'metadata': test_metadata_base, 'classes': train_metadata_base.primary_label, 'per_channel': True, 'augmentations': True}),
+            'train_base_pcn_aug': (BirdClef, {'metadata': 'base/train', 'classes': 'base/train', 'per_channel': True, 'augmentations': True}),
+            'val_base_pcn_aug': (BirdClef, {'metadata': 'base/val', 'classes': 'base/train', 'per_channel': True, 'augmentations': True}),
+            'test_base_pcn_aug': (BirdClef, {'metadata': 'base/test', 'classes': 'base/train', 'per_channel': True, 'augmentations': True}),
             
-            'train_base_pcn_rnd': (BirdClef, {'metadata': train_metadata_base, 'classes': train_metadata_base.primary_label, 'per_channel': True, 'rnd_offset': True}),
-            'val_base_pcn_rnd': (BirdClef, {'metadata': val_metadata_base, 'classes': train_metadata_base.primary_label, 'per_channel': True, 'rnd_offset': True}),
-            'test_base_pcn_rnd': (BirdClef, {'metadata': test_metadata_base, 'classes': train_metadata_base.primary_label, 'per_channel': True, 'rnd_offset': True}),
+            'train_base_pcn_rnd': (BirdClef, {'metadata': 'base/train', 'classes': 'base/train', 'per_channel': True, 'rnd_offset': True}),
+            'val_base_pcn_rnd': (BirdClef, {'metadata': 'base/val', 'classes': 'base/train', 'per_channel': True, 'rnd_offset': True}),
+            'test_base_pcn_rnd': (BirdClef, {'metadata': 'base/test', 'classes': 'base/train', 'per_channel': True, 'rnd_offset': True}),
             
-            'train_base_pcn_aug_rnd': (BirdClef, {'metadata': train_metadata_base, 'classes': train_metadata_base.primary_label, 'per_channel': True, 'augmentations': True, 'rnd_offset': True}),
-            'val_base_pcn_aug_rnd': (BirdClef, {'metadata': val_metadata_base, 'classes': train_metadata_base.primary_label, 'per_channel': True, 'augmentations': True, 'rnd_offset': True}),
-            'test_base_pcn_aug_rnd': (BirdClef, {'metadata': test_metadata_base, 'classes': train_metadata_base.primary_label, 'per_channel': True, 'augmentations': True, 'rnd_offset': True}),
+            'train_base_pcn_aug_rnd': (BirdClef, {'metadata': 'base/train', 'classes': 'base/train', 'per_channel': True, 'augmentations': True, 'rnd_offset': True}),
+            'val_base_pcn_aug_rnd': (BirdClef, {'metadata': 'base/val', 'classes': 'base/train', 'per_channel': True, 'augmentations': True, 'rnd_offset': True}),
+            'test_base_pcn_aug_rnd': (BirdClef, {'metadata': 'base/test', 'classes': 'base/train', 'per_channel': True, 'augmentations': True, 'rnd_offset': True}),
+
+            'train_oversampled_pcn_rnd': (BirdClef, {'metadata': 'oversampled/train', 'classes': 'base/train', 'per_channel': True, 'rnd_offset': True}),
+            'train_oversampled_pcn_aug_rnd': (BirdClef, {'metadata': 'oversampled/train', 'classes': 'base/train', 'per_channel': True, 'augmentations': True, 'rnd_offset': True}),
+
+            'train_base_pcn_cached': (BirdClef, {'metadata': 'base/train', 'classes': 'base/train', 'per_channel': True, 'cache_dir': CACHE_DIR}),
+            'val_base_pcn_cached': (BirdClef, {'metadata': 'base/val', 'classes': 'base/train', 'per_channel': True, 'cache_dir': CACHE_DIR}),
+            'test_base_pcn_cached': (BirdClef, {'metadata': 'base/test', 'classes': 'base/train', 'per_channel': True, 'cache_dir': CACHE_DIR}),
+
+            'train_base_pcn_aug_cached': (BirdClef, {'metadata': 'base/train', 'classes': 'base/train', 'per_channel': True, 'augmentations': True, 'cache_dir': CACHE_DIR}),
+
+            'train_base_pcn_batched': (BirdClef, {'metadata': 'base/train', 'classes': 'base/train', 'per_channel': True, 'batched': True}),
+            'val_base_pcn_batched': (BirdClef, {'metadata': 'base/val', 'classes': 'base/train', 'per_channel': True, 'batched': True}),
+            'test_base_pcn_batched': (BirdClef, {'metadata': 'base/test', 'classes': 'base/train', 'per_channel': True, 'batched': True}),
+
+            'train_base_pcn_aug_rnd_batched': (BirdClef, {'metadata': 'base/train', 'classes': 'base/train', 'per_channel': True, 'augmentations': True, 'rnd_offset': True, 'batched': True}),
+
+            'train_base_pcn_rnd_store': (BirdClef, {'metadata': 'base/train', 'classes': 'base/train', 'per_channel': True, 'rnd_offset': True, 'backend': 'store'}),
+            'val_base_pcn_store': (BirdClef, {'metadata': 'base/val', 'classes': 'base/train', 'per_channel': True, 'backend': 'store'}),
+            'test_base_pcn_store': (BirdClef, {'metadata': 'base/test', 'classes': 'base/train', 'per_channel': True, 'backend': 'store'}),
+
+            'train_base_pcn_aug_rnd_store': (BirdClef, {'metadata': 'base/train', 'classes': 'base/train', 'per_channel': True, 'augmentations': True, 'rnd_offset': True, 'backend': 'store'}),
+
+            'train_base_pcn_aug_rnd_pad': (BirdClef, {'metadata': 'base/train', 'classes': 'base/train', 'per_channel': True, 'augmentations': True, 'rnd_offset': True, 'length_policy': 'pad'}),
+            'val_base_pcn_pad': (BirdClef, {'metadata': 'base/val', 'classes': 'base/train', 'per_channel': True, 'length_policy': 'pad'}),
+            'test_base_pcn_pad': (BirdClef, {'metadata': 'base/test', 'classes': 'base/train', 'per_channel': True, 'length_policy': 'pad'}),
+
+            'train_base_pcn_aug_rnd_tile': (BirdClef, {'metadata': 'base/train', 'classes': 'base/train', 'per_channel': True, 'augmentations': True, 'rnd_offset': True, 'length_policy': 'tile'}),
+            'val_base_pcn_tile': (BirdClef, {'metadata': 'base/val', 'classes': 'base/train', 'per_channel': True, 'length_policy': 'tile'}),
+            'test_base_pcn_tile': (BirdClef, {'metadata': 'base/test', 'classes': 'base/train', 'per_channel': True, 'length_policy': 'tile'}),
+
+            'train_base_pcn_balanced': (BirdClef, {'metadata': 'base/train', 'classes': 'base/train', 'per_channel': True, 'sampling': {'exponent': -0.5}}),
+            'train_base_pcn_aug_balanced': (BirdClef, {'metadata': 'base/train', 'classes': 'base/train', 'per_channel': True, 'augmentations': True, 'sampling': {'exponent': -0.5}}),
+
+            'train_base_pcn_crops4': (BirdClef, {'metadata': 'base/train', 'classes': 'base/train', 'per_channel': True, 'multi_crop': {'crops': 4}}),
+            'train_base_pcn_aug_crops4': (BirdClef, {'metadata': 'base/train', 'classes': 'base/train', 'per_channel': True, 'augmentations': True, 'multi_crop': {'crops': 4}}),
+            'train_base_pcn_aug_crops4_batched': (BirdClef, {'metadata': 'base/train', 'classes': 'base/train', 'per_channel': True, 'augmentations': True, 'batched': True, 'multi_crop': {'crops': 4}}),
             
         }
 
-# %% ../nbs/02_dataset.ipynb 23
-def get_dataset(dataset_key:str        # A key of the dataset dictionary
+# %% ../nbs/02_dataset.ipynb 25
+def get_dataset(dataset_key:str,       # A key of the dataset dictionary
+                seed:int=0              # Seed of the augmentations
                 )->Dataset:         # Pytorch dataset
     "A getter method to retrieve the wanted dataset."
     assert dataset_key in dataset_dict, f'{dataset_key} is not an existing dataset, choose one from {dataset_dict.keys()}.'
     ds_class, kwargs = dataset_dict[dataset_key]
+    kwargs = {**kwargs, 'metadata': get_metadata(kwargs['metadata']), 'classes': get_metadata(kwargs['classes']).primary_label, 'seed': seed}
     return ds_class(**kwargs)
 
-# %% ../nbs/02_dataset.ipynb 27
+# %% ../nbs/02_dataset.ipynb 31
+class ShardSampler(Sampler):
+    "Disjoint, ordered shards of a dataset for each process of a distributed run, without the repeated examples of `DistributedSampler`"
+
+    def __init__(self, dataset, num_replicas=None, rank=None):
+        self.num_replicas = num_replicas if num_replicas is not None else torch.distributed.get_world_size()
+        self.rank = rank if rank is not None else torch.distributed.get_rank()
+        self.indices = range(self.rank, len(dataset), self.num_replicas)
+
+    def __iter__(self):
+        return iter(self.indices)
+
+    def __len__(self):
+        return len(self.indices)
+
+# %% ../nbs/02_dataset.ipynb 33
+class AliasTable:
+    "Walker's alias method: draws from a discrete distribution in constant time per draw after a linear time setup"
+
+    def __init__(self, weights:np.ndarray # Non-negative weights, normalised to probabilities
+                 ):
+        n = len(weights)
+        scaled = np.asarray(weights, dtype=np.float64) * n / np.sum(weights)
+        self.prob, self.alias = np.ones(n), np.arange(n)
+
+        # Vose's construction, every column is filled up to 1 with the excess of a large weight
+        small = [i for i in range(n) if scaled[i] < 1]
+        large = [i for i in range(n) if scaled[i] >= 1]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s], self.alias[s] = scaled[s], l
+            scaled[l] -= 1 - scaled[s]
+            (small if scaled[l] < 1 else large).append(l)
+
+    def draw(self, n:int, rng:np.random.Generator)->np.ndarray:
+        "`n` indices distributed like the weights"
+        column = rng.integers(0, len(self.prob), n)
+        return np.where(rng.random(n) < self.prob[column], column, self.alias[column])
+
+# %% ../nbs/02_dataset.ipynb 34
+class BalancedSampler(Sampler):
+    "Draws (index, frame offset) pairs with class probabilities tempered like `get_sample_weights` and files weighted by duration"
+
+    def __init__(self, dataset,
+                 exponent:float=-0.5,   # Every class is reweighted by its frequency ** exponent, 0 keeps the data distribution, -1 balances the classes
+                 num_samples:int=None,  # Samples of an epoch over all the processes, the number of files if None
+                 seed:int=0,            # Seed of the draws, combined with the epoch and the rank
+                 num_replicas=None,     # Number of processes, from torch.distributed if None
+                 rank=None              # Rank of this process, from torch.distributed if None
+                 ):
+        distributed = torch.distributed.is_available() and torch.distributed.is_initialized()
+        self.num_replicas = num_replicas if num_replicas is not None else (torch.distributed.get_world_size() if distributed else 1)
+        self.rank = rank if rank is not None else (torch.distributed.get_rank() if distributed else 0)
+        self.num_samples = math.ceil((num_samples or len(dataset)) / self.num_replicas)
+        self.seed, self.epoch = seed, 0
+
+        metadata = dataset.metadata
+        durations = metadata['duration'].values if 'duration' in metadata else _durations(metadata.filename)
+        labels = dataset.labels.numpy()
+
+        # A file is drawn with the probability of its class, tempered, times its share of the class audio
+        class_freq = np.bincount(labels, minlength=dataset.num_classes) / len(labels)
+        class_audio = np.bincount(labels, weights=durations, minlength=dataset.num_classes)
+        weights = class_freq[labels] ** (1 + exponent) * durations / class_audio[labels]
+        self.table = AliasTable(weights)
+
+        clip = dataset.pipeline.seconds * dataset.pipeline.sample_rate
+        self.max_offsets = np.maximum(np.round(durations * dataset.pipeline.sample_rate).astype(np.int64) - clip, 0)
+
+    def set_epoch(self, epoch):
+        self.epoch = epoch
+
+    def __iter__(self):
+        rng = np.random.default_rng([self.seed, self.epoch, self.rank])
+        idxs = self.table.draw(self.num_samples, rng)
+        offsets = (rng.random(self.num_samples) * self.max_offsets[idxs]).astype(np.int64)
+        return iter(zip(idxs.tolist(), offsets.tolist()))
+
+    def __len__(self):
+        return self.num_samples
+
+def _durations(filenames):
+    "Durations in seconds from the index written by `preprocess`, for metadata without a duration column"
+    index = pd.read_csv(os.path.join(DATA_DIR, 'durations.csv')).set_index('filename')
+    return index.duration.loc[list(filenames)].values
+
+# %% ../nbs/02_dataset.ipynb 39
+class MultiCrop(IterableDataset):
+    "Decodes each file of a `BirdClef` dataset once and sends out several random crops, shuffled across files in a buffer of each worker"
+
+    def __init__(self, dataset:BirdClef,
+                 crops:int=4,           # Crops sent out for each decoded file
+                 buffer_size:int=256,   # Crops kept in the shuffle buffer of each worker
+                 seed:int=0,            # Seed of the file order, of the crops and of the buffer, combined with the epoch
+                 batch_size:int=1,      # Batch size of the dataloader, the workers are given whole batches
+                 num_replicas=None,     # Number of processes, from torch.distributed if None
+                 rank=None              # Rank of this process, from torch.distributed if None
+                 ):
+        distributed = torch.distributed.is_available() and torch.distributed.is_initialized()
+        self.num_replicas = num_replicas if num_replicas is not None else (torch.distributed.get_world_size() if distributed else 1)
+        self.rank = rank if rank is not None else (torch.distributed.get_rank() if distributed else 0)
+        self.dataset, self.crops, self.buffer_size, self.batch_size = dataset, crops, buffer_size, batch_size or 1
+        self.classes, self.num_classes = dataset.classes, dataset.num_classes
+        self.pipeline = dataset.pipeline
+        self.seed = seed
+        # In shared memory, so that persistent workers see the epoch set on the copy of the main process
+        self._epoch = torch.zeros((), dtype=torch.long).share_memory_()
+        # Padded like DistributedSampler, so that every process gets as many batches
+        self.num_files = math.ceil(len(dataset) / self.num_replicas)
+
+    @property
+    def epoch(self):
+        return int(self._epoch)
+
+    def set_epoch(self, epoch):
+        self._epoch.fill_(epoch)
+        self.dataset.set_epoch(epoch)
+
+    def __len__(self):
+        return self.num_files * self.crops
+
+    def __getitem__(self, idx):
+        "A single crop of a file, as given by the wrapped dataset"
+        return self.dataset[idx]
+
+    def _files(self):
+        "The files of this process and worker with their number of crops, in a new order at every epoch"
+        order = np.random.default_rng([self.seed, self.epoch]).permutation(len(self.dataset))
+        order = np.resize(order, self.num_files * self.num_replicas)[self.rank::self.num_replicas]
+        worker = torch.utils.data.get_worker_info()
+        if worker is None:
+            return [(idx, self.crops) for idx in order]
+
+        # Every worker batches its own crops. They take whole batches of the crops of this process in turn, so that only
+        # the last batch of the epoch is partial and the dataloader has exactly the length computed from `len(self)`.
+        # A file whose crops fall in the batches of two workers is decoded by both.
+        crops = np.arange(len(self))
+        mine = crops[(crops // self.batch_size) % worker.num_workers == worker.id]
+        files, counts = np.unique(mine // self.crops, return_counts=True)
+        return [(order[f], n) for f, n in zip(files, counts)]
+
+    def _decode(self, idx, crops, rng):
+        "`crops` crops of one file, from a single window of as many clip lengths at a random place of the recording"
+        ds, pipeline = self.dataset, self.dataset.pipeline
+        filename = AUDIO_DATA_DIR + ds.metadata['filename'][idx]
+        clip = pipeline.seconds * pipeline.sample_rate
+
+        num_frames = (round(ds.metadata['duration'][idx] * pipeline.sample_rate) if 'duration' in ds.metadata
+                      else pipeline.num_frames(filename))
+        start = int(rng.integers(0, max(num_frames - crops * clip, 0) + 1))
+        waveform = pipeline.load(filename, start, crops * pipeline.seconds)
+
+        label = ds.labels[idx].long()
+        for offset in rng.integers(0, max(waveform.shape[-1] - clip, 0) + 1, crops):
+            crop = waveform[..., offset:offset + clip]
+            # In batched mode the features are extracted by `collate`
+            yield {'input': crop if ds.batched else pipeline.extract(crop), 'label': label, 'filename': filename}
+
+    def __iter__(self):
+        worker = torch.utils.data.get_worker_info()
+        rng = np.random.default_rng([self.seed, self.epoch, self.rank, worker.id if worker is not None else 0])
+
+        # Once the buffer is full every new crop takes the place of a random one, which is sent out
+        buffer = []
+        for idx, crops in self._files():
+            for item in self._decode(idx, crops, rng):
+                if len(buffer) < self.buffer_size:
+                    buffer.append(item)
+                    continue
+                i = rng.integers(len(buffer))
+                buffer[i], item = item, buffer[i]
+                yield item
+
+        rng.shuffle(buffer)
+        yield from buffer
+
+# %% ../nbs/02_dataset.ipynb 41
 def get_dataloader(dataset_key:str,            # The key to access the dataset
-                dataloader_kwargs:dict={}      # The optional parameters for a pytorch dataloader
+                dataloader_kwargs:dict={},     # The optional parameters for a pytorch dataloader
+                pad_shards:bool=True,          # In distributed runs, whether every process gets as many batches (training) or disjoint shards (evaluation)
+                seed:int=0                     # Seed of the augmentations and of the order of the examples
                 )->DataLoader:              # Pytorch dataloader
     "A function to get a dataloader from a specific dataset"
-    dataset = get_dataset(dataset_key)
+    dataset = get_dataset(dataset_key, seed)
     
+    # Batched datasets return waveforms, the features are extracted while collating. Augmentations are applied to whole batches.
+    if (getattr(dataset, 'batched', False) or getattr(dataset, 'augmentations', False)) and 'collate_fn' not in dataloader_kwargs:
+        dataloader_kwargs = {**dataloader_kwargs, 'collate_fn': dataset.collate}
+    # With another collate function the examples are augmented one by one
+    dataset.collated = dataloader_kwargs.get('collate_fn') == dataset.collate
+
+    # Balanced datasets draw their examples with replacement, also splitting them between processes
+    if getattr(dataset, 'sampling', None) is not None and 'sampler' not in dataloader_kwargs:
+        dataloader_kwargs = dict(dataloader_kwargs)
+        dataloader_kwargs.pop('shuffle', None)
+        dataloader_kwargs['sampler'] = BalancedSampler(dataset, **{'seed': seed, **dataset.sampling})
+
+    # Multi-crop datasets are iterable, they order and split the files between processes and workers themselves
+    if getattr(dataset, 'multi_crop', None) is not None:
+        dataloader_kwargs = dict(dataloader_kwargs)
+        dataloader_kwargs.pop('shuffle', None)
+        dataset = MultiCrop(dataset, batch_size=dataloader_kwargs.get('batch_size', 1), **{'seed': seed, **dataset.multi_crop})
+
+    # The batches carry the timings of the workers back to the main process
+    if profiling_enabled():
+        dataloader_kwargs = {**dataloader_kwargs, 'collate_fn': TimedCollate(dataloader_kwargs.get('collate_fn'))}
+
+    # In distributed runs every process reads its own part of the dataset
+    distributed = torch.distributed.is_available() and torch.distributed.is_initialized() and torch.distributed.get_world_size() > 1
+    if distributed and 'sampler' not in dataloader_kwargs and not isinstance(dataset, IterableDataset):
+        dataloader_kwargs = dict(dataloader_kwargs)
+        shuffle = dataloader_kwargs.pop('shuffle', False)
+        sampler = DistributedSampler(dataset, shuffle=shuffle, seed=seed) if pad_shards else ShardSampler(dataset)
+        dataloader_kwargs['sampler'] = sampler
 
     return DataLoader(dataset, **dataloader_kwargs, )
+
+# %% ../nbs/02_dataset.ipynb 45
+def __getattr__(name):
+    "Lazy access to the metadata tables that used to be read at import, e.g. `train_metadata_base`"
+    split, _, folder = name.partition('_metadata_')
+    if split in ('train', 'val', 'test') and folder in ('base', 'simple', 'oversampled'):
+        return get_metadata(f'{folder}/{split}')
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,209 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/09_inference.ipynb.
+
+# %% auto 0
+__all__ = ['SoundscapeWindows', 'predict_soundscapes', 'predict_soundscapes_cli']
+
+# %% ../nbs/09_inference.ipynb 3
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import torch
+import torchaudio
+from torch.utils.data import IterableDataset, DataLoader, get_worker_info
+from tqdm import tqdm
+from fastcore.script import call_parse
+
+from .dataset import MyPipeline, get_dataset
+from .network import get_model, optimize_for_inference
+
+# %% ../nbs/09_inference.ipynb 6
+class SoundscapeWindows(IterableDataset):
+    "Streams long recordings and yields the mel power of overlapping windows, computing the STFT only once per file"
+
+    def __init__(self,
+                 filenames:list,            # Paths of the recordings
+                 pipeline:MyPipeline=None,  # The feature extraction pipeline, its augmentations are ignored
+                 window_hop:float=5,        # Seconds between the start of two consecutive windows
+                 chunk_seconds:float=60     # Seconds of audio decoded at once, bounds the memory used per file
+                 ):
+        self.filenames = list(filenames)
+        self.pipeline = pipeline if pipeline is not None else MyPipeline()
+        self.window_hop = window_hop
+        self.chunk_seconds = chunk_seconds
+
+        # The frames are computed on contiguous chunks, so the centering of the STFT is done by hand
+        p = self.pipeline
+        self.melspec = torchaudio.transforms.MelSpectrogram(sample_rate=p.sample_rate, n_fft=p.n_fft, hop_length=p.hop_length,
+                                                            n_mels=p.n_mels, f_min=p.f_min, f_max=p.f_max, power=p.power,
+                                                            center=False)
+
+    def frames(self, filename):
+        "Yields consecutive blocks of mel frames, together the centered mel spectrogram of the whole recording"
+        n_fft, hop_length = self.pipeline.n_fft, self.pipeline.hop_length
+        pad = n_fft // 2
+
+        metadata = torchaudio.info(filename)
+        rate = metadata.sample_rate
+        chunk = int(self.chunk_seconds * rate)
+        resampler = None
+        if rate != self.pipeline.sample_rate:
+            # Chunks are resampled independently: the frames near their borders differ slightly (~1e-3 relative)
+            # from those of the whole resampled recording. At the sample rate of the pipeline they are identical.
+            resampler = torchaudio.transforms.Resample(orig_freq=rate, new_freq=self.pipeline.sample_rate)
+
+        buffer = None
+        for offset in range(0, metadata.num_frames, chunk):
+            waveform, _ = torchaudio.load(filename, frame_offset=offset, num_frames=chunk)
+            waveform = waveform.mean(dim=0, keepdim=True)
+            if resampler is not None:
+                waveform = resampler(waveform)
+
+            if buffer is None:
+                # Reflect padding at the start, as done by the centered STFT
+                left = waveform[:, 1:pad + 1].flip(-1)
+                buffer = torch.cat([left, waveform], dim=1)
+            else:
+                buffer = torch.cat([buffer, waveform], dim=1)
+
+            # The last frame is kept back so that the buffer always holds the samples for the final reflection
+            n_frames = (buffer.shape[1] - n_fft) // hop_length
+            if n_frames > 0:
+                yield self.melspec(buffer[:, :(n_frames - 1) * hop_length + n_fft])
+                buffer = buffer[:, n_frames * hop_length:]
+
+        if buffer is None:
+            return
+
+        # Reflect padding at the end
+        right = buffer[:, -pad - 1:-1].flip(-1)
+        buffer = torch.cat([buffer, right], dim=1)
+        n_frames = (buffer.shape[1] - n_fft) // hop_length + 1
+        if n_frames > 0:
+            yield self.melspec(buffer[:, :(n_frames - 1) * hop_length + n_fft])
+
+    def windows(self, filename):
+        "Yields the end time in seconds and the mel power of each window of a recording, up to the end of the recording"
+        length = self.pipeline.c_length
+        frames_per_second = self.pipeline.sample_rate / self.pipeline.hop_length
+        metadata = torchaudio.info(filename)
+        duration = metadata.num_frames / metadata.sample_rate
+        begin = lambda k: round(k * self.window_hop * frames_per_second)
+        end_time = lambda k: k * self.window_hop + self.pipeline.seconds
+
+        # Only the frames of the windows which are not complete yet are kept in memory
+        frames, start, k = None, 0, 0
+        for block in self.frames(filename):
+            frames = block if frames is None else torch.cat([frames, block], dim=-1)
+            while begin(k) + length <= start + frames.shape[-1]:
+                offset = begin(k) - start
+                yield end_time(k), frames[..., offset:offset + length]
+                k += 1
+            drop = min(begin(k) - start, frames.shape[-1])
+            frames, start = frames[..., drop:], start + drop
+
+        # The last window is padded with silence when it ends within a frame of the recording, windows ending
+        # further would be rows past its end. A recording shorter than a window still gets a padded one.
+        while frames is not None and begin(k) < start + frames.shape[-1] and (k == 0 or end_time(k) <= duration + 1 / frames_per_second):
+            window = frames[..., begin(k) - start:]
+            window = torch.nn.functional.pad(window, (0, length - window.shape[-1]))
+            yield end_time(k), window
+            k += 1
+
+    def __iter__(self):
+        # Each worker processes a different subset of the recordings
+        worker = get_worker_info()
+        filenames = self.filenames if worker is None else self.filenames[worker.id::worker.num_workers]
+        for filename in filenames:
+            for end, mel in self.windows(filename):
+                yield {'input': mel, 'row_id': f'{Path(filename).stem}_{end:g}'}
+
+    def collate(self, batch):
+        "Stacks the windows of a batch and normalises them all together"
+        return {'input': self.pipeline.normalise(torch.stack([item['input'] for item in batch])),
+                'row_id': [item['row_id'] for item in batch]}
+
+# %% ../nbs/09_inference.ipynb 11
+def _append(output_path, df, writer):
+    "Appends rows to a csv or parquet file, returns the parquet writer to reuse"
+    if output_path.suffix == '.parquet':
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if writer is None:
+            writer = pq.ParquetWriter(output_path, table.schema)
+        writer.write_table(table)
+        return writer
+
+    df.to_csv(output_path, mode='a', header=not output_path.exists(), index=False)
+    return writer
+
+# %% ../nbs/09_inference.ipynb 12
+def predict_soundscapes(model:torch.nn.Module,      # A trained model
+                        filenames:list,             # Paths of the recordings
+                        classes:list,               # Names of the classes, in the order of the model outputs
+                        output_path:str,            # A .csv or .parquet file where the probabilities are written
+                        pipeline:MyPipeline=None,   # The feature extraction pipeline used in training
+                        window_hop:float=5,         # Seconds between the start of two consecutive windows
+                        chunk_seconds:float=60,     # Seconds of audio decoded at once
+                        batch_size:int=64,          # Number of windows given to the model at once
+                        num_workers:int=0,          # Number of processes reading the recordings
+                        device:str='cpu'            # The device where the model is run
+                        )->dict:                    # Throughput statistics
+    "Scores long recordings in sliding windows and writes per-window class probabilities in the submission format"
+    output_path = Path(output_path)
+    output_path.unlink(missing_ok=True)
+
+    dataset = SoundscapeWindows(filenames, pipeline, window_hop, chunk_seconds)
+    dataloader = DataLoader(dataset, batch_size=batch_size, num_workers=num_workers, collate_fn=dataset.collate)
+
+    model = optimize_for_inference(model).to(device)
+
+    writer = None
+    n_windows = 0
+    start = time.perf_counter()
+    with torch.inference_mode():
+        for batch in tqdm(dataloader):
+            outputs = model(batch['input'].to(device))
+            probs = torch.nn.functional.softmax(outputs, dim=1).cpu().numpy()
+
+            df = pd.DataFrame(probs, columns=classes)
+            df.insert(0, 'row_id', batch['row_id'])
+            writer = _append(output_path, df, writer)
+            n_windows += len(df)
+
+    if writer is not None:
+        writer.close()
+
+    elapsed = time.perf_counter() - start
+    stats = {'files': len(dataset.filenames), 'windows': n_windows, 'seconds': elapsed,
+             'files_per_sec': len(dataset.filenames) / elapsed, 'windows_per_sec': n_windows / elapsed}
+    print(f"Scored {stats['files']} files ({stats['files_per_sec']:.2f} files/s) and {stats['windows']} windows "
+          f"({stats['windows_per_sec']:.1f} windows/s) in {elapsed:.1f}s")
+
+    return stats
+
+# %% ../nbs/09_inference.ipynb 13
+@call_parse
+def predict_soundscapes_cli(audio_dir:str,                          # Directory containing the recordings
+                            output_path:str,                        # A .csv or .parquet file for the probabilities
+                            weights_path:str,                       # The weights of the trained model
+                            model_key:str='efficient_net_v2_s',     # A key of the model dictionary
+                            train_key:str='train_base_per_channel', # The dataset the model was trained on, gives the classes
+                            window_hop:float=5,                     # Seconds between the start of two consecutive windows
+                            batch_size:int=64,                      # Number of windows given to the model at once
+                            num_workers:int=0,                      # Number of processes reading the recordings
+                            device:str='cpu'                        # The device where the model is run
+                            ):
+    "Command line entry point of `predict_soundscapes`"
+    train_ds = get_dataset(train_key)
+    classes = sorted(train_ds.classes.unique())
+    pipeline = MyPipeline(per_channel=train_ds.per_channel)
+
+    filenames = sorted(str(f) for f in Path(audio_dir).iterdir() if f.suffix in ('.ogg', '.wav', '.flac', '.mp3'))
+    model = get_model(model_key, weights_path, num_classes=len(classes))
+
+    predict_soundscapes(model, filenames, classes, output_path, pipeline, window_hop,
+                        batch_size=batch_size, num_workers=num_workers, device=device)
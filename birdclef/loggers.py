@@ -0,0 +1,314 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/16_loggers.ipynb.
+
+# %% auto 0
+__all__ = ['logger_dict', 'Logger', 'WandbLogger', 'LocalLogger', 'NullLogger', 'get_logger']
+
+# %% ../nbs/16_loggers.ipynb 3
+import json
+import time
+import queue
+import shutil
+import threading
+from abc import ABC, abstractmethod
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import torch
+from fastcore.basics import AttrDict
+
+from .utils import LOG_DIR
+
+# %% ../nbs/16_loggers.ipynb 4
+def _to_python(value):
+    "Plain numbers of tensors and numpy scalars, arrays and data frames are kept for the backend"
+    if isinstance(value, torch.Tensor):
+        value = value.detach().cpu()
+        return value.item() if value.dim() == 0 else value.numpy()
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+# %% ../nbs/16_loggers.ipynb 7
+class _Config(AttrDict):
+    "The configuration of a run without wandb, its keys are also attributes and it is updated like `wandb.config`"
+
+    def update(self, values=None, allow_val_change=False, **kwargs):
+        super().update(values or {}, **kwargs)
+
+class Logger(ABC):
+    "Buffers the logged records and writes them in batches from a background thread, so that logging never blocks training"
+
+    def __init__(self,
+                 config:dict=None,          # The configuration of the run
+                 flush_interval:float=1.0   # Longest time a record waits in the buffer for others
+                 ):
+        # The config is used like the one of a wandb run, without needing a run
+        self.config = _Config(config or {})
+        self.flush_interval = flush_interval
+
+        self._pending = {}
+        self._step = 0
+        # A single writer, so that the records are written in order
+        self._queue = queue.Queue()
+        self._error = None
+        self._thread = threading.Thread(target=self._write_loop, daemon=True)
+        self._thread.start()
+
+    def _write_loop(self):
+        while True:
+            jobs = [self._queue.get()]
+            # The batch is closed when its first record has waited long enough
+            deadline = time.perf_counter() + self.flush_interval
+            while jobs[-1][0] is not None:
+                try:
+                    jobs.append(self._queue.get(timeout=max(0, deadline - time.perf_counter())))
+                except queue.Empty:
+                    break
+            try:
+                records = [(kind, {k: _to_python(v) for k, v in values.items()}) for kind, values in jobs if kind is not None]
+                # Consecutive records of the same kind are written together
+                start = 0
+                for end in range(1, len(records) + 1):
+                    if end == len(records) or records[end][0] != records[start][0]:
+                        write = self._write_logs if records[start][0] == 'log' else self._write_summary
+                        write([values for _, values in records[start:end]])
+                        start = end
+            except Exception as e:
+                self._error = e
+            finally:
+                for _ in jobs:
+                    self._queue.task_done()
+            if jobs[-1][0] is None:
+                return
+
+    def _raise(self):
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError('Writing the logs failed') from error
+
+    def log(self,
+            metrics:dict,       # Numbers, tensors, arrays (histograms) or data frames (tables) by name
+            commit:bool=True    # Whether the step is complete, otherwise the metrics are written with the next ones
+            ):
+        "Adds metrics to the current step and returns immediately, like `wandb.log`"
+        self._raise()
+        self._pending.update(metrics)
+        if commit:
+            self._queue.put(('log', {**self._pending, '_step': self._step}))
+            self._pending = {}
+            self._step += 1
+
+    def summary(self,
+                metrics:dict    # Final values by name, e.g. the test metrics
+                ):
+        "Sets summary values of the run and returns immediately"
+        self._raise()
+        self._queue.put(('summary', dict(metrics)))
+
+    @abstractmethod
+    def log_artifact(self,
+                     path:str,          # A file, e.g. saved weights
+                     name:str,          # Name of the artifact
+                     metadata:dict=None # Stored with the artifact, e.g. the config
+                     ):
+        "Stores a file, immediately since the file can be overwritten afterwards"
+
+    def flush(self):
+        "Blocks until every logged record is written"
+        self._queue.join()
+        self._raise()
+
+    def finish(self):
+        "Writes the pending records and stops the writer thread"
+        if len(self._pending) > 0:
+            self.log({})
+        self._queue.put((None, None))
+        self._thread.join()
+        self._raise()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.finish()
+
+    # Called by the writer thread with consecutive records of the same kind, every backend implements them
+    @abstractmethod
+    def _write_logs(self, records:list):
+        "Writes logged steps, each one a dict of metrics with its `_step`"
+
+    @abstractmethod
+    def _write_summary(self, records:list):
+        "Writes summary updates, in order"
+
+# %% ../nbs/16_loggers.ipynb 10
+class WandbLogger(Logger):
+    "Logs to a wandb run, arrays are logged as histograms and data frames as tables"
+
+    def __init__(self,
+                 config:dict=None,          # The configuration of the run, given by the sweep agent if None
+                 flush_interval:float=1.0,  # Longest time a record waits in the buffer for others
+                 **init_kwargs              # Other parameters of `wandb.init`, e.g. mode='offline'
+                 ):
+        # Only this backend needs wandb, the others work without it
+        import wandb
+
+        self.run = wandb.init(config=config, **init_kwargs)
+        super().__init__(flush_interval=flush_interval)
+        # The sweep parameters are only known once the run has started
+        self.config = wandb.config
+        self.run.name = f"{self.config.run_name}"
+
+    def _convert(self, value):
+        import wandb
+
+        if isinstance(value, np.ndarray):
+            return wandb.Histogram(value)
+        if isinstance(value, pd.DataFrame):
+            return wandb.Table(dataframe=value)
+        return value
+
+    def _write_logs(self, records):
+        # Every record is one step of the run, in the order they were logged
+        for record in records:
+            self.run.log({k: self._convert(v) for k, v in record.items() if k != '_step'})
+
+    def _write_summary(self, records):
+        for record in records:
+            for key, value in record.items():
+                self.run.summary[key] = value
+
+    def log_artifact(self, path, name, metadata=None):
+        import wandb
+
+        artifact = wandb.Artifact(name, type="model", metadata=metadata)
+        artifact.add_file(str(path))
+        self.run.log_artifact(artifact)
+
+    def finish(self):
+        super().finish()
+        self.run.finish()
+
+# %% ../nbs/16_loggers.ipynb 11
+class LocalLogger(Logger):
+    "Writes the run to `log_dir/run_name/`: config.json, history.jsonl, summary.json, tables and artifacts, without network"
+
+    def __init__(self,
+                 config:dict=None,          # The configuration of the run, must contain `run_name`
+                 flush_interval:float=1.0,  # Longest time a record waits in the buffer for others
+                 log_dir:str=LOG_DIR,       # Directory of the runs
+                 format:str='jsonl'         # Format of the history ('jsonl'|'parquet'), parquet is written when the run finishes
+                 ):
+        assert format in ('jsonl', 'parquet'), f'{format} is not a supported format, choose jsonl or parquet.'
+        if format == 'parquet':
+            # Fails now rather than at the end of the run if there is no parquet engine
+            pd.io.parquet.get_engine('auto')
+        super().__init__(config, flush_interval)
+        self.format = format
+        self.dir = Path(log_dir) / self.config.run_name
+        (self.dir / 'tables').mkdir(parents=True, exist_ok=True)
+        self._history = self.dir / 'history.jsonl'
+        self._summary = {}
+        if self.config.get('resume', False) and self._history.exists():
+            # A resumed run appends to its history, from the step after the last one written
+            with open(self._history) as f:
+                last = None
+                for line in f:
+                    last = line if line.strip() else last
+            self._step = json.loads(last)['_step'] + 1 if last is not None else 0
+            if (self.dir / 'summary.json').exists():
+                self._summary = json.loads((self.dir / 'summary.json').read_text())
+        else:
+            # A new run with the same name replaces the history of the previous one
+            self._history.write_text('')
+        self._write_json('config.json', dict(self.config))
+
+    def _write_json(self, name, content):
+        (self.dir / name).write_text(json.dumps(content, indent=2, default=str))
+
+    def _convert(self, key, value, step):
+        if isinstance(value, np.ndarray):
+            return value.tolist()
+        if isinstance(value, pd.DataFrame):
+            # Tables are written next to the history, which keeps their path
+            path = self.dir / 'tables' / f"{key.replace('/', '_')}_{step}.csv"
+            value.to_csv(path, index=False)
+            return str(path.relative_to(self.dir))
+        return value
+
+    def _write_logs(self, records):
+        lines = [json.dumps({k: self._convert(k, v, record['_step']) for k, v in record.items()}, default=str)
+                 for record in records]
+        with open(self._history, 'a') as f:
+            f.write(''.join(line + '\n' for line in lines))
+
+    def _write_summary(self, records):
+        for record in records:
+            self._summary.update(record)
+        self._write_json('summary.json', self._summary)
+
+    def log_artifact(self, path, name, metadata=None):
+        artifact_dir = self.dir / 'artifacts' / name
+        artifact_dir.mkdir(parents=True, exist_ok=True)
+        shutil.copy(path, artifact_dir / Path(path).name)
+        (artifact_dir / 'metadata.json').write_text(json.dumps(metadata or {}, indent=2, default=str))
+
+    def history(self)->pd.DataFrame:
+        "The logged records written so far, one row per step"
+        return pd.read_json(self._history, lines=True) if self._history.stat().st_size > 0 else pd.DataFrame()
+
+    def finish(self):
+        super().finish()
+        # The trainer adds the runtime settings to the config during the run
+        self._write_json('config.json', dict(self.config))
+        if self.format == 'parquet':
+            self.history().to_parquet(self.dir / 'history.parquet')
+
+# %% ../nbs/16_loggers.ipynb 12
+class NullLogger(Logger):
+    "Drops every record, e.g. for the processes of a distributed run other than rank 0 or for tests"
+
+    def __init__(self,
+                 config:dict=None,  # The configuration of the run
+                 **kwargs           # The parameters of the other loggers, ignored
+                 ):
+        self.config = _Config(config or {})
+
+    def log(self, metrics, commit=True):
+        pass
+
+    def summary(self, metrics):
+        pass
+
+    def log_artifact(self, path, name, metadata=None):
+        pass
+
+    def _write_logs(self, records):
+        pass
+
+    def _write_summary(self, records):
+        pass
+
+    def flush(self):
+        pass
+
+    def finish(self):
+        pass
+
+# %% ../nbs/16_loggers.ipynb 16
+logger_dict = {
+    'wandb': WandbLogger,
+    'local': LocalLogger,
+    'null': NullLogger,
+}
+
+def get_logger(logger_key:str,      # A key of the logger dictionary
+               config:dict=None,    # The configuration of the run
+               logger_kwargs:dict={}# The optional parameters of the logger
+               )->Logger:           # A logger, to be finished at the end of the run
+    "Getter method to retrieve a logging backend"
+
+    assert logger_key in logger_dict.keys(), f'{logger_key} is not an existing logger, choose one from {logger_dict.keys()}.'
+
+    return logger_dict[logger_key](config, **logger_kwargs)
@@ -1,19 +1,21 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/03_network.ipynb.
 
 # %% auto 0
-__all__ = ['model_dict', 'EfficientNetV2', 'get_model']
+__all__ = ['model_dict', 'EfficientNetV2', 'quantize_model', 'QuantizedEfficientNetV2', 'get_model', 'FusedStem',
+           'optimize_for_inference']
 
 # %% ../nbs/03_network.ipynb 3
 from typing import Union, BinaryIO, IO
 from os import PathLike
 
+import copy
+
 import torch
 import torchvision
 from torch.nn import Module
 
 from .dataset import get_dataloader
 
-
 # %% ../nbs/03_network.ipynb 5
 class EfficientNetV2(torch.nn.Module):
     def __init__(self, num_classes=264, size='s'):
@@ -36,10 +38,56 @@ class EfficientNetV2(torch.nn.Module):
         return x
 
 # %% ../nbs/03_network.ipynb 10
+def quantize_model(model:torch.nn.Module,  # A float model, it is not modified
+                   calibration=None,        # Iterable of input batches which calibrate the activations of static quantisation
+                   mode:str='static',       # Post-training quantisation ('static'|'dynamic')
+                   input_shape:tuple=(1, 1, 128, 157) # Shape of an example input, used to trace the model
+                   )->torch.nn.Module:      # The int8 model, for cpu inference
+    "Int8 post-training quantisation, dynamic (linear layers only) or static (convolutions too, with calibrated activations)"
+    assert mode in ('static', 'dynamic'), f"{mode} is not a quantisation mode, choose one from ('static', 'dynamic')."
+    model = copy.deepcopy(model).cpu().eval()
+
+    if mode == 'dynamic':
+        return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+    from torch.ao.quantization import quantize_fx, get_default_qconfig_mapping
+
+    engine = 'x86' if 'x86' in torch.backends.quantized.supported_engines else torch.backends.quantized.engine
+    torch.backends.quantized.engine = engine
+    # Quantised convolutions do not support padding='same', init_conv stays in float
+    qconfig_mapping = get_default_qconfig_mapping(engine).set_module_name('init_conv', None)
+
+    prepared = quantize_fx.prepare_fx(model, qconfig_mapping, (torch.zeros(input_shape),))
+    with torch.inference_mode():
+        for inputs in calibration if calibration is not None else []:
+            prepared(inputs)
+
+    return quantize_fx.convert_fx(prepared)
+
+# %% ../nbs/03_network.ipynb 11
+class QuantizedEfficientNetV2(torch.nn.Module):
+    "Int8 `EfficientNetV2` for cpu inference. Built from a float model, or empty with the structure to load quantised weights"
+
+    def __init__(self, num_classes=264, size='s', mode='static', model=None, calibration=None):
+        super().__init__()
+        self.mode = mode
+        model = model if model is not None else EfficientNetV2(num_classes=num_classes, size=size)
+        self.quantized = quantize_model(model, calibration, mode)
+
+    def forward(self, x):
+        return self.quantized(x)
+
+# %% ../nbs/03_network.ipynb 14
 model_dict = {
         'efficient_net_v2_s': (EfficientNetV2, {}),
         'efficient_net_v2_m': (EfficientNetV2, {'size':'m'}),
         'efficient_net_v2_l': (EfficientNetV2, {'size':'l'}),
+        'efficient_net_v2_s_int8': (QuantizedEfficientNetV2, {}),
+        'efficient_net_v2_m_int8': (QuantizedEfficientNetV2, {'size':'m'}),
+        'efficient_net_v2_l_int8': (QuantizedEfficientNetV2, {'size':'l'}),
+        'efficient_net_v2_s_int8_dynamic': (QuantizedEfficientNetV2, {'mode':'dynamic'}),
+        'efficient_net_v2_m_int8_dynamic': (QuantizedEfficientNetV2, {'size':'m', 'mode':'dynamic'}),
+        'efficient_net_v2_l_int8_dynamic': (QuantizedEfficientNetV2, {'size':'l', 'mode':'dynamic'}),
         }
 
 def get_model(model_key:str, # A key of the model dictionary
@@ -56,3 +104,72 @@ def get_model(model_key:str, # A key of the model dictionary
         model.load_state_dict(torch.load(weights_path))
 
     return model
+
+# %% ../nbs/03_network.ipynb 20
+class FusedStem(torch.nn.Module):
+    "A 1 channel `init_conv` followed by a 3x3 stride 2 conv as a single 5x5 conv, with the padded borders recomputed exactly"
+
+    def __init__(self, init_conv:torch.nn.Conv2d, conv:torch.nn.Conv2d):
+        super().__init__()
+        self.init_conv, self.conv = init_conv, conv
+        w1, w2 = init_conv.weight, conv.weight
+        b1 = init_conv.bias if init_conv.bias is not None else torch.zeros(w1.shape[0])
+        b2 = conv.bias if conv.bias is not None else torch.zeros(w2.shape[0])
+
+        # Composition of the kernels: every tap of conv shifts the whole init_conv kernel
+        weight = torch.zeros(w2.shape[0], 1, 5, 5, dtype=w2.dtype)
+        for i in range(3):
+            for j in range(3):
+                weight[:, :, i:i + 3, j:j + 3] += torch.einsum('oc,cikl->oikl', w2[:, :, i, j], w1)
+        self.register_buffer('weight', weight.detach())
+        self.register_buffer('bias', (b2 + torch.einsum('ocij,c->o', w2, b1)).detach())
+
+    def _unfused(self, x):
+        return self.conv(self.init_conv(x))
+
+    def forward(self, x):
+        out = torch.nn.functional.conv2d(x, self.weight, self.bias, stride=2, padding=2)
+
+        # conv pads the output of init_conv with zeros, the 5x5 kernel sees init_conv applied to the padding instead.
+        # Only the first row and column are affected, plus the last ones when the input size is odd.
+        height, width = x.shape[-2:]
+        out[..., :1, :] = self._unfused(x[..., :3, :])[..., :1, :]
+        out[..., :, :1] = self._unfused(x[..., :, :3])[..., :, :1]
+        if height % 2 == 1:
+            out[..., -1:, :] = self._unfused(x[..., -3:, :])[..., -1:, :]
+        if width % 2 == 1:
+            out[..., :, -1:] = self._unfused(x[..., :, -3:])[..., :, -1:]
+        return out
+
+# %% ../nbs/03_network.ipynb 21
+def _fold_batch_norms(module):
+    "Replaces every conv followed by a BatchNorm in a `Sequential` by a single conv, in place"
+    for child in module.children():
+        _fold_batch_norms(child)
+    if isinstance(module, torch.nn.Sequential):
+        for i in range(len(module) - 1):
+            if isinstance(module[i], torch.nn.Conv2d) and isinstance(module[i + 1], torch.nn.BatchNorm2d):
+                module[i] = torch.nn.utils.fusion.fuse_conv_bn_eval(module[i], module[i + 1])
+                module[i + 1] = torch.nn.Identity()
+
+def _can_fuse_stem(init_conv, conv):
+    "The composition is a single conv only for these exact shapes, other models keep both convs"
+    return (init_conv.in_channels == 1 and init_conv.kernel_size == (3, 3) and init_conv.stride == (1, 1)
+            and init_conv.padding in ('same', (1, 1)) and init_conv.dilation == (1, 1) and init_conv.groups == 1
+            and conv.kernel_size == (3, 3) and conv.stride == (2, 2) and conv.padding == (1, 1)
+            and conv.dilation == (1, 1) and conv.groups == 1 and conv.padding_mode == init_conv.padding_mode == 'zeros')
+
+def optimize_for_inference(model:torch.nn.Module  # A trained model, it is not modified
+                           )->torch.nn.Module:    # An equivalent model in evaluation mode, with fewer layers
+    "Folds the BatchNorms into the preceding convs and `init_conv` into the first conv of the backbone"
+    model = copy.deepcopy(model).eval()
+    with torch.no_grad():
+        _fold_batch_norms(model)
+
+        if isinstance(model, EfficientNetV2):
+            stem = model.efficientnet_v2.features[0]
+            if _can_fuse_stem(model.init_conv, stem[0]):
+                model.init_conv = FusedStem(model.init_conv, stem[0])
+                stem[0] = torch.nn.Identity()
+
+    return model
@@ -1,7 +1,195 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/00_preprocessing.ipynb.
 
 # %% auto 0
-__all__ = ['foo']
+__all__ = ['filter_metadata', 'resample_audio', 'split_metadata', 'oversample_metadata', 'preprocess', 'preprocess_cli']
 
 # %% ../nbs/00_preprocessing.ipynb 3
-def foo(): pass
+import os
+import shutil
+from pathlib import Path
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+import torchaudio
+from tqdm import tqdm
+from fastcore.script import call_parse
+
+from .utils import DATA_DIR, AUDIO_DATA_DIR, RAW_AUDIO_DIR
+
+# %% ../nbs/00_preprocessing.ipynb 5
+def filter_metadata(metadata:pd.DataFrame,  # The original competition metadata
+                    min_rating:float=3      # Recordings with a lower rating are removed
+                    )->pd.DataFrame:        # The filtered metadata
+    "Removes the recordings with a low quality rating"
+    return metadata.loc[metadata.rating >= min_rating].reset_index(drop=True)
+
+# %% ../nbs/00_preprocessing.ipynb 8
+_index_columns = ['filename', 'num_frames', 'sample_rate', 'duration', 'mtime']
+
+def _resample_file(args):
+    "Resamples one file if its output is missing or older than the input, returns its duration or the error"
+    filename, in_dir, out_dir, sample_rate = args
+    in_path, out_path = os.path.join(in_dir, filename), os.path.join(out_dir, filename)
+    tmp_path = out_path + '.tmp' + os.path.splitext(out_path)[1]
+
+    try:
+        if not os.path.exists(out_path) or os.path.getmtime(out_path) < os.path.getmtime(in_path):
+            os.makedirs(os.path.dirname(out_path), exist_ok=True)
+
+            # Written under a temporary name, so that an interrupted run never leaves a truncated output
+            if torchaudio.info(in_path).sample_rate == sample_rate:
+                # Nothing to resample, the original file is copied as it is
+                shutil.copy2(in_path, tmp_path)
+            else:
+                waveform, rate = torchaudio.load(in_path)
+                waveform = torchaudio.functional.resample(waveform, rate, sample_rate)
+                torchaudio.save(tmp_path, waveform, sample_rate)
+            os.replace(tmp_path, out_path)
+
+        metadata = torchaudio.info(out_path)
+    except Exception as e:
+        # A corrupted file must not stop the others, it is reported at the end
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return {'filename': filename, 'error': f'{type(e).__name__}: {e}'}
+
+    return {'filename': filename, 'num_frames': metadata.num_frames, 'sample_rate': metadata.sample_rate,
+            'duration': metadata.num_frames / metadata.sample_rate, 'mtime': os.path.getmtime(out_path)}
+
+# %% ../nbs/00_preprocessing.ipynb 9
+def resample_audio(filenames:list,                              # Audio files, relative to `in_dir`
+                   in_dir:str=RAW_AUDIO_DIR,                    # Directory of the original audio
+                   out_dir:str=AUDIO_DATA_DIR,                  # Directory where the resampled audio is written
+                   sample_rate:int=32000,                       # The sample rate used by `MyPipeline`
+                   index_path:str=DATA_DIR + 'durations.csv',   # The duration index, reused between runs
+                   num_workers:int=os.cpu_count()               # Number of processes
+                   )->pd.DataFrame:                             # The duration index of `filenames`
+    "Resamples the audio once in a process pool and returns the duration index. Up to date files are skipped, files which fail are reported."
+    index = pd.read_csv(index_path) if os.path.exists(index_path) else pd.DataFrame(columns=_index_columns)
+    index = index.loc[index.filename.isin(filenames)]
+
+    # A file is up to date when it is in the index, its output did not change since then and is newer than the input
+    def up_to_date(row):
+        in_path, out_path = os.path.join(in_dir, row.filename), os.path.join(out_dir, row.filename)
+        return (os.path.exists(out_path) and abs(os.path.getmtime(out_path) - row.mtime) < 1e-3
+                and os.path.getmtime(out_path) >= os.path.getmtime(in_path))
+    index = index.loc[[up_to_date(row) for row in index.itertuples()]]
+    todo = sorted(set(filenames) - set(index.filename))
+    print(f'{len(index)} files are up to date, processing {len(todo)} files')
+
+    # The index is appended as the files finish, so that an interrupted run is resumed where it stopped
+    index[_index_columns].to_csv(index_path, index=False)
+    rows, errors = [], []
+    if len(todo) > 0:
+        with Pool(num_workers) as pool:
+            args = [(filename, in_dir, out_dir, sample_rate) for filename in todo]
+            for row in tqdm(pool.imap_unordered(_resample_file, args, chunksize=8), total=len(todo)):
+                if 'error' in row:
+                    errors.append(row)
+                    continue
+                rows.append(row)
+                pd.DataFrame([row], columns=_index_columns).to_csv(index_path, mode='a', header=False, index=False)
+
+    if len(errors) > 0:
+        print(f'{len(errors)} files failed and are left out of the index:')
+        for row in errors:
+            print(f"  {row['filename']}: {row['error']}")
+
+    index = pd.concat([index, pd.DataFrame(rows, columns=_index_columns)], ignore_index=True).sort_values('filename').reset_index(drop=True)
+    index = index.astype({'num_frames': int, 'sample_rate': int, 'duration': float, 'mtime': float})
+    index[_index_columns].to_csv(index_path, index=False)
+
+    return index
+
+# %% ../nbs/00_preprocessing.ipynb 14
+def split_metadata(metadata:pd.DataFrame,           # The metadata to split
+                   fractions:tuple=(0.8, 0.1, 0.1), # Fractions of train, validation and test
+                   previous:tuple=None,             # Existing (train, val, test) splits, their assignments are kept
+                   seed:int=0                       # Seed of the random assignment
+                   )->tuple:                        # Train, validation and test metadata
+    "Splits the metadata stratifying by `primary_label`. Only the files not in `previous` are assigned."
+    rng = np.random.default_rng(seed)
+    fractions = np.array(fractions) / sum(fractions)
+
+    assigned = {}
+    if previous is not None:
+        for split, df in enumerate(previous):
+            assigned.update({filename: split for filename in df.filename})
+
+    splits = np.array([assigned.get(filename, -1) for filename in metadata.filename])
+    for label, idxs in metadata.groupby('primary_label').indices.items():
+        counts = np.bincount(splits[idxs][splits[idxs] >= 0], minlength=len(fractions))
+        new = rng.permutation(idxs[splits[idxs] < 0])
+
+        # Every new file goes to the split which is the furthest below its share of the class
+        for idx in new:
+            target = fractions * (counts.sum() + 1)
+            split = int(np.argmax(target - counts))
+            splits[idx] = split
+            counts[split] += 1
+
+    return tuple(metadata.loc[splits == split].reset_index(drop=True) for split in range(len(fractions)))
+
+# %% ../nbs/00_preprocessing.ipynb 17
+def oversample_metadata(metadata:pd.DataFrame,  # The metadata with a `duration` column
+                        min_samples:int=50,     # Classes with less samples are oversampled up to this number
+                        seed:int=0              # Seed of the sampling
+                        )->pd.DataFrame:        # The oversampled metadata
+    "Repeats the rows of rare classes, choosing the files proportionally to their share of the class audio length"
+    rng = np.random.default_rng(seed)
+
+    extra = []
+    for label, df in metadata.groupby('primary_label'):
+        missing = min_samples - len(df)
+        if missing <= 0:
+            continue
+        # Longer recordings give more distinct random crops, so they are repeated more often
+        p = (df.duration / df.duration.sum()).values
+        extra.append(df.iloc[rng.choice(len(df), size=missing, p=p)])
+
+    return pd.concat([metadata, *extra], ignore_index=True)
+
+# %% ../nbs/00_preprocessing.ipynb 20
+def preprocess(metadata_path:str=DATA_DIR + 'train_metadata.csv', # The original competition metadata
+               in_dir:str=RAW_AUDIO_DIR,        # Directory of the original audio
+               out_dir:str=AUDIO_DATA_DIR,      # Directory where the resampled audio is written
+               data_dir:str=DATA_DIR,           # Directory where the metadata is written
+               min_rating:float=3,              # Recordings with a lower rating are removed
+               min_samples:int=50,              # Classes are oversampled up to this number of training samples
+               sample_rate:int=32000,           # The sample rate used by `MyPipeline`
+               seed:int=0,                      # Seed of the splits and of the oversampling
+               num_workers:int=os.cpu_count()   # Number of processes
+               ):
+    "Filters, resamples and splits the dataset, writing the base and oversampled metadata. Re-runs only process new files."
+    data_dir = Path(data_dir)
+    metadata = filter_metadata(pd.read_csv(metadata_path), min_rating)
+
+    index = resample_audio(list(metadata.filename), in_dir, out_dir, sample_rate, str(data_dir / 'durations.csv'), num_workers)
+    metadata = metadata.drop(columns=['duration'], errors='ignore').merge(index[['filename', 'duration']], on='filename')
+
+    names = ['train', 'val', 'test']
+    previous = None
+    if all((data_dir / 'base' / f'{name}_metadata.csv').exists() for name in names):
+        previous = tuple(pd.read_csv(data_dir / 'base' / f'{name}_metadata.csv') for name in names)
+    splits = split_metadata(metadata, previous=previous, seed=seed)
+
+    for folder, dfs in [('base', splits), ('oversampled', (oversample_metadata(splits[0], min_samples, seed), *splits[1:]))]:
+        (data_dir / folder).mkdir(parents=True, exist_ok=True)
+        for name, df in zip(names, dfs):
+            df.to_csv(data_dir / folder / f'{name}_metadata.csv', index=False)
+        print(f'{folder}: ' + ', '.join(f'{name} {len(df)}' for name, df in zip(names, dfs)))
+
+# %% ../nbs/00_preprocessing.ipynb 21
+@call_parse
+def preprocess_cli(metadata_path:str=DATA_DIR + 'train_metadata.csv', # The original competition metadata
+                   in_dir:str=RAW_AUDIO_DIR,        # Directory of the original audio
+                   out_dir:str=AUDIO_DATA_DIR,      # Directory where the resampled audio is written
+                   data_dir:str=DATA_DIR,           # Directory where the metadata is written
+                   min_rating:float=3,              # Recordings with a lower rating are removed
+                   min_samples:int=50,              # Classes are oversampled up to this number of training samples
+                   seed:int=0,                      # Seed of the splits and of the oversampling
+                   num_workers:int=os.cpu_count()   # Number of processes
+                   ):
+    "Command line entry point of `preprocess`"
+    preprocess(metadata_path, in_dir, out_dir, data_dir, min_rating, min_samples, seed=seed, num_workers=num_workers)
@@ -0,0 +1,139 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/15_profiling.ipynb.
+
+# %% auto 0
+__all__ = ['enable_profiling', 'profiling_enabled', 'stage', 'add_timings', 'timed', 'collect_timings', 'merge_timings',
+           'timing_summary', 'TimedCollate', 'trace_profiler']
+
+# %% ../nbs/15_profiling.ipynb 3
+import time
+import contextlib
+from collections import defaultdict
+
+import numpy as np
+import torch
+from torch.utils.data import default_collate
+
+# %% ../nbs/15_profiling.ipynb 6
+# Timings of this process since the last `collect_timings`, in seconds
+_enabled = False
+_timings = defaultdict(list)
+_disabled_stage = contextlib.nullcontext()
+
+def enable_profiling(enabled:bool=True # Whether the stages are timed
+                     ):
+    "Switches the timers of this process on or off, they cost a single check when off"
+    global _enabled
+    _enabled = enabled
+    if not enabled:
+        _timings.clear()
+
+def profiling_enabled()->bool:
+    "Whether the stages of this process are timed"
+    return _enabled
+
+# %% ../nbs/15_profiling.ipynb 7
+class _Stage:
+    "Times a block and marks it in the torch.profiler trace"
+
+    def __init__(self, name, device=None):
+        self.name, self.device = name, device
+
+    def __enter__(self):
+        self.function = torch.profiler.record_function(self.name)
+        self.function.__enter__()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        # Kernels are asynchronous, the time of a cuda stage includes waiting for them
+        if self.device is not None and str(self.device).startswith('cuda'):
+            torch.cuda.synchronize(self.device)
+        _timings[self.name].append(time.perf_counter() - self.start)
+        self.function.__exit__(*exc)
+
+def stage(name:str,     # Name of the stage, e.g. 'data/decode' or 'train/forward_backward'
+          device=None   # A cuda device is synchronized before the stage ends
+          ):
+    "Context manager timing a stage of the pipeline or of the training loop, a shared no-op when profiling is off"
+    return _Stage(name, device) if _enabled else _disabled_stage
+
+def add_timings(timings:dict # Lists of seconds by stage, e.g. the timings of a dataloader worker
+                ):
+    "Adds timings measured in another process to the ones of this process, ignored when profiling is off"
+    if _enabled:
+        for name, durations in timings.items():
+            _timings[name].extend(durations)
+
+# %% ../nbs/15_profiling.ipynb 8
+def timed(iterable,     # Usually a dataloader
+          name:str      # Name of the stage, e.g. 'train/data_wait'
+          ):
+    "The items of `iterable`, timing the wait for each one when profiling is on"
+    if not _enabled:
+        return iterable
+
+    def generator():
+        iterator = iter(iterable)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            _timings[name].append(time.perf_counter() - start)
+            yield item
+
+    return generator()
+
+# %% ../nbs/15_profiling.ipynb 10
+def collect_timings()->dict:
+    "Takes the timings of this process since the last call, as lists of seconds by stage"
+    global _timings
+    timings, _timings = dict(_timings), defaultdict(list)
+    return timings
+
+def merge_timings(*timings:dict # Timings of several processes or batches
+                  )->dict:
+    "Concatenates the durations of each stage"
+    merged = defaultdict(list)
+    for t in timings:
+        for name, durations in t.items():
+            merged[name].extend(durations)
+    return dict(merged)
+
+def timing_summary(timings:dict # Lists of seconds by stage
+                   )->dict:     # Count, mean, median and 99th percentile in milliseconds and total seconds by stage
+    "Statistics of each stage, sorted by total time"
+    summary = {name: {'count': len(d), 'mean_ms': np.mean(d) * 1e3, 'p50_ms': np.percentile(d, 50) * 1e3,
+                      'p99_ms': np.percentile(d, 99) * 1e3, 'total_s': np.sum(d)}
+               for name, d in timings.items() if len(d) > 0}
+    return dict(sorted(summary.items(), key=lambda item: -item[1]['total_s']))
+
+# %% ../nbs/15_profiling.ipynb 13
+class TimedCollate:
+    "Wraps a collate function so that every batch carries the timings of the worker which produced it under 'timings'"
+
+    def __init__(self, collate_fn=None):
+        self.collate_fn = collate_fn if collate_fn is not None else default_collate
+
+    def __call__(self, batch):
+        # Workers started with spawn do not inherit the switch of the main process
+        enable_profiling()
+        with stage('data/collate'):
+            batch = self.collate_fn(batch)
+        batch['timings'] = collect_timings()
+        return batch
+
+# %% ../nbs/15_profiling.ipynb 16
+def trace_profiler(trace_dir:str,   # Directory of the tensorboard traces
+                   wait:int=5,      # Optimizer steps skipped before the window, past the warm-up of the dataloader
+                   warmup:int=1,    # Steps profiled but discarded
+                   active:int=3     # Steps recorded in the trace
+                   )->torch.profiler.profile:
+    "A `torch.profiler` recording a single window of training steps, advanced with `step()` after each optimizer step"
+    activities = [torch.profiler.ProfilerActivity.CPU]
+    if torch.cuda.is_available():
+        activities.append(torch.profiler.ProfilerActivity.CUDA)
+    return torch.profiler.profile(activities=activities,
+                                  schedule=torch.profiler.schedule(wait=wait, warmup=warmup, active=active, repeat=1),
+                                  on_trace_ready=torch.profiler.tensorboard_trace_handler(trace_dir))
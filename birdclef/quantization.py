@@ -0,0 +1,74 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/14_quantization.ipynb.
+
+# %% auto 0
+__all__ = ['quantized_key_dict', 'calibration_batches', 'quantize', 'quantize_cli']
+
+# %% ../nbs/14_quantization.ipynb 3
+import torch
+from fastcore.script import call_parse
+
+from .dataset import get_dataset
+from .network import model_dict, get_model, QuantizedEfficientNetV2
+
+# %% ../nbs/14_quantization.ipynb 6
+# The model_dict key of the quantised version of each float model, for each mode
+quantized_key_dict = {
+    'efficient_net_v2_s': {'static': 'efficient_net_v2_s_int8', 'dynamic': 'efficient_net_v2_s_int8_dynamic'},
+    'efficient_net_v2_m': {'static': 'efficient_net_v2_m_int8', 'dynamic': 'efficient_net_v2_m_int8_dynamic'},
+    'efficient_net_v2_l': {'static': 'efficient_net_v2_l_int8', 'dynamic': 'efficient_net_v2_l_int8_dynamic'},
+}
+
+# %% ../nbs/14_quantization.ipynb 7
+def calibration_batches(dataset_key:str='val_base_per_channel',  # A validation dataset, the training augmentations would skew the ranges
+                        n_batches:int=8,                         # Number of batches
+                        batch_size:int=16,                       # Number of examples of each batch
+                        seed:int=0                               # Seed of the choice of the examples
+                        )->list:                                 # Input batches `[batch, 1, mel, time]`
+    "A random subset of a dataset, used to calibrate the activation ranges of static quantisation"
+    if not dataset_key.startswith('val_'):
+        raise ValueError(f'{dataset_key} is not a validation dataset, calibrate on held-out data.')
+    dataset = get_dataset(dataset_key)
+
+    generator = torch.Generator().manual_seed(seed)
+    idxs = torch.randperm(len(dataset), generator=generator)[:n_batches * batch_size].tolist()
+    return [torch.stack([dataset[i]['input'] for i in idxs[start:start + batch_size]])
+            for start in range(0, len(idxs), batch_size)]
+
+# %% ../nbs/14_quantization.ipynb 8
+def quantize(model_key:str,                                 # A key of the float model in the model dictionary
+             weights_path:str,                              # The weights of the trained float model
+             output_path:str=None,                          # Where the quantised weights are saved, not saved if None
+             mode:str='static',                             # Post-training quantisation ('static'|'dynamic')
+             calibration_key:str='val_base_per_channel',    # The dataset of the calibration examples
+             n_batches:int=8,                               # Number of calibration batches
+             batch_size:int=16,                             # Number of examples of each calibration batch
+             num_classes:int=264                            # Number of classes to predict
+             )->QuantizedEfficientNetV2:                    # The quantised model
+    "Quantises a trained model, its weights can be loaded with `get_model(quantized_key_dict[model_key][mode], output_path)`"
+    assert model_key in quantized_key_dict, f'{model_key} has no quantised version, choose one from {quantized_key_dict.keys()}.'
+    model = get_model(model_key, weights_path, num_classes=num_classes)
+
+    # Dynamic quantisation computes the activation ranges on the fly, there is nothing to calibrate
+    calibration = calibration_batches(calibration_key, n_batches, batch_size) if mode == 'static' else None
+    quantized = QuantizedEfficientNetV2(num_classes, model_dict[model_key][1].get('size', 's'), mode, model, calibration)
+
+    if output_path is not None:
+        torch.save(quantized.state_dict(), output_path)
+
+    return quantized
+
+# %% ../nbs/14_quantization.ipynb 14
+@call_parse
+def quantize_cli(weights_path:str,                          # The weights of the trained float model
+                 output_path:str,                           # Where the quantised weights are saved
+                 model_key:str='efficient_net_v2_s',        # A key of the float model in the model dictionary
+                 mode:str='static',                         # Post-training quantisation ('static'|'dynamic')
+                 calibration_key:str='val_base_per_channel',# The dataset of the calibration examples
+                 n_batches:int=8,                           # Number of calibration batches
+                 batch_size:int=16,                         # Number of examples of each calibration batch
+                 train_key:str='train_base_per_channel'     # The dataset the model was trained on, gives the number of classes
+                 ):
+    "Command line entry point of `quantize`"
+    num_classes = get_dataset(train_key).num_classes
+    quantize(model_key, weights_path, output_path, mode, calibration_key, n_batches, batch_size, num_classes)
+    print(f"Saved {output_path}, load it with get_model('{quantized_key_dict[model_key][mode]}', '{output_path}')")
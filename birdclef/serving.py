@@ -0,0 +1,299 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/13_serving.ipynb.
+
+# %% auto 0
+__all__ = ['InferenceModel', 'export_model', 'load_exported', 'BatchingServer', 'export_model_cli', 'serve_cli']
+
+# %% ../nbs/13_serving.ipynb 3
+import copy
+import json
+import math
+import time
+import queue
+import threading
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import numpy as np
+import torch
+from fastcore.script import call_parse
+
+from .dataset import MyPipeline, get_dataset
+from .network import get_model, optimize_for_inference
+
+# %% ../nbs/13_serving.ipynb 6
+class InferenceModel(torch.nn.Module):
+    "The features of `MyPipeline` without augmentations followed by the network, from `[batch, samples]` waveforms to probabilities"
+
+    def __init__(self,
+                 pipeline:MyPipeline,           # The feature extraction pipeline used in training
+                 model:torch.nn.Module,         # A trained model
+                 onnx_compatible:bool=False     # Computes the STFT as a convolution and PCEN with a matrix, so that ONNX can export them
+                 ):
+        super().__init__()
+        self.n_fft, self.hop_length, self.power = pipeline.n_fft, pipeline.hop_length, pipeline.power
+        self.num_samples = pipeline.seconds * pipeline.sample_rate
+        self.per_channel = pipeline.per_channel
+        self.onnx_compatible = onnx_compatible
+
+        self.melspec = copy.deepcopy(pipeline.melspec)
+        self.amptodb = copy.deepcopy(pipeline.amptodb)
+        self.pcen = copy.deepcopy(pipeline.pcen)
+        self.pcen.matrix_smoothing = onnx_compatible
+        self.model = model
+
+        if onnx_compatible:
+            # Real and imaginary DFT basis multiplied by the window, one output channel per frequency
+            window = self.melspec.spectrogram.window
+            k = torch.arange(self.n_fft, dtype=torch.float64)
+            f = torch.arange(self.n_fft // 2 + 1, dtype=torch.float64).unsqueeze(1)
+            angle = 2 * math.pi * f * k / self.n_fft
+            basis = torch.cat([torch.cos(angle), -torch.sin(angle)]) * window.double()
+            self.register_buffer('dft', basis.float().unsqueeze(1))
+
+    def features(self, waveform):
+        "Normalised mel spectrograms `[batch, 1, mel, time]` of 5 second waveforms"
+        if not self.onnx_compatible:
+            mel = self.melspec(waveform.unsqueeze(1))
+        else:
+            # Centered STFT with reflect padding, like torchaudio
+            x = torch.nn.functional.pad(waveform.unsqueeze(1), (self.n_fft // 2, self.n_fft // 2), mode='reflect')
+            real, imag = torch.nn.functional.conv1d(x, self.dft, stride=self.hop_length).chunk(2, dim=1)
+            spec = (real ** 2 + imag ** 2) ** (self.power / 2)
+            mel = self.melspec.mel_scale(spec).unsqueeze(1)
+
+        if not self.per_channel:
+            return self.amptodb(mel)
+        return self.pcen(mel * (2 ** 31))
+
+    def forward(self, waveform):
+        return torch.nn.functional.softmax(self.model(self.features(waveform)), dim=1)
+
+# %% ../nbs/13_serving.ipynb 9
+def export_model(model:torch.nn.Module,     # A trained model
+                 classes:list,              # Names of the classes, in the order of the model outputs
+                 output_path:str,           # A .pt file for TorchScript or a .onnx file for ONNX
+                 pipeline:MyPipeline=None,  # The feature extraction pipeline used in training
+                 opset_version:int=17       # ONNX opset
+                 )->float:                  # Largest difference between the probabilities of the artifact and of the eager model
+    "Packages the feature extraction and the optimised network in a TorchScript or ONNX artifact with a dynamic batch size"
+    output_path = Path(output_path)
+    pipeline = pipeline if pipeline is not None else MyPipeline()
+    model.eval()
+
+    onnx_compatible = output_path.suffix == '.onnx'
+    module = InferenceModel(pipeline, optimize_for_inference(model), onnx_compatible).eval()
+    example = torch.randn(2, module.num_samples) * 0.1
+    metadata = {'classes': list(classes), 'sample_rate': pipeline.sample_rate, 'num_samples': module.num_samples}
+
+    with torch.inference_mode():
+        reference = InferenceModel(pipeline, model).eval()(example)
+
+    if onnx_compatible:
+        import onnx
+
+        torch.onnx.export(module, (example,), str(output_path), input_names=['waveform'], output_names=['probabilities'],
+                          dynamic_axes={'waveform': {0: 'batch'}, 'probabilities': {0: 'batch'}}, opset_version=opset_version)
+        # The classes travel with the model
+        onnx_model = onnx.load(str(output_path))
+        onnx_model.metadata_props.add(key='birdclef', value=json.dumps(metadata))
+        onnx.save(onnx_model, str(output_path))
+    else:
+        with torch.no_grad():
+            traced = torch.jit.trace(module, example)
+        torch.jit.save(traced, str(output_path), _extra_files={'birdclef.json': json.dumps(metadata)})
+
+    # Checked with another batch size, which must work as well
+    predict, _ = load_exported(output_path)
+    with torch.inference_mode():
+        batch = torch.cat([example, example[:1]])
+        return (predict(batch)[:2] - reference).abs().max().item()
+
+# %% ../nbs/13_serving.ipynb 10
+def load_exported(path:str  # An artifact written by `export_model`
+                  )->tuple: # A function from waveforms to probabilities and the metadata of the artifact
+    "Loads a TorchScript or ONNX artifact, ONNX models are run with onnxruntime"
+    path = Path(path)
+    if path.suffix == '.onnx':
+        import onnx
+        import onnxruntime
+
+        props = {p.key: p.value for p in onnx.load(str(path), load_external_data=False).metadata_props}
+        session = onnxruntime.InferenceSession(str(path), providers=['CPUExecutionProvider'])
+        predict = lambda waveform: torch.from_numpy(session.run(None, {'waveform': waveform.numpy()})[0])
+        return predict, json.loads(props['birdclef'])
+
+    extra_files = {'birdclef.json': ''}
+    module = torch.jit.load(str(path), _extra_files=extra_files)
+    return module, json.loads(extra_files['birdclef.json'])
+
+# %% ../nbs/13_serving.ipynb 12
+class BatchingServer:
+    "A local HTTP server which groups the queued clips in dynamic batches, waiting at most `max_latency_ms` for a batch to fill"
+
+    def __init__(self,
+                 predict,                   # Function from `[batch, samples]` waveforms to probabilities
+                 classes:list,              # Names of the classes, in the order of the probabilities
+                 num_samples:int=160000,    # Samples of a clip, shorter clips are padded with silence
+                 max_batch_size:int=32,     # Largest batch given to `predict`
+                 max_latency_ms:float=10,   # Longest time the first clip of a batch waits for others
+                 timeout:float=30,          # Longest time in seconds a request waits for its probabilities
+                 host:str='127.0.0.1',      # Address of the server
+                 port:int=0                 # Port of the server, a free one if 0
+                 ):
+        self.predict, self.classes, self.num_samples = predict, list(classes), num_samples
+        self.max_batch_size, self.max_latency, self.timeout = max_batch_size, max_latency_ms / 1000, timeout
+
+        self._queue = queue.Queue()
+        self._latencies = deque(maxlen=10000)
+        self._batch_sizes = deque(maxlen=10000)
+        self._lock = threading.Lock()
+        self._start = time.perf_counter()
+        self._served = 0
+
+        server = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if self.path != '/predict':
+                    return self._reply(404, {'error': f'unknown path {self.path}'})
+                # The body is a mono float32 waveform at the sample rate of the model
+                body = self.rfile.read(int(self.headers['Content-Length']))
+                try:
+                    result = server.submit(np.frombuffer(body, dtype=np.float32))
+                except Exception as e:
+                    return self._reply(500, {'error': f'{type(e).__name__}: {e}'})
+                self._reply(200, result)
+
+            def do_GET(self):
+                if self.path != '/stats':
+                    return self._reply(404, {'error': f'unknown path {self.path}'})
+                self._reply(200, server.stats())
+
+            def _reply(self, code, content):
+                body = json.dumps(content).encode()
+                self.send_response(code)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.url = f'http://{host}:{self.httpd.server_address[1]}'
+
+    def submit(self, waveform:np.ndarray)->dict:
+        "Queues a clip and blocks until its probabilities are computed, raises if the prediction fails or takes too long"
+        waveform = torch.from_numpy(waveform[:self.num_samples].copy())
+        waveform = torch.nn.functional.pad(waveform, (0, self.num_samples - len(waveform)))
+
+        item = {'waveform': waveform, 'arrival': time.perf_counter(), 'done': threading.Event()}
+        self._queue.put(item)
+        if not item['done'].wait(self.timeout):
+            raise TimeoutError(f'No prediction within {self.timeout}s')
+        if 'error' in item:
+            error = item['error']
+            raise RuntimeError(f'The prediction of the batch failed with {type(error).__name__}: {error}') from error
+
+        probs = item['probabilities']
+        return {'probabilities': probs.tolist(), 'top': self.classes[int(probs.argmax())]}
+
+    def _batch_loop(self):
+        while True:
+            items = [self._queue.get()]
+            if items[0] is None:
+                return
+            # The batch is closed when it is full or when its first clip has waited long enough
+            deadline = items[0]['arrival'] + self.max_latency
+            while len(items) < self.max_batch_size:
+                try:
+                    item = self._queue.get(timeout=max(0, deadline - time.perf_counter()))
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)
+                    break
+                items.append(item)
+
+            try:
+                with torch.inference_mode():
+                    probs = self.predict(torch.stack([item['waveform'] for item in items]))
+            except Exception as e:
+                # The server keeps running, every request of the batch gets the error
+                for item in items:
+                    item['error'] = e
+                    item['done'].set()
+                continue
+
+            now = time.perf_counter()
+            with self._lock:
+                self._batch_sizes.append(len(items))
+                self._served += len(items)
+                for item, p in zip(items, probs):
+                    self._latencies.append(now - item['arrival'])
+            for item, p in zip(items, probs):
+                item['probabilities'] = p
+                item['done'].set()
+
+    def stats(self)->dict:
+        "Latency percentiles in milliseconds, throughput and mean batch size since the server started"
+        with self._lock:
+            latencies = np.array(self._latencies) * 1e3
+            batch_sizes = np.array(self._batch_sizes)
+            served, elapsed = self._served, time.perf_counter() - self._start
+        if len(latencies) == 0:
+            return {'requests': 0}
+        return {'requests': served, 'p50_ms': float(np.percentile(latencies, 50)), 'p99_ms': float(np.percentile(latencies, 99)),
+                'clips_per_sec': served / elapsed, 'mean_batch_size': float(batch_sizes.mean())}
+
+    def start(self):
+        "Serves from background threads and returns immediately"
+        self._start = time.perf_counter()
+        self._threads = [threading.Thread(target=self._batch_loop, daemon=True),
+                         threading.Thread(target=self.httpd.serve_forever, daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        return self
+
+    def stop(self):
+        "Stops serving and waits for the threads"
+        self.httpd.shutdown()
+        self.httpd.server_close()
+        self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+# %% ../nbs/13_serving.ipynb 17
+@call_parse
+def export_model_cli(weights_path:str,                          # The weights of the trained model
+                     output_path:str,                           # A .pt file for TorchScript or a .onnx file for ONNX
+                     model_key:str='efficient_net_v2_s',        # A key of the model dictionary
+                     train_key:str='train_base_per_channel'     # The dataset the model was trained on, gives the classes
+                     ):
+    "Command line entry point of `export_model`"
+    train_ds = get_dataset(train_key)
+    classes = sorted(train_ds.classes.unique())
+    model = get_model(model_key, weights_path, num_classes=len(classes))
+
+    diff = export_model(model, classes, output_path, MyPipeline(per_channel=train_ds.per_channel))
+    print(f'Exported {output_path}, largest difference with the eager model: {diff:.2e}')
+
+# %% ../nbs/13_serving.ipynb 18
+@call_parse
+def serve_cli(model_path:str,               # An artifact written by `export_model`
+              port:int=8000,                # Port of the server
+              max_batch_size:int=32,        # Largest batch given to the model
+              max_latency_ms:float=10       # Longest time a clip waits for its batch to fill
+              ):
+    "Serves an exported model on localhost: POST float32 waveforms to /predict, GET /stats for latency and throughput"
+    predict, metadata = load_exported(model_path)
+    server = BatchingServer(predict, metadata['classes'], metadata['num_samples'], max_batch_size, max_latency_ms, port=port)
+    print(f'Serving {model_path} on {server.url}')
+    try:
+        server.start()
+        while True:
+            time.sleep(60)
+            print(server.stats())
+    except KeyboardInterrupt:
+        server.stop()
@@ -0,0 +1,136 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/10_store.ipynb.
+
+# %% auto 0
+__all__ = ['AudioStore', 'build_store', 'build_store_cli']
+
+# %% ../nbs/10_store.ipynb 3
+import os
+import json
+from pathlib import Path
+from multiprocessing import Pool
+
+import numpy as np
+import pandas as pd
+import torch
+import torchaudio
+from tqdm import tqdm
+from fastcore.script import call_parse
+
+from .utils import AUDIO_DATA_DIR, STORE_DIR
+
+# %% ../nbs/10_store.ipynb 6
+_scales = {'int16': 32767.0, 'float16': 1.0}
+
+# %% ../nbs/10_store.ipynb 7
+class AudioStore:
+    "Read access to decoded audio kept in memory-mapped shards"
+
+    def __init__(self,
+                 store_dir:str=STORE_DIR,           # Directory created by `build_store`
+                 audio_dir:str=AUDIO_DATA_DIR       # The audio directory the filenames are relative to
+                 ):
+        self.dir = Path(store_dir)
+        self.audio_dir = audio_dir
+
+        with open(self.dir / 'store.json') as f:
+            info = json.load(f)
+        self.sample_rate = info['sample_rate']
+        self.dtype = info['dtype']
+        self.scale = _scales[self.dtype]
+
+        index = pd.read_csv(self.dir / 'index.csv')
+        self.index = {row.filename: (row.shard, row.offset, row.length) for row in index.itertuples()}
+
+        # Shards are mapped lazily, so that each DataLoader worker maps them after being started
+        self._shards = {}
+
+    def _key(self, filename):
+        return os.path.relpath(filename, self.audio_dir)
+
+    def _shard(self, shard):
+        if shard not in self._shards:
+            self._shards[shard] = np.memmap(self.dir / f'shard_{shard:05d}.bin', dtype=self.dtype, mode='r')
+        return self._shards[shard]
+
+    def __contains__(self, filename):
+        return self._key(filename) in self.index
+
+    def num_frames(self, filename:str)->int:
+        "Returns the number of samples of `filename`"
+        return self.index[self._key(filename)][2]
+
+    def load(self,
+             filename:str,          # Path of the original audio file
+             frame_offset:int=0,    # First sample to read
+             num_frames:int=-1      # Number of samples to read, all the remaining if -1
+             ):
+        "Returns a `[1, num_frames]` float waveform and its sample rate, like `torchaudio.load`"
+        shard, offset, length = self.index[self._key(filename)]
+        frame_offset = min(frame_offset, length)
+        end = length if num_frames < 0 else min(frame_offset + num_frames, length)
+
+        # The slice is a view of the mapped file, only the crop is converted to float
+        crop = self._shard(shard)[offset + frame_offset:offset + end]
+        waveform = torch.from_numpy(crop.astype(np.float32) / self.scale)
+
+        return waveform.unsqueeze(0), self.sample_rate
+
+# %% ../nbs/10_store.ipynb 10
+def _decode(args):
+    "Decodes a file into a mono waveform at the given sample rate"
+    filename, sample_rate = args
+    waveform, rate = torchaudio.load(filename)
+    waveform = waveform.mean(dim=0)
+    if rate != sample_rate:
+        waveform = torchaudio.functional.resample(waveform, rate, sample_rate)
+    return waveform.numpy()
+
+# %% ../nbs/10_store.ipynb 11
+def build_store(store_dir:str=STORE_DIR,            # Directory where the store is written
+                audio_dir:str=AUDIO_DATA_DIR,       # Directory containing the audio files
+                sample_rate:int=32000,              # Sample rate of the stored audio
+                dtype:str='int16',                  # Sample format of the shards ('int16'|'float16')
+                shard_bytes:int=2**30,              # Approximate size of each shard
+                num_workers:int=os.cpu_count()      # Number of processes decoding the audio
+                ):
+    "Decodes every audio file of `audio_dir` into memory-mapped PCM shards with an offset/length index"
+    assert dtype in _scales, f'{dtype} is not a supported dtype, choose one from {_scales.keys()}.'
+    store_dir = Path(store_dir)
+    store_dir.mkdir(parents=True, exist_ok=True)
+
+    filenames = sorted(str(f) for f in Path(audio_dir).rglob('*') if f.suffix in ('.ogg', '.wav', '.flac', '.mp3'))
+
+    rows = []
+    shard, offset, out = 0, 0, None
+    with Pool(num_workers) as pool:
+        # Decoding runs in parallel, while the shards are written in order by this process
+        decoded = pool.imap(_decode, [(f, sample_rate) for f in filenames], chunksize=4)
+        for filename, waveform in tqdm(zip(filenames, decoded), total=len(filenames)):
+            if out is None or offset * np.dtype(dtype).itemsize >= shard_bytes:
+                if out is not None:
+                    out.close()
+                    shard += 1
+                out = open(store_dir / f'shard_{shard:05d}.bin', 'wb')
+                offset = 0
+
+            samples = np.clip(waveform * _scales[dtype], -_scales[dtype], _scales[dtype]).astype(dtype)
+            out.write(samples.tobytes())
+            rows.append({'filename': os.path.relpath(filename, audio_dir), 'shard': shard, 'offset': offset, 'length': len(samples)})
+            offset += len(samples)
+
+    if out is not None:
+        out.close()
+
+    pd.DataFrame(rows, columns=['filename', 'shard', 'offset', 'length']).to_csv(store_dir / 'index.csv', index=False)
+    with open(store_dir / 'store.json', 'w') as f:
+        json.dump({'sample_rate': sample_rate, 'dtype': dtype}, f)
+
+# %% ../nbs/10_store.ipynb 12
+@call_parse
+def build_store_cli(store_dir:str=STORE_DIR,        # Directory where the store is written
+                    audio_dir:str=AUDIO_DATA_DIR,   # Directory containing the audio files
+                    dtype:str='int16',              # Sample format of the shards ('int16'|'float16')
+                    num_workers:int=os.cpu_count()  # Number of processes decoding the audio
+                    ):
+    "Command line entry point of `build_store`"
+    build_store(store_dir, audio_dir, dtype=dtype, num_workers=num_workers)
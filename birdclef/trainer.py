@@ -1,36 +1,52 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/05_trainer.ipynb.
 
 # %% auto 0
-__all__ = ['log_weights', 'train_one_epoch', 'validate_model', 'train']
+__all__ = ['log_weights', 'train_one_epoch', 'validate_model', 'train', 'check_distributed']
 
 # %% ../nbs/05_trainer.ipynb 3
+import os
 import math
-import copy
+import time
+import socket
+import contextlib
+import tempfile
 from tqdm import tqdm
 
-import wandb
+import numpy as np
+import pandas as pd
+
 import torch
 
-from .dataset import get_dataloader
+from .dataset import get_dataloader, ShardSampler
+from .autotune import autotune_dataloader
 from .network import get_model
-from .training_utils import get_optimizer, get_loss_func, get_callback_func,get_lr_scheduler, compute_metrics, metrics_dict
+from .checkpoint import CheckpointManager, get_rng_state, set_rng_state
+from .utils import CHECKPOINT_DIR
+from .loggers import Logger, NullLogger, get_logger
+from .profiling import enable_profiling, profiling_enabled, stage, timed, add_timings, collect_timings, trace_profiler
+from .training_utils import get_optimizer, get_loss_func, get_callback_func,get_lr_scheduler, compute_metrics, metrics_dict, MetricAccumulator, autocast, is_main_process
 
 # %% ../nbs/05_trainer.ipynb 4
-def log_weights(model, # A pytorch model
+def log_weights(model, # A pytorch model or its state dict
                 artifact_name, # The name of the artifact
-                config # wandb config
+                config, # The config of the run, stored with the artifact
+                logger:Logger # The logger of the run
                 ):
-    "A method to log artifacts into wandb"
+    "A method to log the weights as an artifact of the run"
 
-    model_artifact = wandb.Artifact(
-        artifact_name, type="model",
-        metadata=dict(config))
+    state_dict = model.state_dict() if isinstance(model, torch.nn.Module) else model
+    torch.save(state_dict, f"{artifact_name}.pth")
 
-    torch.save(model.state_dict(), f"{artifact_name}.pth")
-    
-    model_artifact.add_file(f"{artifact_name}.pth")
+    logger.log_artifact(f"{artifact_name}.pth", artifact_name, dict(config))
 
-    wandb.log_artifact(model_artifact)
+def _timing_logs(timings):
+    "Durations in milliseconds, logged as histograms, and their means by stage"
+    logs = {}
+    for name, durations in timings.items():
+        durations = np.array(durations) * 1e3
+        logs[f'profile/{name}'] = durations
+        logs[f'profile/{name}_mean_ms'] = durations.mean()
+    return logs
 
 # %% ../nbs/05_trainer.ipynb 5
 def train_one_epoch(model,                  # A pytorch model
@@ -41,51 +57,120 @@ def train_one_epoch(model,                  # A pytorch model
                     epoch,                  # The epoch the model is training
                     example_ct,             # The number of examples the model has been trained on
                     step_ct,                # The number of backpropagation steps the model has done
-                    n_steps_per_epoch,      # The number of steps for each epoch
+                    n_steps_per_epoch,      # The number of optimizer steps for each epoch
                     callback_step,          # Steps indicating when the callback function must be called
                     callback_func,          # Callback function
                     scheduler_step,         # steps indicating when to call the learning rate scheduler
                     scheduler_metric,       # metrics tu update the learning rate
-                    scheduler               # the learning rate scheduler
+                    scheduler,              # the learning rate scheduler
+                    log_step=1,             # Steps between two logs, the metrics are accumulated on the device in between
+                    amp=None,               # Autocast precision ('bf16'|'fp16'), fp32 if None
+                    channels_last=False,    # Whether the inputs are converted to the channels last memory format
+                    scaler=None,            # Gradient scaler, needed by fp16
+                    accumulation_steps=1,   # Number of loaded batches whose gradients are accumulated before each optimizer step
+                    micro_batch_size=None,  # Loaded batches are split into micro-batches of this size, not split if None
+                    profiler=None,          # A torch.profiler advanced after every optimizer step, see `trace_profiler`
+                    logger:Logger=None      # Where the train metrics are logged every `log_step` steps, not logged if None
                     ):
     "Train a pytorch model for one epoch"
 
     model.train()
-    progress_bar = tqdm(range(len(train_dl)))
+    progress_bar = tqdm(range(len(train_dl)), disable=not is_main_process())
+
+    # Distributed samplers and multi-crop datasets shuffle differently at every epoch
+    for source in (getattr(train_dl, 'sampler', None), train_dl.dataset):
+        if hasattr(source, 'set_epoch'):
+            source.set_epoch(epoch)
+
+    # Metrics are only reduced and copied to the host when they are logged
+    accumulator = MetricAccumulator(train_dl.dataset.num_classes, device)
+    metrics = None
+    memory_format = torch.channels_last if channels_last else torch.contiguous_format
+    if scaler is None:
+        scaler = torch.cuda.amp.GradScaler(enabled=False)
+
+    n_batches = len(train_dl)
+    n_processes = torch.distributed.get_world_size() if torch.distributed.is_available() and torch.distributed.is_initialized() else 1
+    optimizer.zero_grad()
+
+    for batch, data in enumerate(timed(train_dl, 'train/data_wait')):
+        # Timings of the worker which loaded the batch, when profiling
+        if 'timings' in data:
+            add_timings(data.pop('timings'))
+        with stage('train/to_device'):
+            inputs, labels = data['input'], data['label']
+            inputs, labels = inputs.to(device, memory_format=memory_format), labels.to(device)
 
-    for step, data in enumerate(train_dl):
-        inputs, labels = data['input'], data['label']
-        inputs, labels = inputs.to(device), labels.to(device)
+        # Number of loaded batches in this optimizer step, the last step of the epoch can have less
+        n_accumulated = min(accumulation_steps, n_batches - (batch // accumulation_steps) * accumulation_steps)
         
-        optimizer.zero_grad()
-
-        outputs = model(inputs)
+        outputs = []
+        size = micro_batch_size or len(inputs)
+        micro_batches = list(zip(inputs.split(size), labels.split(size)))
+        last_batch = (batch + 1) % accumulation_steps == 0 or (batch + 1) == n_batches
+        for i, (micro_inputs, micro_labels) in enumerate(micro_batches):
+            # A distributed model only averages the gradients across processes in the last backward of the step
+            last_micro_batch = last_batch and i == len(micro_batches) - 1
+            sync = contextlib.nullcontext() if last_micro_batch or not hasattr(model, 'no_sync') else model.no_sync()
+            with sync, stage('train/forward_backward', device):
+                with autocast(device, amp):
+                    micro_outputs = model(micro_inputs)
+
+                    train_loss = loss_func(micro_outputs, micro_labels)
+
+                # Weighted so that the gradient is the one of the mean loss over the batches of the step
+                # The scaler does nothing when it is disabled
+                scaler.scale(train_loss * (len(micro_labels) / len(labels) / n_accumulated)).backward()
+
+            with stage('train/metrics', device):
+                accumulator.update(micro_outputs, micro_labels, train_loss)
+            outputs.append(micro_outputs.detach())
+        outputs = torch.cat(outputs)
+
+        example_ct += len(inputs) * n_processes
+        progress_bar.update(1)
 
-        train_loss = loss_func(outputs, labels)
-        
-        train_loss.backward()
-        optimizer.step()
+        if not last_batch:
+            continue
 
-        example_ct += len(inputs)
+        with stage('train/optimizer', device):
+            scaler.step(optimizer)
+            scaler.update()
+            optimizer.zero_grad()
+        if profiler is not None:
+            profiler.step()
 
+        # Steps, like the scheduler and log steps, count optimizer steps
+        step = batch // accumulation_steps
         epoch_number = (step + 1) / n_steps_per_epoch + epoch
-        metrics = compute_metrics('train', outputs, labels, train_loss, example_ct, step_ct, epoch_number)
         
         if (step + 1)%scheduler_step == 0:
             if type(scheduler) is torch.optim.lr_scheduler.ReduceLROnPlateau:
+                metrics = accumulator.compute('train', example_ct, step_ct, epoch_number)
                 scheduler.step(metrics[f"train/{scheduler_metric}"])
             else:
                 scheduler.step()
 
-        if (step + 1) < n_steps_per_epoch:
-            # Log train metrics to wandb
-            wandb.log(metrics)
+        if (step + 1)%log_step == 0:
+            with stage('train/metrics', device):
+                metrics = accumulator.compute('train', example_ct, step_ct, epoch_number)
+                accumulator.reset()
+            if (step + 1) < n_steps_per_epoch:
+                # Stage timings of the window when profiling, every process empties its buffer
+                timings = collect_timings() if profiling_enabled() else {}
+                if is_main_process() and logger is not None:
+                    # Only queued, the logger writes from a background thread
+                    with stage('train/logging'):
+                        logger.log({**metrics, **_timing_logs(timings)})
         # Run callback func
         if callback_func is not None and step_ct % callback_step == 0:
             callback_func(data, outputs)
 
         step_ct += 1
-        progress_bar.update(1)
+
+    # The metrics of the last window are returned, they are logged with the validation metrics
+    if accumulator.count > 0 or metrics is None:
+        metrics = accumulator.compute('train', example_ct, step_ct - 1, epoch_number)
 
     return metrics, example_ct, step_ct
 
@@ -97,106 +182,388 @@ def validate_model(model, # A pytorch model
                    epoch, # The epoch the model has been trained
                    example_ct, # The number of examples the model has been trained on
                    step_ct, # The number of backpropagation steps the model has done
-                   dataset_type='val' # The name of the dataset used
+                   dataset_type='val', # The name of the dataset used
+                   streaming=False, # Keeps only fixed-size statistics instead of all the outputs, in constant memory
+                   classes=None, # Names of the classes, when given a per-class report is also returned
+                   n_bins=1000, # Number of bins of the probability histograms of the per-class report
+                   amp=None, # Autocast precision ('bf16'|'fp16'), fp32 if None
+                   channels_last=False, # Whether the inputs are converted to the channels last memory format
+                   logger:Logger=None # The metrics are logged with the next ones of the run (`commit=False`), not logged if None
                   ):
     "Test or validate a pytorch model"
     
     model.eval()
+
+    # In distributed runs every process evaluates a shard and the statistics are summed across processes
+    streaming = streaming or (torch.distributed.is_available() and torch.distributed.is_initialized())
     
     metrics = {}
     labels_acc = []
     outputs_acc = []
     loss = 0.0
+    # Created before the loop, a process of a distributed run can get no batch and still takes part in the reduction
+    num_classes = valid_dl.dataset.num_classes
+    accumulator = MetricAccumulator(num_classes, device, n_bins if classes is not None else None) if streaming else None
+    memory_format = torch.channels_last if channels_last else torch.contiguous_format
     
-    progress_bar = tqdm(range(len(valid_dl)))
+    progress_bar = tqdm(range(len(valid_dl)), disable=not is_main_process())
     with torch.inference_mode():
-        for i, data in enumerate(valid_dl):
-            inputs, labels = data['input'], data['label']
-            inputs, labels = inputs.to(device), labels.to(device)
-
-            # Forward pass
-            outputs = model(inputs)
-            loss += loss_func(outputs, labels) * labels.size(0)
-
-            # Add labels and outputs to acc
-            labels_acc.append(labels)
-            outputs_acc.append(outputs)
+        for i, data in enumerate(timed(valid_dl, f'{dataset_type}/data_wait')):
+            if 'timings' in data:
+                add_timings(data.pop('timings'))
+            with stage(f'{dataset_type}/to_device'):
+                inputs, labels = data['input'], data['label']
+                inputs, labels = inputs.to(device, memory_format=memory_format), labels.to(device)
+
+            # Forward pass, the metrics are computed in fp32
+            with stage(f'{dataset_type}/forward', device):
+                with autocast(device, amp):
+                    outputs = model(inputs)
+                outputs = outputs.float()
+                batch_loss = loss_func(outputs, labels)
+
+            with stage(f'{dataset_type}/metrics', device):
+                if streaming:
+                    # Confusion matrix, loss sum and histograms are updated in place on the device
+                    accumulator.update(outputs, labels, batch_loss)
+                else:
+                    loss += batch_loss * labels.size(0)
+
+                    # Add labels and outputs to acc
+                    labels_acc.append(labels)
+                    outputs_acc.append(outputs)
 
             progress_bar.update(1)
 
-    # Divide loss by dataset length
-    val_loss = loss / len(valid_dl.dataset)
-
-    labels = torch.cat(labels_acc, dim=0)
-    outputs = torch.cat(outputs_acc, dim=0)
-
-    metrics = compute_metrics(dataset_type, outputs, labels, val_loss, example_ct, step_ct, epoch)
+    if streaming:
+        metrics = accumulator.compute(dataset_type, example_ct, step_ct, epoch)
+    else:
+        # Divide loss by dataset length
+        val_loss = loss / len(valid_dl.dataset)
 
-    return metrics
-
-# %% ../nbs/05_trainer.ipynb 7
-def train(conf = None # Wandb configurations containing all hyperparameters
-          ):
-    "Train, validate and test a model using the given configurations"
-
-    with wandb.init(conf) as run:
-        config = wandb.config
-        run.name = f"{config.run_name}"
-
-        # Checking that the defined metric exist
-        assert config.metric in metrics_dict, f'{config.metric} is not an existing metric, choose one from {metrics_dict.keys()}.'
-
-        # Getting dataloaders
-        train_dl = get_dataloader(config.train_key, config.train_kwargs)
-        valid_dl = get_dataloader(config.val_key, config.val_kwargs)
-        test_dl = get_dataloader(config.test_key, config.val_kwargs)
-
-        # Getting model, optimizer and loss function
-        model = get_model(config.model_key, num_classes=train_dl.dataset.num_classes)
-        model.to(config.device)
-        optimizer = get_optimizer(config.optimizer_key, model, config.optimizer_kwargs)
-        loss_func = get_loss_func(config.loss_key)
-        callback_func = get_callback_func(config.callback_key)
-        config.lr_scheduler_kwargs["total_iters"] = (len(train_dl)*config.epochs)//config.lr_scheduler_kwargs["scheduler_step"]
-        config.lr_scheduler_kwargs["T_max"] = (len(train_dl)*config.epochs)//config.lr_scheduler_kwargs["scheduler_step"]
-        lr_scheduler = get_lr_scheduler(config.lr_scheduler_key, optimizer, config.lr_scheduler_kwargs)
+        labels = torch.cat(labels_acc, dim=0)
+        outputs = torch.cat(outputs_acc, dim=0)
 
-        n_steps_per_epoch = math.ceil(len(train_dl.dataset) / config.train_kwargs['batch_size'])
+        metrics = compute_metrics(dataset_type, outputs, labels, val_loss, example_ct, step_ct, epoch)
 
-        # Counters
-        example_ct = 0
-        step_ct = 0
+        if classes is not None:
+            accumulator = MetricAccumulator(num_classes, device, n_bins)
+            accumulator.update(outputs, labels, val_loss)
 
-        best_val = None
-        for epoch in range(config.epochs):
-            print(f"Training epoch {epoch}")
-            # Train
-            metrics, example_ct, step_ct = train_one_epoch(model, train_dl, loss_func, optimizer, config.device, epoch, example_ct, step_ct, n_steps_per_epoch, config.callback_step, callback_func, config.lr_scheduler_kwargs["scheduler_step"], config.lr_scheduler_kwargs["scheduler_metric"], lr_scheduler)
+    report = accumulator.class_report(classes) if classes is not None else None
+    if logger is not None and is_main_process():
+        logger.log({**metrics, **({f'{dataset_type}/class_report': report} if report is not None else {})}, commit=False)
 
-            print("\tFinished training. Starting validation")
+    if classes is not None:
+        return metrics, report
 
-            # Validate
-            val_metrics = validate_model(model, valid_dl, loss_func, config.device, epoch + 1, example_ct, step_ct)
-
-            print('\tFinshed validation')
-
-            # Log train and validation metrics to wandb
-            wandb.log({**metrics, **val_metrics})
-
-            print("\tMetrics logged to wandb")
-
-            # If the best metric is reached, save the artifact
-            if best_val is None or metrics_dict[config.metric](val_metrics[f'val/{config.metric}'], best_val):
-                print(f'\t{config.metric} in the validation set has improved!')
-                best_val = val_metrics[f'val/{config.metric}']
-                best_example, best_step, best_epoch = example_ct, step_ct, epoch
-                best_model = copy.deepcopy(model)
-                log_weights(model, config.run_name, config)
-
-        print("\tTesting with best model")
-        # Test best model
-        test_metrics = validate_model(best_model, test_dl, loss_func, config.device, best_epoch, best_example, best_step, dataset_type="test")
+    return metrics
 
+# %% ../nbs/05_trainer.ipynb 13
+def _fit(config,        # The configuration of the run
+         logger,        # The logger of the run, a `NullLogger` in the processes other than rank 0
+         rank=0,        # Rank of this process in a distributed run
+         world_size=1   # Number of processes of the run
+         ):
+    "Trains, validates and tests a model in one process, only the process with rank 0 logs"
+    main = is_main_process()
+    distributed = world_size > 1
+    device = f'cuda:{rank}' if distributed and config.device == 'cuda' else config.device
+
+    # Checking that the defined metric exist
+    assert config.metric in metrics_dict, f'{config.metric} is not an existing metric, choose one from {metrics_dict.keys()}.'
+
+    # Stage timings and an optional torch.profiler trace window, recorded in the config of the run.
+    # Profiling is switched on before the dataloaders are created, so that their workers report their timings.
+    profile = config.get('profile', False)
+    profile_trace = config.get('profile_trace', None)
+    config.update({'profile': profile, 'profile_trace': profile_trace}, allow_val_change=True)
+    enable_profiling(profile)
+
+    # Getting dataloaders, in distributed runs every process gets a part of each dataset.
+    # The seed gives the augmentations and the order of the examples.
+    seed = config.get('seed', 0)
+    config.update({'seed': seed}, allow_val_change=True)
+    train_dl = get_dataloader(config.train_key, config.train_kwargs, seed=seed)
+    valid_dl = get_dataloader(config.val_key, config.val_kwargs, pad_shards=False, seed=seed)
+    test_dl = get_dataloader(config.test_key, config.val_kwargs, pad_shards=False, seed=seed)
+
+    # Getting model, optimizer and loss function
+    model = get_model(config.model_key, num_classes=train_dl.dataset.num_classes)
+    # Names of the classes in the order of the model outputs, for the per-class reports
+    classes = sorted(train_dl.dataset.classes.unique())
+    # Mixed precision and memory format, recorded in the config of the run
+    amp = config.get('amp', None)
+    channels_last = config.get('channels_last', False)
+    config.update({'amp': amp, 'channels_last': channels_last}, allow_val_change=True)
+    model.to(device, memory_format=torch.channels_last if channels_last else torch.contiguous_format)
+    scaler = torch.cuda.amp.GradScaler(enabled=amp == 'fp16')
+
+    if config.get('precision_report', False) and main:
+        # The benchmarks are only loaded when asked for
+        from birdclef.benchmark import benchmark_precision
+
+        # Throughput and output agreement of every precision and memory format on this machine. The shape is the one of
+        # the features, batched datasets load waveforms.
+        pipeline = train_dl.dataset.pipeline
+        report = benchmark_precision(config.model_key, train_dl.dataset.num_classes, config.train_kwargs['batch_size'],
+                                     (1, pipeline.n_mels, pipeline.c_length), device=device)
+        logger.log({'precision_report': report})
+
+    # The weights are broadcast from rank 0 and the gradients are averaged across processes
+    net = model
+    if distributed:
+        model = torch.nn.parallel.DistributedDataParallel(model, device_ids=[rank] if device.startswith('cuda') else None)
+
+    optimizer = get_optimizer(config.optimizer_key, model, config.optimizer_kwargs)
+    loss_func = get_loss_func(config.loss_key)
+    callback_func = get_callback_func(config.callback_key)
+
+    # Gradient accumulation and micro-batches, the schedule is computed in optimizer steps
+    accumulation_steps = config.get('accumulation_steps', 1)
+    micro_batch_size = config.get('micro_batch_size', None)
+    config.update({'accumulation_steps': accumulation_steps, 'micro_batch_size': micro_batch_size}, allow_val_change=True)
+    n_steps_per_epoch = math.ceil(len(train_dl) / accumulation_steps)
+
+    config.lr_scheduler_kwargs["total_iters"] = (n_steps_per_epoch*config.epochs)//config.lr_scheduler_kwargs["scheduler_step"]
+    config.lr_scheduler_kwargs["T_max"] = (n_steps_per_epoch*config.epochs)//config.lr_scheduler_kwargs["scheduler_step"]
+    lr_scheduler = get_lr_scheduler(config.lr_scheduler_key, optimizer, config.lr_scheduler_kwargs)
+
+    # Steps between two logs of the train metrics, recorded in the config of the run
+    log_step = config.get('log_step', 1)
+    # Validation in constant memory, exact for the logged metrics
+    streaming_eval = config.get('streaming_eval', False)
+    config.update({'log_step': log_step, 'streaming_eval': streaming_eval}, allow_val_change=True)
+
+    # Checkpoints are written by rank 0 in the background at the end of every epoch, recorded in the config of the run
+    checkpoint_dir = config.get('checkpoint_dir', None) or os.path.join(CHECKPOINT_DIR, config.run_name)
+    keep_last = config.get('keep_last', 3)
+    resume = config.get('resume', False)
+    config.update({'checkpoint_dir': checkpoint_dir, 'keep_last': keep_last, 'resume': resume}, allow_val_change=True)
+    checkpoints = CheckpointManager(checkpoint_dir, keep_last)
+    if main and not resume:
+        # Otherwise the older checkpoints of a run with the same name would be taken as the latest ones
+        checkpoints.clear()
+
+    # Counters, example_ct counts the examples of every process
+    example_ct = 0
+    step_ct = 0
+
+    best_val = None
+    start_epoch = 0
+    checkpoint = checkpoints.load(map_location=device) if resume else None
+    if checkpoint is not None:
+        # Every process loads the same checkpoint, so the distributed replicas stay identical
+        net.load_state_dict(checkpoint['model'])
+        optimizer.load_state_dict(checkpoint['optimizer'])
+        lr_scheduler.load_state_dict(checkpoint['scheduler'])
+        scaler.load_state_dict(checkpoint['scaler'])
+        set_rng_state(checkpoint['rng'])
+        example_ct, step_ct = checkpoint['example_ct'], checkpoint['step_ct']
+        best_val, best_example, best_step, best_epoch = checkpoint['best']
+        start_epoch = checkpoint['epoch'] + 1
+        print(f"Resuming from {checkpoints.latest()} at epoch {start_epoch}")
+
+    # The trace covers `active` optimizer steps after `wait + warmup` ones, e.g. {'trace_dir': '../traces/', 'wait': 5, 'active': 3}
+    profiler = trace_profiler(**profile_trace) if profile_trace is not None and main else None
+    if profiler is not None:
+        profiler.start()
+
+    for epoch in range(start_epoch, config.epochs):
+        print(f"Training epoch {epoch}")
+        # Train
+        start, start_ct = time.perf_counter(), example_ct
+        metrics, example_ct, step_ct = train_one_epoch(model, train_dl, loss_func, optimizer, device, epoch, example_ct, step_ct, n_steps_per_epoch, config.callback_step, callback_func, config.lr_scheduler_kwargs["scheduler_step"], config.lr_scheduler_kwargs["scheduler_metric"], lr_scheduler, log_step, amp, channels_last, scaler, accumulation_steps, micro_batch_size, profiler, logger)
+        # Throughput of the epoch, to compare precisions and memory formats across runs
+        metrics['train/examples_per_sec'] = (example_ct - start_ct) / (time.perf_counter() - start)
+
+        print("\tFinished training. Starting validation")
+
+        # Validate, without the distributed wrapper since the processes can have a different number of batches
+        val_metrics, _ = validate_model(net, valid_dl, loss_func, device, epoch + 1, example_ct, step_ct, streaming=streaming_eval, classes=classes, amp=amp, channels_last=channels_last, logger=logger)
+
+        print('\tFinshed validation')
+
+        # Stage timings since the last log when profiling
+        timings = collect_timings() if profiling_enabled() else {}
+        if main:
+            # Log train metrics, in the same step as the validation metrics
+            logger.log({**metrics, **_timing_logs(timings)})
+
+            print("\tMetrics logged")
+
+        # If the best metric is reached, save the artifact
+        is_best = best_val is None or metrics_dict[config.metric](val_metrics[f'val/{config.metric}'], best_val)
+        if is_best:
+            print(f'\t{config.metric} in the validation set has improved!')
+            best_val = val_metrics[f'val/{config.metric}']
+            best_example, best_step, best_epoch = example_ct, step_ct, epoch
+
+        if main:
+            # The state is copied to the cpu here, the files and the artifact are written by a background thread
+            state = {'model': net.state_dict(), 'optimizer': optimizer.state_dict(), 'scheduler': lr_scheduler.state_dict(),
+                     'scaler': scaler.state_dict(), 'rng': get_rng_state(), 'epoch': epoch, 'example_ct': example_ct,
+                     'step_ct': step_ct, 'best': (best_val, best_example, best_step, best_epoch)}
+            log_best = lambda snapshot: log_weights(snapshot['model'], config.run_name, config, logger)
+            checkpoints.save(state, step_ct, is_best, log_best if is_best else None)
+
+    if profiler is not None:
+        profiler.stop()
+
+    # The best weights are read back from disk instead of keeping a copy of the model in memory
+    if main:
+        checkpoints.wait()
+    if distributed:
+        torch.distributed.barrier()
+    net.load_state_dict(checkpoints.load(checkpoints.best_path, map_location=device)['model'])
+    checkpoints.close()
+
+    print("\tTesting with best model")
+    # Test best model
+    test_metrics, test_report = validate_model(net, test_dl, loss_func, device, best_epoch, best_example, best_step, dataset_type="test", streaming=streaming_eval, classes=classes, amp=amp, channels_last=channels_last)
+
+    timings = collect_timings() if profiling_enabled() else {}
+    if main:
         # Load test metrics as summary
-        for key in test_metrics.keys():
-            wandb.summary[key] = test_metrics[key]
+        logger.summary(test_metrics)
+        logger.log({'test/class_report': test_report, **_timing_logs(timings)})
+    enable_profiling(False)
+
+# %% ../nbs/05_trainer.ipynb 14
+def _fit_worker(index, world_size, config, init_method):
+    "A process of a distributed run started by `train`, it has rank `index + 1` and does not log"
+    torch.set_num_threads(max(1, os.cpu_count() // world_size))
+    torch.distributed.init_process_group(config.get('dist_backend', 'gloo'), init_method=init_method,
+                                         rank=index + 1, world_size=world_size)
+    logger = NullLogger(config)
+    try:
+        _fit(logger.config, logger, index + 1, world_size)
+    finally:
+        torch.distributed.destroy_process_group()
+
+# %% ../nbs/05_trainer.ipynb 15
+def train(conf = None # Configurations containing all hyperparameters, given by the wandb sweep agent if None
+          ):
+    "Train, validate and test a model using the given configurations, in `world_size` processes if it is in the config"
+
+    # The backend of the logs, e.g. {'logger': 'local', 'logger_kwargs': {'format': 'parquet'}} trains without network
+    logger_key = (conf or {}).get('logger', 'wandb')
+    with get_logger(logger_key, conf, (conf or {}).get('logger_kwargs', {})) as logger:
+        config = logger.config
+        config.update({'logger': logger_key}, allow_val_change=True)
+
+        # Number of data-parallel processes, the gloo backend also works on hosts without gpus
+        world_size = config.get('world_size', 1)
+        config.update({'world_size': world_size}, allow_val_change=True)
+
+        # Workers, prefetching and pinned memory measured on this host before any process starts, e.g. {'autotune': True}
+        # or {'autotune': {'memory_budget_mb': 8000}}. The chosen settings replace the ones of train_kwargs in the config of the run.
+        autotune = config.get('autotune', False)
+        if autotune:
+            train_kwargs = autotune_dataloader(config.train_key, dict(config.train_kwargs), world_size=world_size,
+                                               **(autotune if isinstance(autotune, dict) else {}))
+            config.update({'train_kwargs': train_kwargs}, allow_val_change=True)
+        config.update({'autotune': autotune}, allow_val_change=True)
+        if world_size == 1:
+            _fit(config, logger)
+            return
+
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            init_method = f'tcp://127.0.0.1:{sock.getsockname()[1]}'
+
+        # This process keeps the logger and has rank 0, the others are started here
+        workers = torch.multiprocessing.start_processes(_fit_worker, args=(world_size, dict(config), init_method),
+                                                        nprocs=world_size - 1, join=False, start_method='spawn')
+        # The processes share the cpus during the run, the caller gets its threads back afterwards
+        num_threads = torch.get_num_threads()
+        torch.set_num_threads(max(1, os.cpu_count() // world_size))
+        torch.distributed.init_process_group(config.get('dist_backend', 'gloo'), init_method=init_method,
+                                             rank=0, world_size=world_size)
+        try:
+            _fit(config, logger, 0, world_size)
+        finally:
+            torch.distributed.destroy_process_group()
+            torch.set_num_threads(num_threads)
+            while not workers.join():
+                pass
+
+# %% ../nbs/05_trainer.ipynb 19
+class _SyntheticDataset(torch.utils.data.Dataset):
+    "Random spectrograms with the items of `BirdClef`, used by `check_distributed`"
+
+    def __init__(self, inputs, labels, num_classes):
+        self.inputs, self.labels, self.num_classes = inputs, labels, num_classes
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, idx):
+        return {'input': self.inputs[idx], 'label': self.labels[idx]}
+
+def _check_run(data, batch_size, epochs, world_size=1):
+    "Trains a small network on synthetic data, in one process of a distributed run if `world_size` > 1"
+    dataset = _SyntheticDataset(*data)
+    train_sampler = torch.utils.data.DistributedSampler(dataset, shuffle=False) if world_size > 1 else None
+    valid_sampler = ShardSampler(dataset) if world_size > 1 else None
+    train_dl = torch.utils.data.DataLoader(dataset, batch_size=batch_size, sampler=train_sampler)
+    valid_dl = torch.utils.data.DataLoader(dataset, batch_size=batch_size, sampler=valid_sampler)
+
+    torch.manual_seed(0)
+    net = torch.nn.Sequential(torch.nn.Conv2d(1, 8, 3), torch.nn.ReLU(), torch.nn.AdaptiveAvgPool2d(1),
+                              torch.nn.Flatten(), torch.nn.Linear(8, dataset.num_classes))
+    model = torch.nn.parallel.DistributedDataParallel(net) if world_size > 1 else net
+    optimizer = torch.optim.SGD(model.parameters(), lr=0.5)
+    scheduler = torch.optim.lr_scheduler.StepLR(optimizer, step_size=1, gamma=0.9)
+
+    example_ct, step_ct = 0, 0
+    for epoch in range(epochs):
+        # Nothing is logged without a logger
+        metrics, example_ct, step_ct = train_one_epoch(model, train_dl, torch.nn.functional.cross_entropy, optimizer, 'cpu', epoch,
+                                                       example_ct, step_ct, len(train_dl), 1, None, 1, 'loss', scheduler, len(train_dl))
+    val_metrics = validate_model(net, valid_dl, torch.nn.functional.cross_entropy, 'cpu', epochs, example_ct, step_ct)
+
+    return {k: v.detach().clone() for k, v in net.state_dict().items()}, {**metrics, **val_metrics}
+
+def _check_worker(rank, world_size, init_method, data, batch_size, epochs, path):
+    "A process of `check_distributed`, rank 0 saves its results to `path`"
+    torch.set_num_threads(1)
+    torch.distributed.init_process_group('gloo', init_method=init_method, rank=rank, world_size=world_size)
+    try:
+        results = _check_run(data, batch_size, epochs, world_size)
+        if rank == 0:
+            torch.save(results, path)
+    finally:
+        torch.distributed.destroy_process_group()
+
+# %% ../nbs/05_trainer.ipynb 20
+def check_distributed(world_size:int=2,     # Number of processes of the distributed run
+                      batch_size:int=4,     # Batch size of each process, the single process uses `world_size` times more
+                      n_examples:int=64,    # Number of synthetic examples, a multiple of `world_size * batch_size`
+                      num_classes:int=5,    # Number of synthetic classes
+                      epochs:int=2,         # Number of training epochs
+                      atol:float=1e-5       # Tolerance on the weights and the metrics
+                      )->pd.DataFrame:      # The metrics of both runs
+    "Checks on local gloo processes that distributed training gives the weights and metrics of a single process"
+    generator = torch.Generator().manual_seed(0)
+    data = (torch.randn(n_examples, 1, 16, 20, generator=generator),
+            torch.randint(0, num_classes, (n_examples,), generator=generator), num_classes)
+
+    single_weights, single_metrics = _check_run(data, batch_size * world_size, epochs)
+
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        init_method = f'tcp://127.0.0.1:{sock.getsockname()[1]}'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'results.pt')
+        torch.multiprocessing.spawn(_check_worker, args=(world_size, init_method, data, batch_size, epochs, path), nprocs=world_size)
+        weights, metrics = torch.load(path)
+
+    for key in single_weights:
+        diff = (single_weights[key] - weights[key]).abs().max().item()
+        assert diff <= atol, f'The weights {key} differ by {diff} between the single process and the distributed run.'
+    for key in single_metrics:
+        assert abs(float(single_metrics[key]) - float(metrics[key])) <= atol, f'{key} is {metrics[key]} instead of {single_metrics[key]}.'
+
+    return pd.DataFrame({'single_process': single_metrics, 'distributed': metrics}).astype(float)
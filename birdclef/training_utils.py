@@ -1,14 +1,15 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/04_training_utils.ipynb.
 
 # %% auto 0
-__all__ = ['metadata', 'sample_weights', 'losses_dict', 'optimizers_dict', 'metrics_dict', 'callback_dict', 'scheduler_dict',
-           'focal_loss', 'get_loss_func', 'get_optimizer', 'padded_cmap', 'compute_metrics', 'show_one_example',
+__all__ = ['losses_dict', 'optimizers_dict', 'metrics_dict', 'callback_dict', 'scheduler_dict', 'get_sample_weights',
+           'focal_loss', 'get_loss_func', 'get_optimizer', 'padded_cmap', 'fast_padded_cmap', 'CmapAccumulator',
+           'compute_metrics', 'MetricAccumulator', 'autocast', 'is_main_process', 'show_one_example',
            'get_callback_func', 'get_lr_scheduler']
 
-# %% ../nbs/04_training_utils.ipynb 4
+# %% ../nbs/04_training_utils.ipynb 3
+import contextlib
 from operator import gt, lt
-from IPython.display import Audio
-from IPython.core.display import display
+from functools import lru_cache
 
 import numpy as np
 from sklearn.metrics import accuracy_score, precision_recall_fscore_support, average_precision_score
@@ -19,15 +20,18 @@ import pandas as pd
 import torchvision
 
 from .utils import plot_spectrogram, mel_to_wave
+from .dataset import get_metadata
 
 # %% ../nbs/04_training_utils.ipynb 5
-metadata = pd.read_csv('../data/base/train_metadata.csv')
-sample_weights = (
-    metadata['primary_label'].value_counts(sort=False) / 
-    metadata['primary_label'].value_counts(sort=False).sum()
-) ** (-0.5)
-sample_weights = torch.Tensor(sample_weights.values)
-sample_weights.shape
+@lru_cache(maxsize=None)
+def get_sample_weights()->torch.Tensor:
+    "Class weights of the weighted cross entropy, computed from the training metadata the first time they are needed"
+    metadata = get_metadata('base/train')
+    sample_weights = (
+        metadata['primary_label'].value_counts(sort=False) / 
+        metadata['primary_label'].value_counts(sort=False).sum()
+    ) ** (-0.5)
+    return torch.Tensor(sample_weights.values)
 
 # %% ../nbs/04_training_utils.ipynb 6
 def focal_loss(scores, labels): 
@@ -49,7 +53,7 @@ def get_loss_func(loss:str # Key into the losses dictionary
     assert loss in losses_dict.keys(), f'{loss} is not an existing loss function, choose one from {losses_dict.keys()}.'
     
     if loss == 'ce_weighted':
-        return losses_dict[loss](weight=sample_weights.to('cuda'))
+        return losses_dict[loss](weight=get_sample_weights().to('cuda'))
     
     if loss == 'focal_loss':
         return losses_dict[loss]
@@ -71,7 +75,7 @@ def get_optimizer(optim:str, # Key into the optimizer dictionary
     
     return optimizers_dict[optim](model.parameters(), **kwargs)
 
-# %% ../nbs/04_training_utils.ipynb 11
+# %% ../nbs/04_training_utils.ipynb 12
 def padded_cmap(outputs, # Model outputs. Can be either numpy or torch. Must be one hot encoded
                  labels # Labels. Can be either numpy or torch. Must be one hot encoded
                  )->float: # Returns the padded cmap score
@@ -91,8 +95,81 @@ def padded_cmap(outputs, # Model outputs. Can be either numpy or torch. Must be
 
     return score
 
+# %% ../nbs/04_training_utils.ipynb 13
+def fast_padded_cmap(outputs, # Model outputs. Can be either numpy or torch
+                     labels # Labels. Can be either numpy or torch. Must be one hot encoded
+                     )->float: # Returns the padded cmap score
+    "Vectorised `padded_cmap`, every class column is sorted once and the precision is read from cumulative sums"
+    assert outputs.shape == labels.shape, f'Outputs and labels must have the same shape, got {outputs.shape} and {labels.shape} instead.'
 
-# %% ../nbs/04_training_utils.ipynb 12
+    if type(outputs) == torch.Tensor:
+        outputs = outputs.detach().cpu().numpy()
+    if type(labels) == torch.Tensor:
+        labels = labels.detach().cpu().numpy()
+
+    # One contiguous row per class, with the 5 padding examples first
+    outputs = np.hstack([np.ones((outputs.shape[1], 5)), outputs.T])
+    labels = np.hstack([np.ones((labels.shape[1], 5), dtype=bool), labels.T > 0])
+
+    # Every class sorted by decreasing score, the order inside ties does not matter
+    order = np.argsort(-outputs, axis=1)
+    scores = np.take_along_axis(outputs, order, axis=1)
+    labels = np.take_along_axis(labels, order, axis=1)
+    precision = np.cumsum(labels, axis=1) / np.arange(1, labels.shape[1] + 1)
+
+    # Tied scores are a single threshold, so every positive gets the precision at the end of its group of ties
+    n = scores.shape[1]
+    is_end = np.ones_like(labels)
+    is_end[:, :-1] = scores[:, :-1] != scores[:, 1:]
+    end = np.where(is_end, np.arange(n), n)
+    end = np.minimum.accumulate(end[:, ::-1], axis=1)[:, ::-1]
+    precision = np.take_along_axis(precision, end, axis=1)
+
+    # Average precision of each class, like sklearn, then the macro average
+    ap = np.where(labels, precision, 0).sum(axis=1) / labels.sum(axis=1)
+    return float(ap.mean())
+
+# %% ../nbs/04_training_utils.ipynb 16
+class CmapAccumulator:
+    "Collects outputs and labels batch by batch in preallocated host buffers and computes `fast_padded_cmap` on demand"
+
+    def __init__(self,
+                 num_classes:int,       # Number of classes predicted by the model
+                 capacity:int=1024      # Initial number of rows, doubled when full
+                 ):
+        self.num_classes = num_classes
+        self.outputs = np.empty((capacity, num_classes), dtype=np.float32)
+        self.labels = np.empty((capacity, num_classes), dtype=bool)
+        self.count = 0
+
+    def reset(self):
+        "Forgets the accumulated batches, keeping the buffers"
+        self.count = 0
+
+    def update(self,
+               outputs,     # Model outputs of the batch. Can be either numpy or torch
+               labels       # Labels of the batch. Can be either numpy or torch. Must be one hot encoded
+               ):
+        "Copies a batch at the end of the buffers"
+        if type(outputs) == torch.Tensor:
+            outputs = outputs.detach().cpu().numpy()
+        if type(labels) == torch.Tensor:
+            labels = labels.detach().cpu().numpy()
+
+        n = len(outputs)
+        if self.count + n > len(self.outputs):
+            capacity = max(2 * len(self.outputs), self.count + n)
+            self.outputs = np.resize(self.outputs, (capacity, self.num_classes))
+            self.labels = np.resize(self.labels, (capacity, self.num_classes))
+        self.outputs[self.count:self.count + n] = outputs
+        self.labels[self.count:self.count + n] = labels
+        self.count += n
+
+    def compute(self)->float:
+        "Padded cmap of all the accumulated batches"
+        return fast_padded_cmap(self.outputs[:self.count], self.labels[:self.count])
+
+# %% ../nbs/04_training_utils.ipynb 17
 def compute_metrics(name:str,               # Name of the training stage (train, val, test)
                     outputs:torch.Tensor,   # The output of the model       
                     labels:torch.Tensor,    # The ground truth
@@ -117,7 +194,7 @@ def compute_metrics(name:str,               # Name of the training stage (train,
 
         acc = accuracy_score(labels, outputs)
         prec, recall, f1_weighted, _ = precision_recall_fscore_support(labels, outputs, average='weighted', zero_division=0.0)
-        p_cmap = padded_cmap(outputs, labels)
+        p_cmap = fast_padded_cmap(outputs, labels)
 
         return {f'{name}/loss': loss,
             f'{name}/example_ct': example_ct,
@@ -130,7 +207,7 @@ def compute_metrics(name:str,               # Name of the training stage (train,
             f'{name}/padded_cmap': p_cmap
             }
 
-# %% ../nbs/04_training_utils.ipynb 13
+# %% ../nbs/04_training_utils.ipynb 18
 metrics_dict = {
     'loss': lt,
     'step': gt,
@@ -141,10 +218,150 @@ metrics_dict = {
     'padded_cmap': gt
 }
 
-# %% ../nbs/04_training_utils.ipynb 21
+# %% ../nbs/04_training_utils.ipynb 20
+class MetricAccumulator:
+    "Accumulates a confusion matrix and the loss on the device, the metrics of `compute_metrics` are computed only when needed"
+
+    def __init__(self,
+                 num_classes:int,   # Number of classes predicted by the model
+                 device='cpu',      # The device of the outputs and labels
+                 n_bins:int=None    # Number of bins of the per-class histograms of probabilities, used by `class_report`
+                 ):
+        self.num_classes = num_classes
+        self.device = device
+        self.n_bins = n_bins
+        self.reset()
+
+    def reset(self):
+        "Starts a new accumulation window"
+        self.confusion = torch.zeros(self.num_classes, self.num_classes, dtype=torch.long, device=self.device)
+        self.loss_sum = torch.zeros((), device=self.device)
+        self.count = 0
+        if self.n_bins is not None:
+            # Histograms of the probability given to each class by its positive and its negative examples
+            self.positives = torch.zeros(self.num_classes, self.n_bins, dtype=torch.long, device=self.device)
+            self.negatives = torch.zeros(self.num_classes, self.n_bins, dtype=torch.long, device=self.device)
+
+    def update(self,
+               outputs:torch.Tensor,    # The output of the model
+               labels:torch.Tensor,     # The ground truth
+               loss:torch.Tensor        # The mean loss of the batch
+               ):
+        "Adds a batch, only with tensor operations so that the device is never synchronized"
+        preds = torch.argmax(outputs.detach(), dim=1)
+        self.confusion += torch.bincount(labels * self.num_classes + preds, minlength=self.num_classes ** 2).view(self.num_classes, self.num_classes)
+        self.loss_sum += loss.detach() * labels.size(0)
+        self.count += labels.size(0)
+
+        if self.n_bins is not None:
+            probs = torch.nn.functional.softmax(outputs.detach().float(), dim=1)
+            bins = (probs * self.n_bins).long().clamp(max=self.n_bins - 1)
+            bins += torch.arange(self.num_classes, device=bins.device) * self.n_bins
+            is_positive = torch.zeros_like(probs, dtype=torch.bool).scatter_(1, labels.view(-1, 1), True)
+            size = self.num_classes * self.n_bins
+            self.positives += torch.bincount(bins[is_positive], minlength=size).view(self.num_classes, self.n_bins)
+            self.negatives += torch.bincount(bins[~is_positive], minlength=size).view(self.num_classes, self.n_bins)
+
+    def _reduce(self, *tensors):
+        "Sums the statistics of every process of a distributed run, must be called by all of them at the same time"
+        if not (torch.distributed.is_available() and torch.distributed.is_initialized()):
+            return tensors
+        tensors = [t.clone() for t in tensors]
+        for t in tensors:
+            torch.distributed.all_reduce(t)
+        return tensors
+
+    def compute(self,
+                name:str,           # Name of the training stage (train, val, test)
+                example_ct:int,     # Number of examples processed by the model
+                step_ct:int,        # Number of backpropagation steps the model has done
+                epoch:float         # The training epoch
+                )->dict:            # Dictionary of the metrics, with the same keys as `compute_metrics`
+        "Computes the metrics of the current window, equal to `compute_metrics` on all the accumulated batches"
+        confusion, loss_sum, count = self._reduce(self.confusion, self.loss_sum, torch.tensor(self.count, device=self.device))
+        confusion = confusion.double()
+        tp = confusion.diag()
+        support = confusion.sum(dim=1)
+        predicted = confusion.sum(dim=0)
+        total = confusion.sum()
+
+        # Weighted precision, recall and f1 like sklearn with zero_division=0
+        precision = torch.where(predicted > 0, tp / predicted.clamp(min=1), torch.zeros_like(tp))
+        recall = torch.where(support > 0, tp / support.clamp(min=1), torch.zeros_like(tp))
+        f1 = torch.where(precision + recall > 0, 2 * precision * recall / (precision + recall).clamp(min=1e-12), torch.zeros_like(tp))
+        weights = support / total
+
+        # Padded cmap of one hot predictions: with binary scores the precision-recall curve has only two points,
+        # predicted positives (plus the 5 padding rows) and everything
+        recall_1 = (tp + 5) / (support + 5)
+        precision_1 = (tp + 5) / (predicted + 5)
+        p_cmap = (recall_1 * precision_1 + (1 - recall_1) * (support + 5) / (total + 5)).mean()
+
+        return {f'{name}/loss': (loss_sum / count).item(),
+            f'{name}/example_ct': example_ct,
+            f'{name}/step_ct': step_ct,
+            f'{name}/epoch': epoch,
+            f'{name}/accuracy': (tp.sum() / total).item(),
+            f'{name}/precision': (precision * weights).sum().item(),
+            f'{name}/recall': (recall * weights).sum().item(),
+            f'{name}/f1': (f1 * weights).sum().item(),
+            f'{name}/padded_cmap': p_cmap.item()
+            }
+
+    def class_report(self,
+                     classes:list,          # Names of the classes, in the order of the model outputs
+                     frequencies=None       # Training frequency of each class, the prevalence is the support if None
+                     )->pd.DataFrame:       # One row per class, sorted by prevalence
+        "Per-class precision, recall and f1 of the predictions and padded average precision of the probabilities"
+        confusion = self._reduce(self.confusion)[0].double().cpu()
+        tp = confusion.diag()
+        support = confusion.sum(dim=1)
+        predicted = confusion.sum(dim=0)
+
+        precision = torch.where(predicted > 0, tp / predicted.clamp(min=1), torch.zeros_like(tp))
+        recall = torch.where(support > 0, tp / support.clamp(min=1), torch.zeros_like(tp))
+        f1 = torch.where(precision + recall > 0, 2 * precision * recall / (precision + recall).clamp(min=1e-12), torch.zeros_like(tp))
+
+        report = pd.DataFrame({'class': list(classes), 'support': support.long().numpy(),
+                               'prevalence': frequencies if frequencies is not None else support.long().numpy(),
+                               'precision': precision.numpy(), 'recall': recall.numpy(), 'f1': f1.numpy()})
+
+        if self.n_bins is not None:
+            # Thresholds at the bin edges from the highest probability, the 5 padding positives are in the top bin
+            positives, negatives = self._reduce(self.positives, self.negatives)
+            positives, negatives = positives.double().cpu().flip(1), negatives.double().cpu().flip(1)
+            positives[:, 0] += 5
+            tp, fp = positives.cumsum(dim=1), negatives.cumsum(dim=1)
+            bin_precision = torch.where(tp + fp > 0, tp / (tp + fp).clamp(min=1), torch.zeros_like(tp))
+            report['padded_ap'] = ((positives * bin_precision).sum(dim=1) / positives.sum(dim=1)).numpy()
+
+        return report.sort_values('prevalence', kind='stable').reset_index(drop=True)
+
+# %% ../nbs/04_training_utils.ipynb 22
+def autocast(device:str,        # The device where the model is run ('cpu'|'cuda')
+             amp:str=None       # Precision of the autocast region ('bf16'|'fp16'), disabled if None
+             ):
+    "Autocast context of the trainer, bf16 works on any device while fp16 needs a gpu"
+    if amp is None:
+        return contextlib.nullcontext()
+
+    amp_dtypes = {'bf16': torch.bfloat16, 'fp16': torch.float16}
+    assert amp in amp_dtypes, f'{amp} is not a supported precision, choose one from {amp_dtypes.keys()}.'
+    device_type = torch.device(device).type
+    assert amp != 'fp16' or device_type == 'cuda', 'fp16 autocast is only supported on cuda, use bf16 instead.'
+
+    return torch.autocast(device_type, dtype=amp_dtypes[amp])
+
+# %% ../nbs/04_training_utils.ipynb 23
+def is_main_process()->bool:
+    "Whether this process logs and saves, i.e. it is not part of a distributed run or it has rank 0"
+    return not (torch.distributed.is_available() and torch.distributed.is_initialized()) or torch.distributed.get_rank() == 0
+
+# %% ../nbs/04_training_utils.ipynb 25
 def show_one_example(data, # The data received by the pytorch dataset
                      outputs:torch.Tensor): # The model prediction
     "A function that shows one input to the model together with its label and prediction"
+    from IPython.display import Audio, display
 
     inputs, labels, filename = data['input'], data['label'], data['filename']
     print(f'Showing {filename[0]}')
@@ -161,7 +378,7 @@ def show_one_example(data, # The data received by the pytorch dataset
 
     
 
-# %% ../nbs/04_training_utils.ipynb 23
+# %% ../nbs/04_training_utils.ipynb 26
 callback_dict = {
     '': None,
     'show': show_one_example
@@ -175,7 +392,7 @@ def get_callback_func(callback:str # Key into the callback dictionary
     
     return callback_dict[callback]
 
-# %% ../nbs/04_training_utils.ipynb 25
+# %% ../nbs/04_training_utils.ipynb 28
 scheduler_dict = {
     "linear" : (torch.optim.lr_scheduler.LinearLR, {"start_factor" : None, "end_factor" : None, "total_iters" : None, "verbose" : 1}),
     "reduce_lr_on_plateau" : (torch.optim.lr_scheduler.ReduceLROnPlateau, {"patience" : 5, "verbose" : 1}),
@@ -192,3 +409,10 @@ def get_lr_scheduler(scheduler: str, optimizer,  cnfg: dict):
             
     scheduler_dict[scheduler][1]["optimizer"] = optimizer            
     return scheduler_dict[scheduler][0](**scheduler_dict[scheduler][1])
+
+# %% ../nbs/04_training_utils.ipynb 29
+def __getattr__(name):
+    "Lazy access to `sample_weights`, which used to be computed at import"
+    if name == 'sample_weights':
+        return get_sample_weights()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,223 @@
+# AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/01_transforms.ipynb.
+
+# %% auto 0
+__all__ = ['length_policy_dict', 'PCEN', 'StretchLength', 'PadLength', 'TileLength', 'CropLength', 'InterpolateLength',
+           'get_length_policy', 'BatchAugment']
+
+# %% ../nbs/01_transforms.ipynb 3
+import math
+
+import numpy as np
+import torch
+import torchaudio
+
+# %% ../nbs/01_transforms.ipynb 6
+class PCEN(torch.nn.Module):
+    "Per-channel energy normalization of `[..., mel, time]` spectrograms, equivalent to `librosa.pcen` with `max_size=1`"
+
+    def __init__(
+        self,
+        sample_rate=32000,
+        hop_length=1024,
+        time_constant = 0.4,
+        gain = 0.98,
+        bias = 2.0,
+        power = 0.5,
+        eps = 1e-6,
+        n_mels = None,
+        trainable = False,
+        matrix_smoothing = False,
+    ):
+        super().__init__()
+
+        # Smoothing coefficient of the IIR filter, computed like librosa from the time constant
+        t_frames = time_constant * sample_rate / hop_length
+        b = (math.sqrt(1 + 4 * t_frames ** 2) - 1) / (2 * t_frames ** 2)
+
+        # With n_mels every mel band gets its own parameters, otherwise they are shared
+        shape = (n_mels, 1) if n_mels is not None else (1, 1)
+        self.eps = eps
+        self.trainable = trainable
+        # The smoother as a product with a [time, time] matrix, slower but exportable to ONNX
+        self.matrix_smoothing = matrix_smoothing
+
+        # Parameters are stored in log-space so that they stay positive while training
+        for name, value in [('log_b', b), ('log_gain', gain), ('log_bias', bias), ('log_power', power)]:
+            value = torch.full(shape, math.log(value))
+            if trainable:
+                self.register_parameter(name, torch.nn.Parameter(value))
+            else:
+                self.register_buffer(name, value)
+
+    def smooth(self, S):
+        "First order IIR smoother M[t] = (1 - b) M[t-1] + b S[t], starting from the steady state of a unit input"
+        n_mels, time = S.shape[-2], S.shape[-1]
+        b = self.log_b.exp().clamp(max=1.0).expand(n_mels, 1)
+
+        a_coeffs = torch.cat([torch.ones_like(b), b - 1], dim=1)
+        b_coeffs = torch.cat([b, torch.zeros_like(b)], dim=1)
+        M = torchaudio.functional.lfilter(S, a_coeffs.to(S.dtype), b_coeffs.to(S.dtype), clamp=False, batching=True)
+
+        # lfilter starts from zero, librosa from M[-1] = 1 whose contribution decays as (1 - b)^(t+1)
+        steps = torch.arange(1, time + 1, device=S.device, dtype=S.dtype)
+        return M + (1 - b.to(S.dtype)) ** steps
+
+    def smooth_matrix(self, S):
+        "Same result as `smooth`, computed as `S @ K` with K[s, t] = b (1 - b)^(t - s) for t >= s"
+        n_mels, time = S.shape[-2], S.shape[-1]
+        b = self.log_b.exp().clamp(max=1.0).to(S.dtype).expand(n_mels, 1).unsqueeze(-1)
+
+        steps = torch.arange(time, device=S.device, dtype=S.dtype)
+        lags = steps.view(1, -1) - steps.view(-1, 1)
+        K = torch.where(lags >= 0, b * (1 - b) ** lags.clamp(min=0), torch.zeros_like(lags))
+        M = (S.unsqueeze(-2) @ K).squeeze(-2)
+
+        return M + (1 - b.squeeze(-1)) ** (steps + 1)
+
+    def forward(self, S):
+        M = self.smooth_matrix(S) if self.matrix_smoothing else self.smooth(S)
+
+        gain, bias, power = self.log_gain.exp(), self.log_bias.exp(), self.log_power.exp()
+
+        # Adaptive gain control in log-space, like librosa
+        smooth = torch.exp(-gain * (math.log(self.eps) + torch.log1p(M / self.eps)))
+
+        # Dynamic range compression
+        return bias ** power * torch.expm1(power * torch.log1p(S * smooth / bias))
+
+# %% ../nbs/01_transforms.ipynb 11
+class StretchLength(torch.nn.Module):
+    "Regularizes the length of a mel spectrogram with a phase vocoder, the original behaviour of `MyPipeline`"
+
+    def __init__(self, hop_length=1024, n_freq=128):
+        super().__init__()
+        self.stretch = torchaudio.transforms.TimeStretch(hop_length=hop_length, n_freq=n_freq)
+
+    def forward(self, mel, length):
+        replay_rate = mel.shape[-1] / length
+        if replay_rate < 1:
+            mel = self.stretch(mel, replay_rate).real
+        elif replay_rate > 1:
+            # Kept as in the original pipeline: long spectrograms are slowed down too, then cropped
+            mel = self.stretch(mel, 1 / replay_rate).real
+        return mel[..., 0:length]
+
+# %% ../nbs/01_transforms.ipynb 12
+class PadLength(torch.nn.Module):
+    "Pads short mel spectrograms with zeros at the end and keeps the beginning of long ones"
+
+    def forward(self, mel, length):
+        if mel.shape[-1] < length:
+            mel = torch.nn.functional.pad(mel, (0, length - mel.shape[-1]))
+        return mel[..., 0:length]
+
+# %% ../nbs/01_transforms.ipynb 13
+class TileLength(torch.nn.Module):
+    "Loops short mel spectrograms until they are long enough and keeps the beginning of long ones"
+
+    def forward(self, mel, length):
+        if mel.shape[-1] < length:
+            mel = mel.repeat(*([1] * (mel.dim() - 1)), math.ceil(length / mel.shape[-1]))
+        return mel[..., 0:length]
+
+# %% ../nbs/01_transforms.ipynb 14
+class CropLength(torch.nn.Module):
+    "Takes a random crop of long mel spectrograms and pads short ones with zeros"
+
+    def forward(self, mel, length):
+        if mel.shape[-1] > length:
+            start = torch.randint(0, mel.shape[-1] - length + 1, ()).item()
+            return mel[..., start:start + length]
+        return torch.nn.functional.pad(mel, (0, length - mel.shape[-1]))
+
+# %% ../nbs/01_transforms.ipynb 15
+class InterpolateLength(torch.nn.Module):
+    "Resizes mel spectrograms along time with linear interpolation"
+
+    def forward(self, mel, length):
+        if mel.shape[-1] == length:
+            return mel
+        # interpolate works on [batch, channel, time], the other dimensions are flattened
+        shape = mel.shape
+        mel = torch.nn.functional.interpolate(mel.reshape(1, -1, shape[-1]), size=length, mode='linear', align_corners=True)
+        return mel.reshape(*shape[:-1], length)
+
+# %% ../nbs/01_transforms.ipynb 17
+length_policy_dict = {
+    'stretch': StretchLength,
+    'pad': PadLength,
+    'tile': TileLength,
+    'crop': CropLength,
+    'interpolate': InterpolateLength,
+}
+
+def get_length_policy(policy:str,       # Key into the length policy dictionary
+                      hop_length=1024,  # Hop length of the spectrogram, used by the stretch policy
+                      n_freq=128        # Number of frequency bins, used by the stretch policy
+                      )->torch.nn.Module:
+    "Getter method to retrieve a length regularization policy"
+
+    assert policy in length_policy_dict.keys(), f'{policy} is not an existing length policy, choose one from {length_policy_dict.keys()}.'
+
+    if policy == 'stretch':
+        return length_policy_dict[policy](hop_length=hop_length, n_freq=n_freq)
+
+    return length_policy_dict[policy]()
+
+# %% ../nbs/01_transforms.ipynb 20
+class BatchAugment(torch.nn.Module):
+    "Gain, noise, frequency and time masks on `[batch, 1, mel, time]` features, each applied to a random subset of the examples"
+
+    def __init__(self,
+                 p=0.5,                 # Probability of each augmentation, drawn independently for every example
+                 snr_db=10,             # Signal to noise ratio of the added gaussian noise, relative to the std of each example
+                 gain_db=6,             # Largest gain, drawn uniformly in [-gain_db, gain_db]
+                 freq_mask_param=40,    # Largest number of masked mel bins
+                 time_mask_param=20,    # Largest number of masked frames
+                 db=True,               # Whether the features are in dB, where a gain is a shift, or PCEN, where it is a scale
+                 seed=0                 # Seed of the generator, combined with the keys given to `reseed`
+                 ):
+        super().__init__()
+        self.p, self.snr_db, self.gain_db, self.db = p, snr_db, gain_db, db
+        self.freq_mask_param, self.time_mask_param = freq_mask_param, time_mask_param
+        self.seed = seed
+        self.generator = torch.Generator()
+        self.reseed()
+
+    def reseed(self, *keys):
+        "Seeds the generator from the seed and some integers, e.g. the epoch and the worker id"
+        self.generator.manual_seed(int(np.random.SeedSequence([self.seed, *keys]).generate_state(1, np.uint64)[0] >> 1))
+
+    def _coin(self, shape):
+        return torch.rand(shape[0], generator=self.generator).view(-1, *[1] * (len(shape) - 1)) < self.p
+
+    def _mask(self, shape, param, dim):
+        "Masks of a random width below `param` at a random position along `dim`, one per example"
+        size = shape[dim]
+        width = (torch.rand(shape[0], generator=self.generator) * min(param, size)).long()
+        start = (torch.rand(shape[0], generator=self.generator) * (size - width + 1)).long().clamp(max=size - 1)
+        steps = torch.arange(size)
+        mask = (steps >= start.view(-1, 1)) & (steps < (start + width).view(-1, 1))
+        view = [shape[0]] + [1] * (len(shape) - 1)
+        view[dim] = size
+        return mask.view(view)
+
+    def forward(self, x):
+        shape = x.shape
+        # Every random number comes from the generator, on the cpu, in a fixed order
+        gain = ((torch.rand(shape[0], generator=self.generator) * 2 - 1) * self.gain_db).view(-1, *[1] * (x.dim() - 1))
+        apply_gain, apply_noise = self._coin(shape), self._coin(shape)
+        noise = torch.randn(shape, generator=self.generator)
+        freq_mask = self._coin(shape) & self._mask(shape, self.freq_mask_param, -2)
+        time_mask = self._coin(shape) & self._mask(shape, self.time_mask_param, -1)
+        gain, apply_gain, apply_noise, noise, freq_mask, time_mask = (
+            t.to(x.device) for t in (gain, apply_gain, apply_noise, noise, freq_mask, time_mask))
+
+        x = torch.where(apply_gain, x + gain if self.db else x * 10 ** (gain / 20), x)
+
+        std = x.flatten(1).std(dim=1).view(-1, *[1] * (x.dim() - 1))
+        x = torch.where(apply_noise, x + noise * std * 10 ** (-self.snr_db / 20), x)
+
+        # The masked bins are set to the minimum of each example, which is silence both in dB and after PCEN
+        floor = x.flatten(1).min(dim=1).values.view(-1, *[1] * (x.dim() - 1))
+        return torch.where(freq_mask | time_mask, floor, x)
@@ -1,20 +1,24 @@
 # AUTOGENERATED! DO NOT EDIT! File to edit: ../nbs/00_utils.ipynb.
 
 # %% auto 0
-__all__ = ['DATA_DIR', 'AUDIO_DATA_DIR', 'plot_specgram', 'plot_librosa', 'plot_waveform', 'plot_audio', 'mel_to_wave',
-           'plot_spectrogram', 'plot_fbank']
+__all__ = ['DATA_DIR', 'AUDIO_DATA_DIR', 'RAW_AUDIO_DIR', 'CACHE_DIR', 'STORE_DIR', 'CHECKPOINT_DIR', 'LOG_DIR', 'plot_specgram',
+           'plot_librosa', 'plot_waveform', 'plot_audio', 'mel_to_wave', 'plot_spectrogram', 'plot_fbank']
 
 # %% ../nbs/00_utils.ipynb 3
-import matplotlib.pyplot as plt
-import librosa
 from pathlib import Path
 
 import torch
 import torchaudio
 
 # %% ../nbs/00_utils.ipynb 4
+# Plotting libraries are imported inside the plotting functions, so that importing the package stays cheap
 DATA_DIR = '../data/'
 AUDIO_DATA_DIR = DATA_DIR + 'audio_data/'
+RAW_AUDIO_DIR = DATA_DIR + 'train_audio/'
+CACHE_DIR = DATA_DIR + 'cache/'
+STORE_DIR = DATA_DIR + 'store/'
+CHECKPOINT_DIR = '../checkpoints/'
+LOG_DIR = '../logs/'
 
 # %% ../nbs/00_utils.ipynb 5
 def plot_specgram(waveform:torch.Tensor, # The tensor containing the waveform
@@ -22,6 +26,7 @@ def plot_specgram(waveform:torch.Tensor, # The tensor containing the waveform
                   title:str="Spectrogram", # The title of the plot
                   axes=None):
     "A function to plot the specgram from a waveform"
+    import matplotlib.pyplot as plt
     waveform = waveform.numpy()
 
     num_channels, num_frames = waveform.shape
@@ -44,6 +49,8 @@ def plot_specgram(waveform:torch.Tensor, # The tensor containing the waveform
 
 # %% ../nbs/00_utils.ipynb 6
 def plot_librosa(mel_spectrogram, sr, hop_length):
+    import matplotlib.pyplot as plt
+    import librosa.display
     plt.figure(figsize=(10, 4))
     librosa.display.specshow(mel_spectrogram,
                              y_axis='mel', fmax=8000, x_axis='time', sr=sr, hop_length=hop_length)
@@ -58,6 +65,7 @@ def plot_waveform(waveform:torch.Tensor, # The tensor containing the waveform
                   title:str='Waveform', # The title of the plot
                   axes=None):
     "A function to plot the waveform of an audio"
+    import matplotlib.pyplot as plt
     waveform = waveform.numpy()
 
     num_channels, num_frames = waveform.shape
@@ -84,6 +92,7 @@ def plot_waveform(waveform:torch.Tensor, # The tensor containing the waveform
 def plot_audio(waveform:torch.Tensor, # The tensor containing the waveform
                 sample_rate:int): # The sample rate of the audio file
     "A function that plots together the waveform and the specgram of an audio."
+    import matplotlib.pyplot as plt
     num_channels, num_frames = waveform.numpy().shape
 
     figure, axes = plt.subplots(num_channels, 2,  figsize=(16, num_channels * 7))
@@ -121,6 +130,8 @@ def mel_to_wave(mel_specgram:torch.Tensor, # The tensor of the mel specgram
 
 # %% ../nbs/00_utils.ipynb 10
 def plot_spectrogram(specgram, title=None, ylabel="freq_bin", ax=None, db=False):
+    import matplotlib.pyplot as plt
+    import librosa
     if ax is None:
         _, ax = plt.subplots(1, 1)
     if title is not None:
@@ -133,6 +144,7 @@ def plot_spectrogram(specgram, title=None, ylabel="freq_bin", ax=None, db=False)
 
 
 def plot_fbank(fbank, title=None):
+    import matplotlib.pyplot as plt
     fig, axs = plt.subplots(1, 1)
     axs.set_title(title or "Filter bank")
     axs.imshow(fbank, aspect="auto")